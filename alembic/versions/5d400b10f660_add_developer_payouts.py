@@ -0,0 +1,44 @@
+"""add developer payouts
+
+Revision ID: 5d400b10f660
+Revises: b71fee00086b
+Create Date: 2026-10-19 14:02:51.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5d400b10f660'
+down_revision: Union[str, None] = 'b71fee00086b'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table('developer_payouts',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('developer_id', sa.Integer(), nullable=False),
+    sa.Column('period', sa.String(), nullable=False),
+    sa.Column('period_start', sa.DateTime(), nullable=False),
+    sa.Column('period_end', sa.DateTime(), nullable=False),
+    sa.Column('purchases', sa.Integer(), nullable=False),
+    sa.Column('purchase_revenue', sa.Float(), nullable=False),
+    sa.Column('invocations', sa.Integer(), nullable=False),
+    sa.Column('invocation_revenue', sa.Float(), nullable=False),
+    sa.Column('amount', sa.Float(), nullable=False),
+    sa.Column('status', sa.String(), nullable=False),
+    sa.Column('computed_at', sa.DateTime(), nullable=False),
+    sa.ForeignKeyConstraint(['developer_id'], ['users.id'], ),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('developer_id', 'period', 'period_start', name='uq_developer_payout_period')
+    )
+    op.create_index(op.f('ix_developer_payouts_id'), 'developer_payouts', ['id'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index(op.f('ix_developer_payouts_id'), table_name='developer_payouts')
+    op.drop_table('developer_payouts')
@@ -0,0 +1,41 @@
+"""add invocation search index
+
+Revision ID: 60cdc029a21a
+Revises: 1071641f55ce
+Create Date: 2026-10-19 11:32:07.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '60cdc029a21a'
+down_revision: Union[str, None] = '1071641f55ce'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Existing invocations are indexed by the app on its next start
+    if op.get_bind().dialect.name == 'sqlite':
+        op.execute(
+            "CREATE VIRTUAL TABLE IF NOT EXISTS invocation_search USING fts5("
+            "summary, input_text, output_text, tokenize = 'porter unicode61')"
+        )
+    else:
+        op.execute(
+            "CREATE TABLE IF NOT EXISTS invocation_search ("
+            "invocation_id INTEGER PRIMARY KEY REFERENCES agent_invocations(id) ON DELETE CASCADE, "
+            "user_id INTEGER NOT NULL, "
+            "document TSVECTOR NOT NULL)"
+        )
+        op.create_index('ix_invocation_search_document', 'invocation_search', ['document'],
+                        unique=False, postgresql_using='gin')
+        op.create_index('ix_invocation_search_user_id', 'invocation_search', ['user_id'], unique=False)
+
+
+def downgrade() -> None:
+    op.execute("DROP TABLE IF EXISTS invocation_search")
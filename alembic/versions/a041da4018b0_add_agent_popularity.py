@@ -0,0 +1,35 @@
+"""add agent_popularity
+
+Revision ID: a041da4018b0
+Revises: 60cdc029a21a
+Create Date: 2026-10-19 12:05:44.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a041da4018b0'
+down_revision: Union[str, None] = '60cdc029a21a'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table('agent_popularity',
+    sa.Column('agent_id', sa.Integer(), nullable=False),
+    sa.Column('popular_score', sa.Float(), nullable=False),
+    sa.Column('trending_score', sa.Float(), nullable=False),
+    sa.Column('invocations', sa.Integer(), nullable=False),
+    sa.Column('purchases', sa.Integer(), nullable=False),
+    sa.Column('updated_at', sa.DateTime(), nullable=False),
+    sa.ForeignKeyConstraint(['agent_id'], ['agents.id'], ),
+    sa.PrimaryKeyConstraint('agent_id')
+    )
+
+
+def downgrade() -> None:
+    op.drop_table('agent_popularity')
@@ -0,0 +1,52 @@
+"""add analytics rollups
+
+Revision ID: b71fee00086b
+Revises: a041da4018b0
+Create Date: 2026-10-19 13:20:17.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b71fee00086b'
+down_revision: Union[str, None] = 'a041da4018b0'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('agent_invocations', sa.Column('cost', sa.Float(), nullable=True))
+    op.add_column('agent_invocations', sa.Column('latency_ms', sa.Float(), nullable=True))
+    op.create_table('analytics_rollups',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('granularity', sa.String(), nullable=False),
+    sa.Column('scope', sa.String(), nullable=False),
+    sa.Column('scope_id', sa.Integer(), nullable=False),
+    sa.Column('bucket_start', sa.DateTime(), nullable=False),
+    sa.Column('invocations', sa.Integer(), nullable=False),
+    sa.Column('tokens', sa.Integer(), nullable=False),
+    sa.Column('revenue', sa.Float(), nullable=False),
+    sa.Column('latency_sum_ms', sa.Float(), nullable=False),
+    sa.Column('latency_sketch', sa.Text(), nullable=True),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('granularity', 'scope', 'scope_id', 'bucket_start', name='uq_analytics_rollup_bucket')
+    )
+    op.create_index(op.f('ix_analytics_rollups_id'), 'analytics_rollups', ['id'], unique=False)
+    op.create_table('analytics_watermarks',
+    sa.Column('name', sa.String(), nullable=False),
+    sa.Column('last_invocation_id', sa.Integer(), nullable=False),
+    sa.Column('updated_at', sa.DateTime(), nullable=True),
+    sa.PrimaryKeyConstraint('name')
+    )
+
+
+def downgrade() -> None:
+    op.drop_table('analytics_watermarks')
+    op.drop_index(op.f('ix_analytics_rollups_id'), table_name='analytics_rollups')
+    op.drop_table('analytics_rollups')
+    op.drop_column('agent_invocations', 'latency_ms')
+    op.drop_column('agent_invocations', 'cost')
@@ -0,0 +1,27 @@
+"""add agent updated_at
+
+Revision ID: c3e1f0a9d27b
+Revises: 5d400b10f660
+Create Date: 2026-10-19 18:40:12.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c3e1f0a9d27b'
+down_revision: Union[str, None] = '5d400b10f660'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('agents', sa.Column('updated_at', sa.DateTime(), nullable=True))
+    op.execute("UPDATE agents SET updated_at = created_at")
+
+
+def downgrade() -> None:
+    op.drop_column('agents', 'updated_at')
@@ -0,0 +1,131 @@
+"""
+Catalog search benchmark.
+
+Builds the in-memory agent search index over a synthetic catalog, then
+times a mix of queries (single term, multi-term, prefix, filtered and
+unfiltered browsing, deep pages) and reports build time and per-kind latency
+percentiles as JSON:
+
+    python -m benchmarks.bench_catalog_search --agents 100000
+"""
+import argparse
+import json
+import os
+import random
+import time
+
+
+TOPICS = (
+    "code review resume interview writing python java rust kubernetes docker "
+    "security cloud data analytics marketing sales legal contract finance tax "
+    "translation summary email support chatbot sql database testing design "
+    "frontend backend mobile devops monitoring research tutor math physics"
+).split()
+
+
+def vocabulary(size, rng):
+    # Descriptions draw words with a Zipf-like skew, as real text does: a
+    # few words appear in most agents and most words in very few
+    words = TOPICS + [f"w{i}" for i in range(size - len(TOPICS))]
+    rng.shuffle(words)
+    weights = [1 / (rank + 1) for rank in range(len(words))]
+    return words, weights
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, int(round(pct / 100 * len(ordered))) - 1))
+    return ordered[index]
+
+
+def summarize(latencies):
+    return {
+        "count": len(latencies),
+        "p50_ms": round(percentile(latencies, 50) * 1000, 3),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 3),
+        "max_ms": round(max(latencies) * 1000, 3),
+    }
+
+
+def synthetic_agents(count, rng, words, weights):
+    from src.database.schemas import AgentResponse
+    for agent_id in range(1, count + 1):
+        name = " ".join(rng.sample(TOPICS, 2)).title() + f" Agent {agent_id}"
+        description = " ".join(rng.choices(words, weights, k=rng.randint(8, 30)))
+        yield AgentResponse(
+            id=agent_id,
+            name=name,
+            description=description,
+            price=round(rng.uniform(1, 100), 2),
+            developer_id=rng.randint(1, 500),
+            is_active=rng.random() > 0.05,
+        )
+
+
+def run(args):
+    from src.search.catalog import CatalogSearchIndex
+
+    rng = random.Random(args.seed)
+    words, weights = vocabulary(args.vocabulary, rng)
+    agents = list(synthetic_agents(args.agents, rng, words, weights))
+
+    def query_term():
+        return rng.choices(words, weights)[0]
+    index = CatalogSearchIndex()
+    started = time.perf_counter()
+    index.rebuild(agents)
+    build_s = time.perf_counter() - started
+
+    queries = {
+        "single_term": lambda: index.search(query_term()),
+        "two_terms": lambda: index.search(f"{query_term()} {query_term()}"),
+        "topic_in_name": lambda: index.search(rng.choice(TOPICS)),
+        "prefix": lambda: index.search(rng.choice(TOPICS)[:3]),
+        "term_with_filters": lambda: index.search(
+            query_term(), min_price=10, max_price=40, developer_id=rng.randint(1, 500)
+        ),
+        "browse": lambda: index.search(None),
+        "browse_price_range": lambda: index.search(None, min_price=20, max_price=30),
+        "deep_page": lambda: index.search(rng.choice(TOPICS), offset=1000),
+    }
+    results = {}
+    for name, query in queries.items():
+        latencies = []
+        for _ in range(args.queries):
+            started = time.perf_counter()
+            query()
+            latencies.append(time.perf_counter() - started)
+        results[name] = summarize(latencies)
+
+    started = time.perf_counter()
+    for agent in synthetic_agents(args.updates, random.Random(args.seed + 1), words, weights):
+        index.add(agent.model_copy(update={"id": args.agents + agent.id}))
+    add_s = time.perf_counter() - started
+
+    return {
+        "agents": args.agents,
+        "vocabulary": len(index._vocabulary),
+        "build_s": round(build_s, 3),
+        "incremental_add_ms": round(add_s / args.updates * 1000, 3),
+        "queries": results,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--agents", type=int, default=100000)
+    parser.add_argument("--vocabulary", type=int, default=20000, help="distinct description words")
+    parser.add_argument("--queries", type=int, default=200, help="queries per kind")
+    parser.add_argument("--updates", type=int, default=100, help="agents added after the build")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    # Settings are read at import time
+    for name in ("SECRET_KEY", "OPENAI_API_KEY", "STRIPE_SECRET_KEY", "STRIPE_PUBLISHABLE_KEY", "DATABASE_URL"):
+        os.environ.setdefault(name, "sqlite://" if name == "DATABASE_URL" else "bench")
+
+    print(json.dumps(run(args), indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,140 @@
+"""
+Login storm benchmark.
+
+Fires concurrent ``/token`` requests at the app in-process while a probe
+client polls a cheap authenticated endpoint (``/agents/summarize``), then
+reports login throughput and the probe's latency percentiles as JSON.
+``--inline`` runs bcrypt on the event loop, as the handlers used to, so
+the two modes can be compared:
+
+    python -m benchmarks.bench_login --logins 200 --concurrency 20
+    python -m benchmarks.bench_login --logins 200 --concurrency 20 --inline
+"""
+import argparse
+import asyncio
+import json
+import os
+import tempfile
+import time
+
+
+def percentile(values, pct):
+    if not values:
+        return None
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, int(round(pct / 100 * len(ordered))) - 1))
+    return ordered[index]
+
+
+def summarize(latencies):
+    return {
+        "count": len(latencies),
+        "p50_ms": round(percentile(latencies, 50) * 1000, 2) if latencies else None,
+        "p99_ms": round(percentile(latencies, 99) * 1000, 2) if latencies else None,
+        "max_ms": round(max(latencies) * 1000, 2) if latencies else None,
+    }
+
+
+async def run(args):
+    import httpx
+    from src.main import app
+    from src.auth import security
+
+    if args.inline:
+        async def run_inline(func, *func_args):
+            return func(*func_args)
+        security._run_in_hash_pool = run_inline
+
+    password = "benchpassword123"
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+        for i in range(args.users):
+            await client.post("/users/register", json={
+                "username": f"bench{i}",
+                "email": f"bench{i}@example.com",
+                "password": password,
+            })
+        token = (await client.post("/token", data={"username": "bench0", "password": password})).json()["access_token"]
+        headers = {"Authorization": f"Bearer {token}"}
+
+        stop = asyncio.Event()
+        probe_latencies = []
+
+        async def probe():
+            # Latency is measured from when each probe was scheduled, so time
+            # the loop spends blocked before the probe starts is counted too
+            loop = asyncio.get_running_loop()
+            scheduled = loop.time()
+            while not stop.is_set():
+                scheduled += args.probe_interval
+                await asyncio.sleep(max(0, scheduled - loop.time()))
+                await client.post(
+                    "/agents/summarize",
+                    json={"input_text": "ping", "output_text": "pong"},
+                    headers=headers,
+                )
+                probe_latencies.append(loop.time() - scheduled)
+                scheduled = max(scheduled, loop.time())
+
+        login_latencies = []
+        failures = 0
+        limit = asyncio.Semaphore(args.concurrency)
+
+        async def login(i):
+            nonlocal failures
+            async with limit:
+                started = time.perf_counter()
+                response = await client.post("/token", data={
+                    "username": f"bench{i % args.users}",
+                    "password": password,
+                })
+                login_latencies.append(time.perf_counter() - started)
+                if response.status_code != 200:
+                    failures += 1
+
+        probe_task = asyncio.create_task(probe())
+        started = time.perf_counter()
+        await asyncio.gather(*(login(i) for i in range(args.logins)))
+        elapsed = time.perf_counter() - started
+        stop.set()
+        await probe_task
+
+    return {
+        "mode": "inline" if args.inline else "pool",
+        "bcrypt_rounds": int(os.environ["BCRYPT_ROUNDS"]),
+        "hash_workers": int(os.environ["PASSWORD_HASH_WORKERS"]),
+        "logins": args.logins,
+        "concurrency": args.concurrency,
+        "login_failures": failures,
+        "elapsed_s": round(elapsed, 3),
+        "logins_per_s": round(args.logins / elapsed, 2),
+        "login_latency": summarize(login_latencies),
+        "probe_latency": summarize(probe_latencies),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--logins", type=int, default=100)
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--users", type=int, default=5)
+    parser.add_argument("--rounds", type=int, default=12, help="bcrypt cost")
+    parser.add_argument("--workers", type=int, default=4, help="hash pool size")
+    parser.add_argument("--probe-interval", type=float, default=0.01)
+    parser.add_argument("--inline", action="store_true", help="hash on the event loop")
+    args = parser.parse_args()
+
+    # Settings are read at import time, so configure before importing the app
+    db_dir = tempfile.mkdtemp(prefix="bench-login-")
+    os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(db_dir, 'bench.db')}"
+    os.environ["BCRYPT_ROUNDS"] = str(args.rounds)
+    os.environ["PASSWORD_HASH_WORKERS"] = str(args.workers)
+    os.environ["RATE_LIMIT_ENABLED"] = "false"
+    for name in ("SECRET_KEY", "OPENAI_API_KEY", "STRIPE_SECRET_KEY", "STRIPE_PUBLISHABLE_KEY"):
+        os.environ.setdefault(name, "bench")
+
+    print(json.dumps(asyncio.run(run(args)), indent=2))
+
+
+if __name__ == "__main__":
+    main()
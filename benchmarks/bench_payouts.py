@@ -0,0 +1,130 @@
+"""
+Developer payout benchmark.
+
+Fills a scratch SQLite database with synthetic purchases and invocations
+spread over a year (``src.database.synthetic``, without payloads), then
+times the payout engine computing monthly totals for every developer,
+and compares its NumPy group-by against a plain Python per-row loop on
+one chunk. Reports JSON:
+
+    python -m benchmarks.bench_payouts --rows 10000000
+"""
+import argparse
+import json
+import os
+import tempfile
+import time
+from collections import defaultdict
+from datetime import datetime
+
+
+def generate(path, args):
+    from src.database.synthetic import SyntheticConfig, generate as generate_data
+
+    purchases = int(args.rows * args.purchase_share)
+    config = SyntheticConfig(
+        users=args.users,
+        agents=args.agents,
+        purchases=purchases,
+        invocations=args.rows - purchases,
+        developer_share=args.developers / args.users,
+        payloads=False,
+        end=datetime(2026, 10, 1),
+        seed=args.seed,
+        chunk_size=args.chunk_size,
+    )
+    generate_data(f"sqlite:///{path}", config, create_schema=True)
+
+
+def python_loop(chunk, developer_of):
+    # The straightforward per-row version the engine replaces
+    totals = defaultdict(float)
+    for agent_id, epoch, amount in chunk.tolist():
+        developer = developer_of[int(agent_id)]
+        month = time.strftime("%Y-%m", time.gmtime(epoch))
+        totals[(developer, month)] += amount
+    return totals
+
+
+def run(args, path):
+    import numpy as np
+    from sqlalchemy import create_engine
+    from sqlalchemy.orm import Session
+    from src.marketplace.payouts import INVOCATIONS, PayoutEngine
+
+    started = time.perf_counter()
+    generate(path, args)
+    generate_s = time.perf_counter() - started
+
+    engine = create_engine(f"sqlite:///{path}")
+    payouts = PayoutEngine(period="month", chunk_size=args.chunk_size)
+    with Session(engine) as db:
+        started = time.perf_counter()
+        totals = payouts.compute(db, datetime(2025, 10, 1), datetime(2026, 10, 1))
+        compute_s = time.perf_counter() - started
+
+        started = time.perf_counter()
+        stored = payouts.run(db, until=datetime(2026, 10, 1), since=datetime(2025, 10, 1))
+        run_s = time.perf_counter() - started
+
+        # Group-by cost alone, on one chunk already in memory
+        developer_of = payouts._developer_lookup(db)
+        rng = np.random.default_rng(args.seed)
+        chunk = np.column_stack([
+            rng.integers(1, args.agents + 1, args.chunk_size),
+            1_760_000_000 + rng.integers(0, 365 * 86400, args.chunk_size),
+            rng.uniform(0.01, 2, args.chunk_size),
+        ]).astype(np.float64)
+        started = time.perf_counter()
+        payouts._reduce(chunk, developer_of, INVOCATIONS)
+        numpy_s = time.perf_counter() - started
+        started = time.perf_counter()
+        python_loop(chunk, developer_of)
+        python_s = time.perf_counter() - started
+
+    return {
+        "rows": args.rows,
+        "developers": args.developers,
+        "agents": args.agents,
+        "chunk_size": args.chunk_size,
+        "generate_s": round(generate_s, 2),
+        "compute_s": round(compute_s, 2),
+        "compute_rows_per_s": round(args.rows / compute_s),
+        "run_with_writes_s": round(run_s, 2),
+        "developer_periods": len(totals),
+        "payout_records": len(stored),
+        "group_by_chunk": {
+            "numpy_ms": round(numpy_s * 1000, 2),
+            "python_loop_ms": round(python_s * 1000, 2),
+            "speedup": round(python_s / numpy_s, 1),
+        },
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=10_000_000, help="purchases + invocations")
+    parser.add_argument("--purchase-share", type=float, default=0.05)
+    parser.add_argument("--users", type=int, default=100_000)
+    parser.add_argument("--developers", type=int, default=1000)
+    parser.add_argument("--agents", type=int, default=20000)
+    parser.add_argument("--chunk-size", type=int, default=100_000)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--keep", help="write the database here instead of a temp file")
+    args = parser.parse_args()
+
+    # Settings are read at import time
+    for name in ("SECRET_KEY", "OPENAI_API_KEY", "STRIPE_SECRET_KEY", "STRIPE_PUBLISHABLE_KEY", "DATABASE_URL"):
+        os.environ.setdefault(name, "sqlite://" if name == "DATABASE_URL" else "bench")
+
+    if args.keep:
+        if os.path.exists(args.keep):
+            os.remove(args.keep)
+        print(json.dumps(run(args, args.keep), indent=2))
+        return
+    with tempfile.TemporaryDirectory() as directory:
+        print(json.dumps(run(args, os.path.join(directory, "payouts.db")), indent=2))
+
+
+if __name__ == "__main__":
+    main()
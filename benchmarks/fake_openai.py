@@ -0,0 +1,350 @@
+"""
+Fake OpenAI-compatible server for load and fault testing.
+
+Implements ``POST /v1/chat/completions``, streaming and not, with made-up
+content and usage numbers. Latency, generation speed and injected faults
+(429s, 5xx errors and stalls) are configurable on the command line or at
+runtime, so agents can be exercised without calling the real API:
+
+    python -m benchmarks.fake_openai --port 8100 --latency lognormal:300:0.5 \\
+        --tokens-per-second 80 --rate-429 0.02 --rate-5xx 0.01
+    OPENAI_BASE_URL=http://127.0.0.1:8100/v1 uvicorn src.main:app
+
+Latency specs (milliseconds, time to first token): ``fixed:MS``,
+``uniform:LOW:HIGH``, ``lognormal:MEDIAN:SIGMA`` and ``exponential:MEAN``.
+
+Control endpoints: ``GET /_fake/health``, ``GET /_fake/stats``,
+``POST /_fake/config`` (partial update) and ``POST /_fake/reset``. A
+request can also force a fault with an ``X-Fake-Fault: 429|500|502|503|stall``
+header. ``FakeOpenAIServer`` runs the server as a subprocess, for test
+fixtures and load generators.
+"""
+import argparse
+import asyncio
+import json
+import math
+import os
+import random
+import socket
+import subprocess
+import sys
+import time
+import uuid
+from dataclasses import asdict, dataclass, fields
+from typing import Optional
+
+WORDS = (
+    "the agent reviewed your request and suggests clear concise steps to improve "
+    "structure wording examples impact and overall quality of the result"
+).split()
+
+SERVER_ERRORS = (500, 502, 503)
+
+
+@dataclass
+class FakeConfig:
+    latency: str = "fixed:0"
+    # Streaming speed after the first token; 0 emits everything at once
+    tokens_per_second: float = 0.0
+    completion_tokens: int = 64
+    # Estimated from the messages when not set
+    prompt_tokens: Optional[int] = None
+    rate_429: float = 0.0
+    rate_5xx: float = 0.0
+    rate_stall: float = 0.0
+    stall_seconds: float = 30.0
+    seed: Optional[int] = None
+
+
+def sample_latency(spec: str, rng: random.Random) -> float:
+    """Seconds to wait before the first token, drawn from ``spec``."""
+    kind, *params = spec.split(":")
+    values = [float(param) for param in params]
+    if kind == "fixed":
+        ms = values[0]
+    elif kind == "uniform":
+        ms = rng.uniform(values[0], values[1])
+    elif kind == "lognormal":
+        ms = rng.lognormvariate(math.log(values[0]), values[1])
+    elif kind == "exponential":
+        ms = rng.expovariate(1 / values[0]) if values[0] > 0 else 0.0
+    else:
+        raise ValueError(f"Unknown latency distribution: {spec}")
+    return max(0.0, ms) / 1000
+
+
+class _Stats:
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        self.requests = 0
+        self.completed = 0
+        self.streamed = 0
+        self.rate_limited = 0
+        self.server_errors = 0
+        self.stalls = 0
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.completion_tokens = 0
+
+
+def create_app(config: FakeConfig):
+    from fastapi import FastAPI, Request
+    from fastapi.responses import JSONResponse, StreamingResponse
+
+    app = FastAPI(title="Fake OpenAI")
+    state = {"config": config, "rng": random.Random(config.seed)}
+    stats = _Stats()
+
+    def error(status_code: int, message: str, error_type: str, code: Optional[str] = None, headers=None):
+        return JSONResponse(
+            {"error": {"message": message, "type": error_type, "param": None, "code": code}},
+            status_code=status_code,
+            headers=headers,
+        )
+
+    def choose_fault(request) -> Optional[str]:
+        forced = request.headers.get("x-fake-fault")
+        if forced:
+            return forced
+        cfg, rng = state["config"], state["rng"]
+        roll = rng.random()
+        for fault, rate in (("429", cfg.rate_429), ("5xx", cfg.rate_5xx), ("stall", cfg.rate_stall)):
+            if roll < rate:
+                return fault
+            roll -= rate
+        return None
+
+    @app.get("/_fake/health")
+    async def health():
+        return {"status": "ok"}
+
+    @app.get("/_fake/stats")
+    async def get_stats():
+        return {name: value for name, value in vars(stats).items()}
+
+    @app.post("/_fake/config")
+    async def update_config(changes: dict):
+        current = asdict(state["config"])
+        unknown = set(changes) - set(current)
+        if unknown:
+            return error(400, f"Unknown settings: {sorted(unknown)}", "invalid_request_error")
+        state["config"] = FakeConfig(**{**current, **changes})
+        if "seed" in changes:
+            state["rng"] = random.Random(changes["seed"])
+        return asdict(state["config"])
+
+    @app.post("/_fake/reset")
+    async def reset():
+        stats.reset()
+        return {"status": "ok"}
+
+    @app.post("/v1/chat/completions")
+    async def chat_completions(request: Request):
+        body = await request.json()
+        cfg, rng = state["config"], state["rng"]
+        stats.requests += 1
+
+        fault = choose_fault(request)
+        if fault == "429":
+            stats.rate_limited += 1
+            return error(
+                429, "Rate limit reached for requests", "requests", "rate_limit_exceeded",
+                headers={"retry-after": "1", "x-ratelimit-remaining-requests": "0"},
+            )
+        if fault in ("5xx", *map(str, SERVER_ERRORS)):
+            stats.server_errors += 1
+            status_code = rng.choice(SERVER_ERRORS) if fault == "5xx" else int(fault)
+            return error(status_code, "The server had an error while processing your request", "server_error")
+        stall = fault == "stall"
+        if stall:
+            stats.stalls += 1
+
+        messages = body.get("messages") or []
+        prompt_tokens = cfg.prompt_tokens
+        if prompt_tokens is None:
+            prompt_tokens = sum(len(str(message.get("content") or "").split()) for message in messages) + 4 * len(messages)
+        completion_tokens = cfg.completion_tokens
+        if body.get("max_tokens"):
+            completion_tokens = min(completion_tokens, int(body["max_tokens"]))
+        usage = {
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": completion_tokens,
+            "total_tokens": prompt_tokens + completion_tokens,
+        }
+        words = [WORDS[i % len(WORDS)] for i in range(completion_tokens)]
+        completion_id = f"chatcmpl-{uuid.uuid4().hex[:24]}"
+        created = int(time.time())
+        model = body.get("model", "fake-model")
+        first_token = sample_latency(cfg.latency, rng)
+        per_token = 1 / cfg.tokens_per_second if cfg.tokens_per_second > 0 else 0.0
+
+        stats.in_flight += 1
+        stats.max_in_flight = max(stats.max_in_flight, stats.in_flight)
+
+        if not body.get("stream"):
+            try:
+                await asyncio.sleep(first_token + per_token * completion_tokens + (cfg.stall_seconds if stall else 0))
+            finally:
+                stats.in_flight -= 1
+            stats.completed += 1
+            stats.completion_tokens += completion_tokens
+            return {
+                "id": completion_id,
+                "object": "chat.completion",
+                "created": created,
+                "model": model,
+                "choices": [{
+                    "index": 0,
+                    "message": {"role": "assistant", "content": " ".join(words)},
+                    "logprobs": None,
+                    "finish_reason": "stop",
+                }],
+                "usage": usage,
+                "system_fingerprint": "fake",
+            }
+
+        include_usage = bool((body.get("stream_options") or {}).get("include_usage"))
+
+        def event(choices, **extra):
+            payload = {
+                "id": completion_id,
+                "object": "chat.completion.chunk",
+                "created": created,
+                "model": model,
+                "choices": choices,
+                **extra,
+            }
+            return f"data: {json.dumps(payload)}\n\n"
+
+        def chunk(delta, finish_reason=None):
+            return event([{"index": 0, "delta": delta, "logprobs": None, "finish_reason": finish_reason}])
+
+        async def events():
+            try:
+                await asyncio.sleep(first_token)
+                yield chunk({"role": "assistant", "content": ""})
+                for i, word in enumerate(words):
+                    if stall and i == len(words) // 2:
+                        # Stall mid-stream, after the client has seen tokens
+                        await asyncio.sleep(cfg.stall_seconds)
+                    if per_token:
+                        await asyncio.sleep(per_token)
+                    yield chunk({"content": word if i == 0 else f" {word}"})
+                yield chunk({}, "stop")
+                if include_usage:
+                    yield event([], usage=usage)
+                yield "data: [DONE]\n\n"
+                stats.streamed += 1
+                stats.completion_tokens += completion_tokens
+            finally:
+                stats.in_flight -= 1
+
+        return StreamingResponse(events(), media_type="text/event-stream")
+
+    return app
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+class FakeOpenAIServer:
+    """
+    Runs the fake server in a subprocess:
+
+        with FakeOpenAIServer(latency="fixed:50", rate_429=0.1) as server:
+            client = AsyncOpenAI(api_key="fake", base_url=server.base_url)
+    """
+
+    def __init__(self, port: Optional[int] = None, host: str = "127.0.0.1", **config):
+        self.host = host
+        self.port = port or _free_port()
+        self.config = FakeConfig(**config)
+        self._process: Optional[subprocess.Popen] = None
+
+    @property
+    def url(self) -> str:
+        return f"http://{self.host}:{self.port}"
+
+    @property
+    def base_url(self) -> str:
+        return f"{self.url}/v1"
+
+    def start(self, timeout: float = 15.0):
+        import httpx
+
+        args = [sys.executable, "-m", "benchmarks.fake_openai", "--host", self.host, "--port", str(self.port)]
+        for field in fields(FakeConfig):
+            value = getattr(self.config, field.name)
+            if value is not None:
+                args += [f"--{field.name.replace('_', '-')}", str(value)]
+        root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        self._process = subprocess.Popen(args, cwd=root)
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            if self._process.poll() is not None:
+                raise RuntimeError(f"Fake OpenAI server exited with {self._process.returncode}")
+            try:
+                if httpx.get(f"{self.url}/_fake/health", timeout=1).status_code == 200:
+                    return self
+            except httpx.TransportError:
+                pass
+            time.sleep(0.05)
+        self.stop()
+        raise RuntimeError("Fake OpenAI server did not start")
+
+    def stop(self):
+        if self._process is not None:
+            self._process.terminate()
+            try:
+                self._process.wait(timeout=5)
+            except subprocess.TimeoutExpired:
+                self._process.kill()
+                self._process.wait()
+            self._process = None
+
+    def configure(self, **changes) -> dict:
+        import httpx
+        response = httpx.post(f"{self.url}/_fake/config", json=changes, timeout=5)
+        response.raise_for_status()
+        return response.json()
+
+    def stats(self) -> dict:
+        import httpx
+        return httpx.get(f"{self.url}/_fake/stats", timeout=5).json()
+
+    def reset(self):
+        import httpx
+        httpx.post(f"{self.url}/_fake/reset", timeout=5).raise_for_status()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+
+def main():
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8100)
+    defaults = FakeConfig()
+    for field in fields(FakeConfig):
+        default = getattr(defaults, field.name)
+        kind = {"latency": str, "completion_tokens": int, "prompt_tokens": int, "seed": int}.get(field.name, float)
+        parser.add_argument(f"--{field.name.replace('_', '-')}", type=kind, default=default)
+    args = parser.parse_args()
+
+    sample_latency(args.latency, random.Random())  # fail fast on a bad spec
+    config = FakeConfig(**{field.name: getattr(args, field.name) for field in fields(FakeConfig)})
+    uvicorn.run(create_app(config), host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,389 @@
+"""
+End-to-end HTTP load test.
+
+Replays a weighted mix of user actions (register, login, list agents,
+purchase, invoke, fetch history) against the API over real HTTP. By default
+it starts the app under uvicorn on a scratch SQLite database, pointed at the
+fake OpenAI server, so nothing is billed:
+
+    python -m benchmarks.load_test --mode closed --concurrency 20 --duration 30
+    python -m benchmarks.load_test --mode open --rate 50 --duration 30 \\
+        --llm-latency lognormal:400:0.5 --llm-429 0.02 --output run.json
+
+``closed`` runs ``--concurrency`` users back to back (with ``--think-ms``
+between actions); ``open`` starts actions at Poisson arrivals of ``--rate``
+per second whether or not earlier ones have finished, and measures latency
+from the scheduled start so a slow server can't hide queueing. ``--url``
+targets an already running server instead (it must share the fake LLM
+settings you want, and expose Server-Timing for the db/llm breakdown).
+
+The JSON report has throughput, error rate, and per-route latency
+percentiles plus the mean server-side db and llm time from the
+``Server-Timing`` header.
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import re
+import subprocess
+import sys
+import tempfile
+import time
+import uuid
+from collections import defaultdict
+
+from benchmarks.fake_openai import FakeOpenAIServer, _free_port
+
+DEFAULT_MIX = "list=35,invoke=30,history=15,purchase=10,login=5,register=5"
+
+# The agent implementation that takes the invoke endpoint's JSON body
+INVOKABLE_AGENT = "Technical Troubleshooter"
+
+_TIMING = re.compile(r"(\w+);dur=([\d.]+)")
+
+
+def percentile(values, pct):
+    if not values:
+        return None
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, int(round(pct / 100 * len(ordered))) - 1))
+    return ordered[index]
+
+
+def parse_mix(spec):
+    mix = {}
+    for part in spec.split(","):
+        name, weight = part.split("=")
+        mix[name.strip()] = float(weight)
+    unknown = set(mix) - set(Scenario.ACTIONS)
+    if unknown:
+        raise SystemExit(f"Unknown actions in mix: {sorted(unknown)}")
+    return mix
+
+
+class Recorder:
+    def __init__(self):
+        self.latencies = defaultdict(list)
+        self.statuses = defaultdict(lambda: defaultdict(int))
+        self.errors = defaultdict(int)
+        self.server = defaultdict(lambda: defaultdict(float))
+        self.llm_errors = defaultdict(int)
+        self.recording = False
+
+    def record(self, route, latency, status_code, server_timing=None, llm_error=False):
+        if not self.recording:
+            return
+        self.latencies[route].append(latency)
+        self.statuses[route][status_code] += 1
+        if status_code == 0 or status_code >= 400:
+            self.errors[route] += 1
+        if llm_error:
+            self.llm_errors[route] += 1
+        for name, ms in _TIMING.findall(server_timing or ""):
+            self.server[route][name] += float(ms)
+
+    def report(self, elapsed):
+        routes = {}
+        for route, latencies in sorted(self.latencies.items()):
+            count = len(latencies)
+            server = self.server[route]
+            routes[route] = {
+                "count": count,
+                "throughput_rps": round(count / elapsed, 2),
+                "error_rate": round(self.errors[route] / count, 4),
+                "llm_error_rate": round(self.llm_errors[route] / count, 4),
+                "statuses": {str(code): n for code, n in sorted(self.statuses[route].items())},
+                "p50_ms": round(percentile(latencies, 50) * 1000, 2),
+                "p95_ms": round(percentile(latencies, 95) * 1000, 2),
+                "p99_ms": round(percentile(latencies, 99) * 1000, 2),
+                "max_ms": round(max(latencies) * 1000, 2),
+                "mean_ms": round(sum(latencies) / count * 1000, 2),
+                "server_mean_ms": {name: round(total / count, 2) for name, total in sorted(server.items())},
+            }
+        total = sum(len(latencies) for latencies in self.latencies.values())
+        everything = [latency for latencies in self.latencies.values() for latency in latencies]
+        return {
+            "requests": total,
+            "throughput_rps": round(total / elapsed, 2),
+            "error_rate": round(sum(self.errors.values()) / total, 4) if total else None,
+            "p50_ms": round(percentile(everything, 50) * 1000, 2) if everything else None,
+            "p95_ms": round(percentile(everything, 95) * 1000, 2) if everything else None,
+            "p99_ms": round(percentile(everything, 99) * 1000, 2) if everything else None,
+            "routes": routes,
+        }
+
+
+class Scenario:
+    """The marketplace as seen by a population of users."""
+
+    ACTIONS = ("register", "login", "list", "purchase", "invoke", "history")
+
+    def __init__(self, client, recorder, rng, password="loadtest-password"):
+        self.client = client
+        self.recorder = recorder
+        self.rng = rng
+        self.password = password
+        self.users = []
+        self.agent_ids = []
+        self.invokable_id = None
+
+    async def request(self, route, method, url, scheduled=None, **kwargs):
+        started = scheduled if scheduled is not None else time.perf_counter()
+        try:
+            response = await self.client.request(method, url, **kwargs)
+        except Exception:
+            self.recorder.record(route, time.perf_counter() - started, 0)
+            return None
+        llm_error = False
+        if route == "invoke" and response.status_code == 200:
+            # Agents report LLM failures in the body
+            llm_error = "error" in response.json()
+        self.recorder.record(
+            route, time.perf_counter() - started, response.status_code,
+            response.headers.get("server-timing"), llm_error,
+        )
+        return response
+
+    async def new_user(self, scheduled=None, developer=False):
+        username = f"load-{uuid.uuid4().hex[:12]}"
+        response = await self.request("register", "POST", "/users/register", scheduled, json={
+            "username": username,
+            "email": f"{username}@example.com",
+            "password": self.password,
+            "is_developer": developer,
+        })
+        if response is None or response.status_code != 200:
+            return None
+        user = {"username": username, "owned": set()}
+        await self.login(user)
+        return user
+
+    async def login(self, user, scheduled=None):
+        response = await self.request("login", "POST", "/token", scheduled, data={
+            "username": user["username"], "password": self.password
+        })
+        if response is not None and response.status_code == 200:
+            user["headers"] = {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+    async def setup(self, users, agents):
+        """Create the catalog and a pool of funded users. Not measured."""
+        developer = await self.new_user(developer=True)
+        if developer is None:
+            raise RuntimeError("Could not register the developer account")
+        for i in range(agents):
+            name = INVOKABLE_AGENT if i == 0 else f"Load Agent {i}"
+            response = await self.client.post("/agents/create", headers=developer["headers"], json={
+                "name": name, "description": "Load test agent", "price": 1.0
+            })
+            response.raise_for_status()
+            self.agent_ids.append(response.json()["id"])
+        self.invokable_id = self.agent_ids[0]
+        for _ in range(users):
+            user = await self.new_user()
+            await self.client.post("/tokens/purchase", headers=user["headers"], json={"amount": 1_000_000})
+            self.users.append(user)
+
+    async def run(self, action, scheduled=None):
+        user = self.rng.choice(self.users)
+        if action == "register":
+            new_user = await self.new_user(scheduled=scheduled)
+            if new_user is not None:
+                await self.client.post("/tokens/purchase", headers=new_user["headers"], json={"amount": 1_000_000})
+                self.users.append(new_user)
+        elif action == "login":
+            await self.login(user, scheduled)
+        elif action == "list":
+            await self.request("list", "GET", "/agents", scheduled, headers=user["headers"])
+        elif action == "purchase":
+            choices = [agent_id for agent_id in self.agent_ids if agent_id not in user["owned"]]
+            if not choices:
+                return await self.request("list", "GET", "/agents", scheduled, headers=user["headers"])
+            agent_id = self.rng.choice(choices)
+            user["owned"].add(agent_id)
+            await self.request("purchase", "POST", "/agents/purchase", scheduled, headers=user["headers"], json={
+                "agent_id": agent_id, "purchase_price": 1.0
+            })
+        elif action == "invoke":
+            await self.request("invoke", "POST", f"/agents/invoke/{self.invokable_id}", scheduled, headers=user["headers"], json={
+                "issue": "Service returns 502 after deploy", "system_info": "uvicorn behind nginx"
+            })
+        elif action == "history":
+            await self.request("history", "GET", "/users/me/invocations", scheduled, headers=user["headers"])
+
+
+async def closed_loop(scenario, mix, args, deadline):
+    actions, weights = list(mix), list(mix.values())
+
+    async def worker():
+        while time.perf_counter() < deadline:
+            await scenario.run(scenario.rng.choices(actions, weights)[0])
+            if args.think_ms:
+                await asyncio.sleep(scenario.rng.expovariate(1000 / args.think_ms))
+
+    await asyncio.gather(*(worker() for _ in range(args.concurrency)))
+
+
+async def open_loop(scenario, mix, args, deadline):
+    actions, weights = list(mix), list(mix.values())
+    in_flight = set()
+    dropped = 0
+    scheduled = time.perf_counter()
+    while True:
+        scheduled += scenario.rng.expovariate(args.rate)
+        if scheduled >= deadline:
+            break
+        await asyncio.sleep(max(0.0, scheduled - time.perf_counter()))
+        if len(in_flight) >= args.max_in_flight:
+            dropped += 1
+            continue
+        task = asyncio.create_task(scenario.run(scenario.rng.choices(actions, weights)[0], scheduled))
+        in_flight.add(task)
+        task.add_done_callback(in_flight.discard)
+    if in_flight:
+        await asyncio.wait(in_flight)
+    return dropped
+
+
+class AppServer:
+    """The API under uvicorn in a subprocess, on a scratch database."""
+
+    def __init__(self, directory, llm_base_url, workers=1):
+        self.port = _free_port()
+        self.url = f"http://127.0.0.1:{self.port}"
+        self.env = {
+            **os.environ,
+            "DATABASE_URL": f"sqlite:///{os.path.join(directory, 'load.db')}",
+            "OPENAI_API_KEY": "fake",
+            "OPENAI_BASE_URL": llm_base_url,
+            "SECRET_KEY": "load-test-secret",
+            "STRIPE_SECRET_KEY": "fake",
+            "STRIPE_PUBLISHABLE_KEY": "fake",
+            "RATE_LIMIT_ENABLED": "false",
+            "RATE_LIMIT_SQLITE_PATH": os.path.join(directory, "rate_limits.db"),
+            "INVALIDATION_SOCKET_DIR": os.path.join(directory, "invalidation"),
+            "SERVER_TIMING_ENABLED": "true",
+        }
+        self.workers = workers
+        self._process = None
+
+    def __enter__(self):
+        import httpx
+
+        root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        self._process = subprocess.Popen([
+            sys.executable, "-m", "uvicorn", "src.main:app",
+            "--port", str(self.port), "--workers", str(self.workers), "--log-level", "warning",
+        ], cwd=root, env=self.env, stdout=subprocess.DEVNULL)
+        deadline = time.monotonic() + 60
+        while time.monotonic() < deadline:
+            if self._process.poll() is not None:
+                raise RuntimeError(f"App server exited with {self._process.returncode}")
+            try:
+                httpx.get(f"{self.url}/agents", timeout=1)
+                return self
+            except httpx.TransportError:
+                time.sleep(0.2)
+        self.__exit__()
+        raise RuntimeError("App server did not start")
+
+    def __exit__(self, *exc_info):
+        if self._process is not None:
+            self._process.terminate()
+            self._process.wait(timeout=30)
+            self._process = None
+
+
+async def run(args, url, llm=None):
+    import httpx
+
+    mix = parse_mix(args.mix)
+    recorder = Recorder()
+    limits = httpx.Limits(max_connections=None, max_keepalive_connections=None)
+    async with httpx.AsyncClient(base_url=url, timeout=args.timeout, limits=limits) as client:
+        scenario = Scenario(client, recorder, random.Random(args.seed))
+        await scenario.setup(args.users, args.agents)
+        if llm is not None:
+            llm.reset()
+
+        if args.warmup:
+            await closed_loop(scenario, mix, args, time.perf_counter() + args.warmup)
+        recorder.recording = True
+        started = time.perf_counter()
+        deadline = started + args.duration
+        dropped = 0
+        if args.mode == "closed":
+            await closed_loop(scenario, mix, args, deadline)
+        else:
+            dropped = await open_loop(scenario, mix, args, deadline)
+        elapsed = time.perf_counter() - started
+        recorder.recording = False
+
+    report = {
+        "config": {
+            "mode": args.mode,
+            "concurrency": args.concurrency if args.mode == "closed" else None,
+            "rate": args.rate if args.mode == "open" else None,
+            "duration_s": args.duration,
+            "mix": mix,
+            "users": args.users,
+            "agents": args.agents,
+            "workers": args.workers,
+            "llm": {
+                "latency": args.llm_latency,
+                "tokens_per_second": args.llm_tps,
+                "rate_429": args.llm_429,
+                "rate_5xx": args.llm_5xx,
+            } if llm is not None else None,
+        },
+        "elapsed_s": round(elapsed, 2),
+        "dropped_arrivals": dropped,
+        **recorder.report(elapsed),
+    }
+    if llm is not None:
+        report["llm_server"] = llm.stats()
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", help="target a running server instead of starting one")
+    parser.add_argument("--mode", choices=("closed", "open"), default="closed")
+    parser.add_argument("--concurrency", type=int, default=10, help="closed loop users")
+    parser.add_argument("--think-ms", type=float, default=0, help="closed loop mean pause between actions")
+    parser.add_argument("--rate", type=float, default=20, help="open loop arrivals per second")
+    parser.add_argument("--max-in-flight", type=int, default=1000, help="open loop cap; arrivals beyond it are dropped")
+    parser.add_argument("--duration", type=float, default=30)
+    parser.add_argument("--warmup", type=float, default=0, help="seconds of unmeasured load first")
+    parser.add_argument("--mix", default=DEFAULT_MIX)
+    parser.add_argument("--users", type=int, default=50, help="pre-registered users")
+    parser.add_argument("--agents", type=int, default=20)
+    parser.add_argument("--workers", type=int, default=1, help="uvicorn workers when starting the app")
+    parser.add_argument("--timeout", type=float, default=60)
+    parser.add_argument("--llm-latency", default="lognormal:300:0.5")
+    parser.add_argument("--llm-tps", type=float, default=0)
+    parser.add_argument("--llm-429", type=float, default=0)
+    parser.add_argument("--llm-5xx", type=float, default=0)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", help="also write the report to this file")
+    args = parser.parse_args()
+
+    if args.url:
+        report = asyncio.run(run(args, args.url))
+    else:
+        with tempfile.TemporaryDirectory() as directory, FakeOpenAIServer(
+            latency=args.llm_latency, tokens_per_second=args.llm_tps,
+            rate_429=args.llm_429, rate_5xx=args.llm_5xx, seed=args.seed,
+        ) as llm, AppServer(directory, llm.base_url, args.workers) as app:
+            report = asyncio.run(run(args, app.url, llm))
+
+    output = json.dumps(report, indent=2)
+    print(output)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output + "\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,350 @@
+"""
+Micro-benchmarks for the code every request runs.
+
+Seeds a scratch SQLite database with agents, users and purchases, then
+times the request hot paths in-process with no network or LLM calls:
+JWT decode, principal and user lookup, ``list_agents`` with a warm and a
+cold catalog, ``AgentResponse`` construction, the invocation payload
+``json.dumps`` and the ``/agents/summarize`` extraction. Each case is
+calibrated to a minimum round time and run for several rounds; the per-op
+round times are the samples.
+
+Save a baseline on one commit and compare another against it. A case is
+reported faster or slower only when a Mann-Whitney U test on the samples
+is significant and the median moved by more than the threshold:
+
+    python -m benchmarks.micro --save baseline.json
+    python -m benchmarks.micro --compare baseline.json --fail-on-regression
+    python -m benchmarks.micro --filter auth --rounds 50
+"""
+import argparse
+import gc
+import json
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+CASES = {}
+
+TROUBLESHOOT_INPUT = {
+    "problem_description": "Service returns 502 after deploying the new ingress config",
+    "system_info": {"os": "Ubuntu 22.04", "runtime": "Python 3.11", "proxy": "nginx 1.24"},
+    "error_messages": ["upstream prematurely closed connection while reading response header"] * 3,
+}
+TROUBLESHOOT_OUTPUT = {
+    "troubleshooting_steps": {
+        "diagnosis": "The upstream keepalive timeout is shorter than the proxy's. " * 8,
+        "steps": [f"Step {i}: check the proxy and upstream timeouts and reload the service." for i in range(12)],
+        "prevention": "Keep proxy timeouts below the application's idle timeout. " * 4,
+    },
+    "token_usage": {"input_tokens": 412, "output_tokens": 655},
+    "cost": 0.0107,
+}
+
+
+def case(name):
+    """Register ``setup(env) -> callable``; the callable runs one op."""
+    def register(setup):
+        CASES[name] = setup
+        return setup
+    return register
+
+
+def run_coroutine(coro):
+    # The hot-path coroutines never suspend, so drive them directly rather
+    # than timing event loop scheduling
+    try:
+        coro.send(None)
+    except StopIteration as stop:
+        return stop.value
+    raise RuntimeError("coroutine suspended")
+
+
+class Env:
+    def __init__(self, args):
+        from src.auth.security import create_access_token
+        from src.auth.principal import access_token_claims
+        from src.database.models import Agent, User
+        from src.database.session import SessionLocal
+
+        self.args = args
+        self.SessionLocal = SessionLocal
+        with SessionLocal() as db:
+            self.user = db.get(User, 1)
+            self.token = create_access_token(data=access_token_claims(self.user))
+            self.agents = db.query(Agent).order_by(Agent.id).all()
+            db.expunge_all()
+
+
+def seed(path, args):
+    import random
+    from sqlalchemy import create_engine
+    from sqlalchemy.orm import Session
+    from src.database.models import Agent, AgentPurchase, Base, User
+
+    engine = create_engine(f"sqlite:///{path}")
+    Base.metadata.create_all(bind=engine)
+    rng = random.Random(args.seed)
+    now = datetime.utcnow()
+    with Session(engine) as db:
+        db.add_all(
+            User(id=i, username=f"user{i}", email=f"user{i}@example.com", hashed_password="x",
+                 is_developer=i <= args.developers, token_balance=1000.0)
+            for i in range(1, args.users + 1)
+        )
+        db.add_all(
+            Agent(id=i, name=f"Agent {i}", description=f"Benchmark agent {i} " * 5,
+                  developer_id=rng.randint(1, args.developers), price=round(rng.uniform(1, 50), 2),
+                  is_active=rng.random() > 0.05, created_at=now - timedelta(days=rng.randint(0, 365)))
+            for i in range(1, args.agents + 1)
+        )
+        # User 1 is the caller; it owns its share of the purchases
+        owned = rng.sample(range(1, args.agents + 1), min(args.agents, args.purchases // args.users))
+        purchases = [(1, agent_id) for agent_id in owned]
+        while len(purchases) < args.purchases:
+            purchases.append((rng.randint(2, args.users), rng.randint(1, args.agents)))
+        db.add_all(
+            AgentPurchase(user_id=user_id, agent_id=agent_id, purchase_price=10.0,
+                          purchase_date=now - timedelta(minutes=rng.randint(0, 500_000)))
+            for user_id, agent_id in purchases
+        )
+        db.commit()
+    engine.dispose()
+
+
+@case("auth.decode_access_token")
+def _decode(env):
+    from src.auth.security import decode_access_token
+    return lambda: decode_access_token(env.token)
+
+
+def _current_user(env, cold):
+    from src.auth.principal import principal_cache
+    from src.auth.security import get_current_principal, get_current_user
+
+    def op():
+        if cold:
+            principal_cache.invalidate(env.user.id)
+        # One session per op, as get_db gives each request
+        with env.SessionLocal() as db:
+            principal = run_coroutine(get_current_principal(token=env.token, api_key=None, db=db))
+            return run_coroutine(get_current_user(principal=principal, db=db))
+    return op
+
+
+@case("auth.get_current_user")
+def _current_user_warm(env):
+    return _current_user(env, cold=False)
+
+
+@case("auth.get_current_user.uncached")
+def _current_user_cold(env):
+    return _current_user(env, cold=True)
+
+
+def _list_agents(env, cold):
+    from fastapi import Response
+    from src.auth.security import get_current_principal
+    from src.main import list_agents
+    from src.marketplace.catalog import agent_catalog, purchased_cache
+
+    with env.SessionLocal() as db:
+        principal = run_coroutine(get_current_principal(token=env.token, api_key=None, db=db))
+
+    def op():
+        if cold:
+            agent_catalog.invalidate()
+            purchased_cache.invalidate(env.user.id)
+        with env.SessionLocal() as db:
+            return run_coroutine(list_agents(
+                response=Response(), sort=None, current_user=principal,
+                if_none_match=None, if_modified_since=None, db=db,
+            ))
+    return op
+
+
+@case("list_agents")
+def _list_agents_warm(env):
+    return _list_agents(env, cold=False)
+
+
+@case("list_agents.cold_catalog")
+def _list_agents_cold(env):
+    return _list_agents(env, cold=True)
+
+
+@case("agent_response.model_validate")
+def _agent_response(env):
+    from src.database.schemas import AgentResponse
+    return lambda: [AgentResponse.model_validate(agent) for agent in env.agents]
+
+
+@case("invoke.json_dumps")
+def _invoke_dumps(env):
+    # What the invocation writer serializes for each /agents/invoke call
+    return lambda: (json.dumps(TROUBLESHOOT_INPUT), json.dumps(TROUBLESHOOT_OUTPUT))
+
+
+def _summarize(env, request):
+    from src.main import summarize_conversation
+    return lambda: run_coroutine(summarize_conversation(request=request, current_user=None, db=None))
+
+
+@case("summarize.structured")
+def _summarize_structured(env):
+    return _summarize(env, {
+        "input_text": json.dumps({"code_review": {"code": "def f(x):\n    return x * 2\n" * 20, "language": "python"}}),
+        "output_text": json.dumps({"output_text": "Consider adding type hints and a docstring. " * 20}),
+    })
+
+
+@case("summarize.plain")
+def _summarize_plain(env):
+    return _summarize(env, {
+        "input_text": "How do I prepare for a system design interview? " * 5,
+        "output_text": "Start with requirements, then estimate load and sketch components. " * 10,
+    })
+
+
+def measure(op, rounds, min_round_time):
+    """Per-op seconds for each of ``rounds`` rounds, after calibration."""
+    op()  # warm caches and imports
+    number = 1
+    while True:
+        started = time.perf_counter()
+        for _ in range(number):
+            op()
+        if time.perf_counter() - started >= min_round_time:
+            break
+        number *= 2
+    samples = []
+    gc_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        for _ in range(rounds):
+            started = time.perf_counter()
+            for _ in range(number):
+                op()
+            samples.append((time.perf_counter() - started) / number)
+    finally:
+        if gc_enabled:
+            gc.enable()
+    return number, samples
+
+
+def describe(number, samples):
+    quartiles = statistics.quantiles(samples, n=4) if len(samples) > 1 else [samples[0]] * 3
+    return {
+        "ops_per_round": number,
+        "median_us": round(statistics.median(samples) * 1e6, 3),
+        "mean_us": round(statistics.fmean(samples) * 1e6, 3),
+        "stdev_us": round(statistics.stdev(samples) * 1e6, 3) if len(samples) > 1 else 0.0,
+        "iqr_us": round((quartiles[2] - quartiles[0]) * 1e6, 3),
+        "min_us": round(min(samples) * 1e6, 3),
+        "samples": samples,
+    }
+
+
+def compare(current, baseline, alpha, threshold):
+    """Per-case verdict of ``current`` against ``baseline`` results."""
+    from scipy.stats import mannwhitneyu
+
+    report = {}
+    for name, result in current.items():
+        base = baseline.get(name)
+        if base is None:
+            report[name] = {"status": "new"}
+            continue
+        ratio = result["median_us"] / base["median_us"]
+        p_value = float(mannwhitneyu(result["samples"], base["samples"], alternative="two-sided").pvalue)
+        status = "unchanged"
+        if p_value < alpha and ratio > 1 + threshold:
+            status = "slower"
+        elif p_value < alpha and ratio < 1 - threshold:
+            status = "faster"
+        report[name] = {
+            "status": status,
+            "baseline_median_us": base["median_us"],
+            "median_us": result["median_us"],
+            "change_pct": round((ratio - 1) * 100, 1),
+            "p_value": round(p_value, 5),
+        }
+    return report
+
+
+def run(args):
+    env = Env(args)
+    results = {}
+    for name, setup in CASES.items():
+        if args.filter and not any(pattern in name for pattern in args.filter):
+            continue
+        number, samples = measure(setup(env), args.rounds, args.min_round_time)
+        results[name] = describe(number, samples)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--agents", type=int, default=200)
+    parser.add_argument("--purchases", type=int, default=5000)
+    parser.add_argument("--users", type=int, default=100)
+    parser.add_argument("--developers", type=int, default=20)
+    parser.add_argument("--rounds", type=int, default=20)
+    parser.add_argument("--min-round-time", type=float, default=0.05, help="seconds")
+    parser.add_argument("--filter", action="append", help="only cases containing this; repeatable")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--save", help="write results here as a baseline")
+    parser.add_argument("--compare", help="baseline file to compare against")
+    parser.add_argument("--alpha", type=float, default=0.01, help="significance level")
+    parser.add_argument("--threshold", type=float, default=0.05, help="minimum relative change to report")
+    parser.add_argument("--fail-on-regression", action="store_true", help="exit 1 if any case is slower")
+    parser.add_argument("--samples", action="store_true", help="include raw samples in the report")
+    args = parser.parse_args()
+
+    directory = tempfile.TemporaryDirectory()
+    path = os.path.join(directory.name, "micro.db")
+    # Settings are read at import time; the database is always the seeded one
+    os.environ["DATABASE_URL"] = f"sqlite:///{path}"
+    os.environ["INVALIDATION_BACKEND"] = "memory"
+    for name in ("SECRET_KEY", "OPENAI_API_KEY", "STRIPE_SECRET_KEY", "STRIPE_PUBLISHABLE_KEY"):
+        os.environ.setdefault(name, "bench")
+
+    with directory:
+        seed(path, args)
+        results = run(args)
+
+    report = {
+        "meta": {
+            "python": platform.python_version(),
+            "machine": platform.machine(),
+            "agents": args.agents,
+            "purchases": args.purchases,
+            "users": args.users,
+            "rounds": args.rounds,
+            "created_at": datetime.utcnow().isoformat(timespec="seconds"),
+        },
+        "cases": results,
+    }
+    if args.save:
+        with open(args.save, "w") as f:
+            json.dump(report, f, indent=2)
+    exit_code = 0
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        report["comparison"] = compare(results, baseline["cases"], args.alpha, args.threshold)
+        if args.fail_on_regression and any(c["status"] == "slower" for c in report["comparison"].values()):
+            exit_code = 1
+    if not args.samples:
+        for result in results.values():
+            result.pop("samples")
+    print(json.dumps(report, indent=2))
+    sys.exit(exit_code)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,6 +1,6 @@
 import React, { useState, useEffect } from 'react';
-import { useParams, useLocation } from 'react-router-dom';
-import { Container, Typography, Box, Button, TextField, Paper, Alert, CircularProgress } from '@mui/material';
+import { useParams, useLocation, Link as RouterLink } from 'react-router-dom';
+import { Container, Typography, Box, Button, TextField, Paper, Alert, CircularProgress, Chip, Stack } from '@mui/material';
 import SendIcon from '@mui/icons-material/Send';
 import { useAuth } from '../store/AuthContext';
 import { agentService } from '../services/agent';
@@ -28,6 +28,7 @@ export const AgentDetails: React.FC = () => {
   const [previousContext, setPreviousContext] = useState<{query: string; response: string} | null>(null);
   const [error, setError] = useState<string | null>(null);
   const [loading, setLoading] = useState(true);
+  const [recommendations, setRecommendations] = useState<Agent[]>([]);
 
   useEffect(() => {
     const fetchAgent = async () => {
@@ -62,6 +63,16 @@ export const AgentDetails: React.FC = () => {
     fetchAgent();
   }, [token, params.id, previousChat]);
 
+  useEffect(() => {
+    const fetchRecommendations = async () => {
+      if (!token || !params.id) return;
+      const response = await agentService.getRecommendations(token, parseInt(params.id, 10));
+      setRecommendations(response.status === 'success' && response.data ? response.data : []);
+    };
+
+    fetchRecommendations();
+  }, [token, params.id]);
+
   const handlePurchase = async () => {
     if (!agent || !token) return;
 
@@ -133,6 +144,26 @@ export const AgentDetails: React.FC = () => {
           <Typography variant="subtitle1" gutterBottom>
             Price: {agent.price} tokens
           </Typography>
+
+          {recommendations.length > 0 && (
+            <Box sx={{ mt: 2 }}>
+              <Typography variant="subtitle2" color="text.secondary" gutterBottom>
+                Users who bought this also bought
+              </Typography>
+              <Stack direction="row" spacing={1} flexWrap="wrap" useFlexGap>
+                {recommendations.map((recommended) => (
+                  <Chip
+                    key={recommended.id}
+                    label={recommended.name}
+                    component={RouterLink}
+                    to={`/agents/${recommended.id}`}
+                    clickable
+                    variant={recommended.is_purchased ? 'filled' : 'outlined'}
+                  />
+                ))}
+              </Stack>
+            </Box>
+          )}
           
           <Typography variant="h6" gutterBottom sx={{ mt: 4 }}>
             Try it out
@@ -118,9 +118,9 @@ export const Analytics: React.FC = () => {
                     />
                     <Line
                       type="monotone"
-                      dataKey="success_rate"
+                      dataKey="p95_latency_ms"
                       stroke="#82ca9d"
-                      name="Success Rate (%)"
+                      name="p95 Latency (ms)"
                     />
                     <Line
                       type="monotone"
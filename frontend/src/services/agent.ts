@@ -26,6 +26,20 @@ const agentService = {
     }
   },
 
+  getRecommendations: async (token: string, id: number): Promise<ApiResponse<Agent[]>> => {
+    try {
+      const api = createAuthenticatedApi(token);
+      const response = await api.get<Agent[]>(`/agents/${id}/recommendations`);
+      return { data: response.data, status: 'success' };
+    } catch (error: any) {
+      const errorMessage = error.response?.data?.detail;
+      return {
+        error: typeof errorMessage === 'string' ? errorMessage : 'Failed to fetch recommendations',
+        status: 'error'
+      };
+    }
+  },
+
   listAgents: async (token: string): Promise<ApiResponse<Agent[]>> => {
     try {
       const api = createAuthenticatedApi(token);
@@ -1,5 +1,6 @@
 import axios, { AxiosInstance, AxiosResponse } from 'axios';
 import type { ApiResponse } from '../types/api';
+import { authService } from './auth';
 
 const BASE_URL = process.env.REACT_APP_API_URL || 'http://localhost:8000';
 
@@ -14,13 +15,30 @@ const defaultConfig = {
 export const api = axios.create(defaultConfig);
 
 export const createAuthenticatedApi = (token: string): AxiosInstance => {
-  return axios.create({
+  const instance = axios.create({
     ...defaultConfig,
     headers: {
       ...defaultConfig.headers,
       Authorization: `Bearer ${token}`,
     },
   });
+
+  // An expired access token gets one retry with a refreshed token
+  const retried = new WeakSet<object>();
+  instance.interceptors.response.use(undefined, async (error) => {
+    const request = error.config;
+    if (error.response?.status !== 401 || !request || retried.has(request)) {
+      return Promise.reject(error);
+    }
+    const freshToken = await authService.refreshSession();
+    if (!freshToken) {
+      return Promise.reject(error);
+    }
+    retried.add(request);
+    request.headers.Authorization = `Bearer ${freshToken}`;
+    return instance(request);
+  });
+  return instance;
 };
 
 // Add response interceptor to standardize success responses
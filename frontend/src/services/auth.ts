@@ -18,6 +18,92 @@ interface AuthResponseData {
   user: User;
 }
 
+interface TokenResponse {
+  access_token: string;
+  expires_in?: number;
+  refresh_token?: string;
+}
+
+// The session lives in localStorage so every tab and service sees the
+// latest access token; refresh tokens are single-use, so only the most
+// recently rotated one may be sent
+const TOKEN_KEY = 'token';
+const REFRESH_TOKEN_KEY = 'refresh_token';
+const EXPIRES_AT_KEY = 'token_expires_at';
+
+type SessionListener = (token: string | null) => void;
+const sessionListeners = new Set<SessionListener>();
+
+const getAccessToken = (): string | null => localStorage.getItem(TOKEN_KEY);
+
+// Milliseconds since the epoch at which the access token expires, if known
+const getExpiresAt = (): number | null => {
+  const value = localStorage.getItem(EXPIRES_AT_KEY);
+  return value ? Number(value) : null;
+};
+
+const saveSession = (data: TokenResponse) => {
+  localStorage.setItem(TOKEN_KEY, data.access_token);
+  if (data.refresh_token) {
+    localStorage.setItem(REFRESH_TOKEN_KEY, data.refresh_token);
+  }
+  if (data.expires_in) {
+    localStorage.setItem(EXPIRES_AT_KEY, String(Date.now() + data.expires_in * 1000));
+  } else {
+    localStorage.removeItem(EXPIRES_AT_KEY);
+  }
+  sessionListeners.forEach((listener) => listener(data.access_token));
+};
+
+const clearSession = () => {
+  localStorage.removeItem(TOKEN_KEY);
+  localStorage.removeItem(REFRESH_TOKEN_KEY);
+  localStorage.removeItem(EXPIRES_AT_KEY);
+  sessionListeners.forEach((listener) => listener(null));
+};
+
+// Subscribe to access token changes; returns the unsubscribe function
+const onSessionChange = (listener: SessionListener): (() => void) => {
+  sessionListeners.add(listener);
+  return () => {
+    sessionListeners.delete(listener);
+  };
+};
+
+let refreshInFlight: Promise<string | null> | null = null;
+
+// Swap the refresh token for a new access token. Concurrent callers share
+// one request, since presenting a rotated refresh token twice revokes the
+// whole session. Resolves to null when there is no session to refresh.
+const refreshSession = (): Promise<string | null> => {
+  if (!refreshInFlight) {
+    refreshInFlight = rotateRefreshToken().finally(() => {
+      refreshInFlight = null;
+    });
+  }
+  return refreshInFlight;
+};
+
+const rotateRefreshToken = async (): Promise<string | null> => {
+  const refreshToken = localStorage.getItem(REFRESH_TOKEN_KEY);
+  if (!refreshToken) {
+    return null;
+  }
+  try {
+    const response = await api.post<TokenResponse>('/token/refresh', { refresh_token: refreshToken });
+    saveSession(response.data);
+    return response.data.access_token;
+  } catch (error: any) {
+    if (error.response?.status === 401) {
+      // Expired, revoked or replayed: the user has to log in again
+      clearSession();
+    } else {
+      console.error('Token refresh error:', error);
+    }
+    return null;
+  }
+};
+
 const login = async (credentials: LoginCredentials): Promise<ApiResponse<AuthResponseData>> => {
   try {
     // Use URLSearchParams for form data
@@ -37,6 +123,7 @@ const login = async (credentials: LoginCredentials): Promise<ApiResponse<AuthRes
     }
 
     const { access_token } = tokenResponse.data;
+    saveSession(tokenResponse.data);
 
     // Set the token in the api instance
     api.defaults.headers.common['Authorization'] = `Bearer ${access_token}`;
@@ -125,31 +212,16 @@ const updateUser = async (token: string, data: Partial<User>): Promise<ApiRespon
 };
 
 const logout = async (): Promise<void> => {
+  const refreshToken = localStorage.getItem(REFRESH_TOKEN_KEY);
+  clearSession();
   // Clear the Authorization header
   delete api.defaults.headers.common['Authorization'];
-};
-
-const refreshToken = async (token: string): Promise<ApiResponse<AuthResponseData>> => {
-  try {
-    const response = await api.post(
-      '/token/refresh',
-      {},
-      {
-        headers: { Authorization: `Bearer ${token}` },
-      }
-    );
-    return {
-      data: {
-        token: response.data.access_token,
-        user: response.data.user,
-      },
-      status: 'success',
-    };
-  } catch (error: any) {
-    return {
-      error: error.response?.data?.detail || 'Token refresh failed',
-      status: 'error',
-    };
+  if (refreshToken) {
+    try {
+      await api.post('/token/revoke', { refresh_token: refreshToken });
+    } catch (error: any) {
+      console.error('Token revoke error:', error);
+    }
   }
 };
 
@@ -206,7 +278,11 @@ export const authService = {
   getCurrentUser,
   updateUser,
   logout,
-  refreshToken,
+  getAccessToken,
+  getExpiresAt,
+  clearSession,
+  onSessionChange,
+  refreshSession,
   updatePassword,
   resetPassword,
   requestPasswordReset,
@@ -11,26 +11,40 @@ interface AuthContextType extends AuthState {
 
 const AuthContext = createContext<AuthContextType | null>(null);
 
+// Refresh this long before the access token expires
+const REFRESH_MARGIN_MS = 60 * 1000;
+
 export const AuthProvider: React.FC<{ children: React.ReactNode }> = ({ children }) => {
   const [user, setUser] = useState<User | null>(null);
-  const [token, setToken] = useState<string | null>(localStorage.getItem('token'));
+  const [token, setToken] = useState<string | null>(authService.getAccessToken());
   const [loading, setLoading] = useState(true);
   const [error, setError] = useState<string | null>(null);
 
+  useEffect(() => {
+    // Follow refreshes and logouts made by the services
+    return authService.onSessionChange((newToken) => {
+      setToken(newToken);
+      if (!newToken) {
+        setUser(null);
+      }
+    });
+  }, []);
+
   useEffect(() => {
     const initializeAuth = async () => {
-      const storedToken = localStorage.getItem('token');
+      const storedToken = authService.getAccessToken();
       if (storedToken) {
-        try {
-          const response = await authService.getCurrentUser(storedToken);
-          if (response.status === 'success' && response.data) {
-            setUser(response.data);
-            setToken(storedToken);
+        let response = await authService.getCurrentUser(storedToken);
+        if (response.status !== 'success') {
+          // The access token may just have expired while the app was closed
+          const refreshedToken = await authService.refreshSession();
+          if (refreshedToken) {
+            response = await authService.getCurrentUser(refreshedToken);
           }
-        } catch (error) {
-          localStorage.removeItem('token');
-          setToken(null);
-          setUser(null);
+        }
+        // A rejected refresh token has already cleared the session
+        if (response.status === 'success' && response.data) {
+          setUser(response.data);
         }
       }
       setLoading(false);
@@ -39,13 +53,23 @@ export const AuthProvider: React.FC<{ children: React.ReactNode }> = ({ children
     initializeAuth();
   }, []);
 
+  useEffect(() => {
+    const expiresAt = authService.getExpiresAt();
+    if (!token || !expiresAt) {
+      return;
+    }
+    const timer = setTimeout(() => {
+      authService.refreshSession();
+    }, Math.max(0, expiresAt - Date.now() - REFRESH_MARGIN_MS));
+    return () => clearTimeout(timer);
+  }, [token]);
+
   const login = async (credentials: LoginCredentials) => {
     setError(null);
     try {
       const response = await authService.login(credentials);
       if (response.status === 'success' && response.data) {
         const { token: newToken, user: newUser } = response.data;
-        localStorage.setItem('token', newToken);
         setToken(newToken);
         setUser(newUser);
       } else {
@@ -62,7 +86,6 @@ export const AuthProvider: React.FC<{ children: React.ReactNode }> = ({ children
       const response = await authService.register({ ...data, confirm_password: data.password });
       if (response.status === 'success' && response.data) {
         const { token: newToken, user: newUser } = response.data;
-        localStorage.setItem('token', newToken);
         setToken(newToken);
         setUser(newUser);
       } else {
@@ -74,9 +97,7 @@ export const AuthProvider: React.FC<{ children: React.ReactNode }> = ({ children
   };
 
   const logout = () => {
-    localStorage.removeItem('token');
-    setToken(null);
-    setUser(null);
+    authService.logout();
   };
 
   const updateUser = async (data: Partial<User>) => {
@@ -85,8 +85,12 @@ export interface AgentPurchaseResponse {
 export interface TimeSeriesData {
   timestamp: string;
   invocations: number;
-  success_rate: number;
-  average_response_time: number;
+  tokens: number;
+  revenue: number;
+  average_response_time: number | null;
+  p50_latency_ms: number | null;
+  p95_latency_ms: number | null;
+  p99_latency_ms: number | null;
 }
 
 export interface AgentAnalytics {
@@ -0,0 +1,50 @@
+"""
+Bulk-load a synthetic dataset for benchmarks, index tests and migration
+rehearsals. The tables must exist and be empty (run ``alembic upgrade``
+first, or pass --create-schema); the same seed always produces the same
+rows:
+
+    python -m scripts.generate_data --users 1000000 --agents 50000 \\
+        --purchases 5000000 --invocations 100000000
+    python -m scripts.generate_data --url sqlite:///scratch.db --create-schema --invocations 100000
+"""
+import argparse
+import json
+import logging
+
+from src.config import get_settings
+from src.database.synthetic import SyntheticConfig, generate
+
+# Worker processes may re-import this module
+if __name__ == "__main__":
+    settings = get_settings()
+    defaults = SyntheticConfig()
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", default=settings.DATABASE_URL, help="defaults to DATABASE_URL")
+    parser.add_argument("--users", type=int, default=defaults.users)
+    parser.add_argument("--agents", type=int, default=defaults.agents)
+    parser.add_argument("--purchases", type=int, default=defaults.purchases)
+    parser.add_argument("--invocations", type=int, default=defaults.invocations)
+    parser.add_argument("--developer-share", type=float, default=defaults.developer_share)
+    parser.add_argument("--days", type=int, default=defaults.days)
+    parser.add_argument("--no-payloads", action="store_true", help='store "{}" instead of realistic payloads')
+    parser.add_argument("--seed", type=int, default=defaults.seed)
+    parser.add_argument("--chunk-size", type=int, default=defaults.chunk_size)
+    parser.add_argument("--workers", type=int, help="generator processes; defaults to the CPU count")
+    parser.add_argument("--create-schema", action="store_true", help="create missing tables from the models")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    config = SyntheticConfig(
+        users=args.users,
+        agents=args.agents,
+        purchases=args.purchases,
+        invocations=args.invocations,
+        developer_share=args.developer_share,
+        days=args.days,
+        payloads=not args.no_payloads,
+        seed=args.seed,
+        chunk_size=args.chunk_size,
+    )
+    print(json.dumps(generate(args.url, config, workers=args.workers, create_schema=args.create_schema)))
@@ -0,0 +1,25 @@
+"""
+Add invocations written before the history search index existed (or
+before it was rebuilt) to the index. Run once after deploying, or when
+the app logs history_search.backfill_needed; it can run alongside the
+app and resumes where it stopped:
+
+    python -m scripts.index_history
+"""
+import argparse
+import logging
+
+from src.database.session import SessionLocal
+from src.search.history import history_index
+
+parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+parser.add_argument("--batch-size", type=int, default=1000, help="invocations indexed per transaction")
+args = parser.parse_args()
+
+logging.basicConfig(level=logging.INFO)
+db = SessionLocal()
+try:
+    history_index.ensure_schema(db)
+    print(f"{history_index.backfill(db, batch_size=args.batch_size)} invocations indexed")
+finally:
+    db.close()
@@ -0,0 +1,30 @@
+"""
+Compute developer payouts for every period that has closed, e.g. from cron:
+
+    python -m scripts.run_payouts
+    python -m scripts.run_payouts --period week --since 2026-01-01
+"""
+import argparse
+import logging
+from datetime import datetime
+
+from src.config import get_settings
+from src.database.session import SessionLocal
+from src.marketplace.payouts import PERIODS, PayoutEngine
+
+settings = get_settings()
+
+parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+parser.add_argument("--period", choices=PERIODS, default=settings.PAYOUT_PERIOD)
+parser.add_argument("--since", type=datetime.fromisoformat, help="first period to (re)compute")
+parser.add_argument("--until", type=datetime.fromisoformat, default=datetime.utcnow(), help="defaults to now")
+args = parser.parse_args()
+
+logging.basicConfig(level=logging.INFO)
+db = SessionLocal()
+try:
+    engine = PayoutEngine(period=args.period, chunk_size=settings.PAYOUT_CHUNK_SIZE)
+    payouts = engine.run(db, until=args.until, since=args.since)
+    print(f"{len(payouts)} payouts, {sum(payout.amount for payout in payouts):.2f} total")
+finally:
+    db.close()
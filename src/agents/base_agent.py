@@ -1,6 +1,9 @@
 from abc import ABC, abstractmethod
 from typing import Dict, Any
 
+from src.observability.metrics import observe_completion
+from src.observability.tracing import CLIENT, tracer
+
 class BaseAgent(ABC):
     def __init__(self, name: str, description: str, price_per_token: float):
         self.name = name
@@ -17,6 +20,21 @@ class BaseAgent(ABC):
         """
         pass
 
+    async def create_completion(self, **kwargs):
+        """
+        ``self.client.chat.completions.create`` in a trace span, with
+        upstream latency, token and cost metrics recorded for this agent.
+        """
+        with tracer.span("llm chat.completions", CLIENT, **{"llm.agent": self.name, "llm.model": kwargs.get("model")}) as span:
+            response = await observe_completion(
+                self.name, self.client.chat.completions.create, self.calculate_token_cost, **kwargs
+            )
+            usage = getattr(response, "usage", None)
+            if span is not None and usage is not None:
+                span.set_attribute("llm.tokens.input", usage.prompt_tokens)
+                span.set_attribute("llm.tokens.output", usage.completion_tokens)
+            return response
+
     def calculate_token_cost(self, input_tokens: int, output_tokens: int) -> float:
         """
         Calculate the total token cost for the agent's usage.
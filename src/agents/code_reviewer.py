@@ -12,7 +12,7 @@ class CodeReviewAgent(BaseAgent):
             price_per_token=0.0002  # $0.0002 per token
         )
         settings = get_settings()
-        self.client = AsyncOpenAI(api_key=settings.OPENAI_API_KEY)
+        self.client = AsyncOpenAI(api_key=settings.OPENAI_API_KEY, base_url=settings.OPENAI_BASE_URL)
 
     async def process_request(self, code: str, language: str = "python", context: str = None) -> Dict[str, Any]:
         """
@@ -30,7 +30,7 @@ class CodeReviewAgent(BaseAgent):
                 prompt += f" with the following context: {context}"
             prompt += f":\n\n{code}"
             
-            response = await self.client.chat.completions.create(
+            response = await self.create_completion(
                 model="gpt-4-turbo-preview",
                 messages=[
                     {"role": "system", "content": f"You are an expert code reviewer for {language} programming language. Provide detailed, constructive feedback focusing on: 1) Correctness, 2) Efficiency, 3) Style, and 4) Specific suggestions for improvement."},
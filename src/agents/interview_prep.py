@@ -11,7 +11,7 @@ class InterviewPrepAgent(BaseAgent):
             price_per_token=0.0002  # $0.0002 per token
         )
         settings = get_settings()
-        self.client = AsyncOpenAI(api_key=settings.OPENAI_API_KEY)
+        self.client = AsyncOpenAI(api_key=settings.OPENAI_API_KEY, base_url=settings.OPENAI_BASE_URL)
 
     async def process_request(self, topic: str, experience_level: str = "entry", context: str = None) -> Dict[str, Any]:
         """
@@ -28,7 +28,7 @@ class InterviewPrepAgent(BaseAgent):
             if context:
                 prompt += f" with this additional context: {context}"
             
-            response = await self.client.chat.completions.create(
+            response = await self.create_completion(
                 model="gpt-4-turbo-preview",
                 messages=[
                     {"role": "system", "content": "You are an expert technical interviewer. Provide detailed interview preparation focusing on: 1) Common Questions & Best Answers, 2) Technical Concepts to Review, 3) Coding Problems to Practice, and 4) Tips for Success."},
@@ -11,7 +11,7 @@ class ResumeReviewerAgent(BaseAgent):
             price_per_token=0.0002  # $0.0002 per token
         )
         settings = get_settings()
-        self.client = AsyncOpenAI(api_key=settings.OPENAI_API_KEY)
+        self.client = AsyncOpenAI(api_key=settings.OPENAI_API_KEY, base_url=settings.OPENAI_BASE_URL)
 
     async def process_request(self, resume_text: str, context: str = None) -> Dict[str, Any]:
         """
@@ -28,7 +28,7 @@ class ResumeReviewerAgent(BaseAgent):
                 prompt += f" for a {context} position"
             prompt += f":\n\n{resume_text}"
             
-            response = await self.client.chat.completions.create(
+            response = await self.create_completion(
                 model="gpt-4-turbo-preview",
                 messages=[
                     {"role": "system", "content": "You are an expert resume reviewer. Provide detailed, constructive feedback focusing on: 1) Content & Impact, 2) Structure & Organization, 3) Language & Clarity, and 4) Specific suggestions for improvement."},
@@ -11,7 +11,7 @@ class TechnicalTroubleshooterAgent(BaseAgent):
             price_per_token=0.0002  # $0.0002 per token
         )
         settings = get_settings()
-        self.client = AsyncOpenAI(api_key=settings.OPENAI_API_KEY)
+        self.client = AsyncOpenAI(api_key=settings.OPENAI_API_KEY, base_url=settings.OPENAI_BASE_URL)
 
     async def process_request(self, input_data: Dict[str, Any]) -> Dict[str, Any]:
         """
@@ -33,7 +33,7 @@ class TechnicalTroubleshooterAgent(BaseAgent):
                 prompt += f"\nAdditional Context: {context}"
 
             # Call OpenAI API
-            response = await self.client.chat.completions.create(
+            response = await self.create_completion(
                 model="gpt-4-turbo-preview",
                 messages=[
                     {"role": "system", "content": "You are a technical troubleshooting expert."},
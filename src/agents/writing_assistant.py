@@ -11,7 +11,7 @@ class WritingAssistantAgent(BaseAgent):
             price_per_token=0.0002  # $0.0002 per token
         )
         settings = get_settings()
-        self.client = AsyncOpenAI(api_key=settings.OPENAI_API_KEY)
+        self.client = AsyncOpenAI(api_key=settings.OPENAI_API_KEY, base_url=settings.OPENAI_BASE_URL)
 
     async def process_request(self, text: str, style: str = None, context: str = None) -> Dict[str, Any]:
         """
@@ -31,7 +31,7 @@ class WritingAssistantAgent(BaseAgent):
                 prompt += f" with this additional context: {context}"
             prompt += f":\n\n{text}"
             
-            response = await self.client.chat.completions.create(
+            response = await self.create_completion(
                 model="gpt-4-turbo-preview",
                 messages=[
                     {"role": "system", "content": "You are an expert writing assistant. Provide detailed feedback and improvements focusing on: 1) Clarity & Coherence, 2) Grammar & Style, 3) Tone & Voice, and 4) Specific Suggestions for Enhancement."},
@@ -0,0 +1,269 @@
+import asyncio
+import logging
+from collections import defaultdict
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import text
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from ..database.models import AnalyticsRollup, AnalyticsWatermark
+from .sketch import LatencySketch
+
+logger = logging.getLogger(__name__)
+
+HOUR = "hour"
+DAY = "day"
+GRANULARITIES = (HOUR, DAY)
+
+AGENT = "agent"
+DEVELOPER = "developer"
+
+WATERMARK = "invocation_rollups"
+
+RollupKey = Tuple[str, str, int, datetime]
+
+
+def bucket_start(at: datetime, granularity: str) -> datetime:
+    if granularity == HOUR:
+        return at.replace(minute=0, second=0, microsecond=0)
+    return at.replace(hour=0, minute=0, second=0, microsecond=0)
+
+
+@dataclass
+class _Partial:
+    invocations: int = 0
+    tokens: int = 0
+    revenue: float = 0.0
+    latency_sum_ms: float = 0.0
+    sketch: LatencySketch = field(default_factory=LatencySketch)
+
+    def add(self, tokens: int, revenue: float, latency_ms: Optional[float]):
+        self.invocations += 1
+        self.tokens += tokens
+        self.revenue += revenue
+        if latency_ms is not None:
+            self.latency_sum_ms += latency_ms
+            self.sketch.add(latency_ms)
+
+
+class RollupJob:
+    """
+    Folds new invocation rows into hourly and daily rollups.
+
+    Each run reads invocations past the watermark in id order, aggregates
+    them per (granularity, agent or developer, bucket) and merges the
+    partials into ``analytics_rollups``. The watermark advances in the same
+    transaction with a compare-and-set, so a run racing another worker's
+    rolls back instead of counting rows twice.
+
+    Rows younger than ``settle_seconds`` are left for the next run: ids are
+    handed out before commit, so a lower id can still become visible after
+    a higher one has been read.
+    """
+
+    def __init__(self, batch_size: int = 5000, settle_seconds: float = 30.0, clock=datetime.utcnow):
+        self.batch_size = batch_size
+        self.settle_seconds = settle_seconds
+        self._clock = clock
+
+    def run_once(self, db: Session) -> int:
+        """Process one batch; returns the number of invocations rolled up."""
+        start_id = db.query(AnalyticsWatermark.last_invocation_id).filter(
+            AnalyticsWatermark.name == WATERMARK
+        ).scalar()
+        if start_id is None:
+            try:
+                db.add(AnalyticsWatermark(name=WATERMARK, last_invocation_id=0, updated_at=self._clock()))
+                db.commit()
+            except IntegrityError:
+                # Another worker created it first
+                db.rollback()
+            start_id = 0
+        settled_before = self._clock() - timedelta(seconds=self.settle_seconds)
+
+        rows = db.execute(
+            text(
+                "SELECT inv.id, inv.agent_id, agents.developer_id, inv.tokens_used, "
+                "inv.cost, inv.latency_ms, inv.created_at "
+                "FROM agent_invocations inv LEFT JOIN agents ON agents.id = inv.agent_id "
+                "WHERE inv.id > :start_id ORDER BY inv.id LIMIT :limit"
+            ),
+            {"start_id": start_id, "limit": self.batch_size},
+        ).all()
+
+        partials: Dict[RollupKey, _Partial] = defaultdict(_Partial)
+        last_id = start_id
+        processed = 0
+        for row in rows:
+            created_at = _as_datetime(row.created_at)
+            if created_at > settled_before:
+                break
+            scopes = [(AGENT, row.agent_id)]
+            if row.developer_id is not None:
+                scopes.append((DEVELOPER, row.developer_id))
+            for granularity in GRANULARITIES:
+                start = bucket_start(created_at, granularity)
+                for scope, scope_id in scopes:
+                    partials[(granularity, scope, scope_id, start)].add(
+                        row.tokens_used or 0, row.cost or 0.0, row.latency_ms
+                    )
+            last_id = row.id
+            processed += 1
+        if not processed:
+            db.rollback()
+            return 0
+
+        self._merge(db, partials)
+        claimed = db.query(AnalyticsWatermark).filter(
+            AnalyticsWatermark.name == WATERMARK,
+            AnalyticsWatermark.last_invocation_id == start_id
+        ).update({
+            AnalyticsWatermark.last_invocation_id: last_id,
+            AnalyticsWatermark.updated_at: self._clock(),
+        }, synchronize_session=False)
+        if claimed != 1:
+            # Another worker rolled this range up first
+            db.rollback()
+            return 0
+        db.commit()
+        return processed
+
+    def run_until_caught_up(self, db: Session) -> int:
+        total = 0
+        while True:
+            processed = self.run_once(db)
+            total += processed
+            if processed < self.batch_size:
+                return total
+
+    def _merge(self, db: Session, partials: Dict[RollupKey, _Partial]):
+        # Fetch the rows to update through the unique index, one query per
+        # (granularity, scope) rather than one per bucket
+        groups: Dict[Tuple[str, str], List[RollupKey]] = defaultdict(list)
+        for key in partials:
+            groups[key[:2]].append(key)
+        existing: Dict[RollupKey, AnalyticsRollup] = {}
+        for (granularity, scope), keys in groups.items():
+            for rollup in db.query(AnalyticsRollup).filter(
+                AnalyticsRollup.granularity == granularity,
+                AnalyticsRollup.scope == scope,
+                AnalyticsRollup.scope_id.in_({key[2] for key in keys}),
+                AnalyticsRollup.bucket_start.in_({key[3] for key in keys})
+            ):
+                existing[(rollup.granularity, rollup.scope, rollup.scope_id, rollup.bucket_start)] = rollup
+
+        for key, partial in partials.items():
+            rollup = existing.get(key)
+            if rollup is None:
+                granularity, scope, scope_id, start = key
+                db.add(AnalyticsRollup(
+                    granularity=granularity,
+                    scope=scope,
+                    scope_id=scope_id,
+                    bucket_start=start,
+                    invocations=partial.invocations,
+                    tokens=partial.tokens,
+                    revenue=partial.revenue,
+                    latency_sum_ms=partial.latency_sum_ms,
+                    latency_sketch=partial.sketch.to_json(),
+                ))
+                continue
+            sketch = LatencySketch.from_json(rollup.latency_sketch)
+            sketch.merge(partial.sketch)
+            rollup.invocations += partial.invocations
+            rollup.tokens += partial.tokens
+            rollup.revenue += partial.revenue
+            rollup.latency_sum_ms += partial.latency_sum_ms
+            rollup.latency_sketch = sketch.to_json()
+
+
+def _as_datetime(value) -> datetime:
+    # SQLite hands back text for raw queries
+    return value if isinstance(value, datetime) else datetime.fromisoformat(value)
+
+
+def rollup_series(db: Session, scope: str, scope_ids: List[int], granularity: str, since: datetime) -> List[dict]:
+    """
+    Time series for one or more agents or developers, merged per bucket.
+    Reads only the rollup table.
+    """
+    buckets: Dict[datetime, _Partial] = defaultdict(_Partial)
+    if not scope_ids:
+        return []
+    rollups = db.query(AnalyticsRollup).filter(
+        AnalyticsRollup.granularity == granularity,
+        AnalyticsRollup.scope == scope,
+        AnalyticsRollup.scope_id.in_(scope_ids),
+        AnalyticsRollup.bucket_start >= bucket_start(since, granularity)
+    ).order_by(AnalyticsRollup.bucket_start)
+    for rollup in rollups:
+        bucket = buckets[rollup.bucket_start]
+        bucket.invocations += rollup.invocations
+        bucket.tokens += rollup.tokens
+        bucket.revenue += rollup.revenue
+        bucket.latency_sum_ms += rollup.latency_sum_ms
+        bucket.sketch.merge(LatencySketch.from_json(rollup.latency_sketch))
+    return [_point(start, bucket) for start, bucket in sorted(buckets.items())]
+
+
+def rollup_totals(db: Session, scope: str, scope_ids: List[int], since: Optional[datetime] = None) -> Dict[int, dict]:
+    """Totals per scope id from the daily rollups."""
+    totals: Dict[int, _Partial] = defaultdict(_Partial)
+    if not scope_ids:
+        return {}
+    query = db.query(AnalyticsRollup).filter(
+        AnalyticsRollup.granularity == DAY,
+        AnalyticsRollup.scope == scope,
+        AnalyticsRollup.scope_id.in_(scope_ids)
+    )
+    if since is not None:
+        query = query.filter(AnalyticsRollup.bucket_start >= bucket_start(since, DAY))
+    for rollup in query:
+        total = totals[rollup.scope_id]
+        total.invocations += rollup.invocations
+        total.tokens += rollup.tokens
+        total.revenue += rollup.revenue
+        total.latency_sum_ms += rollup.latency_sum_ms
+        total.sketch.merge(LatencySketch.from_json(rollup.latency_sketch))
+    return {scope_id: _point(None, total) for scope_id, total in totals.items()}
+
+
+def _point(start: Optional[datetime], bucket: _Partial) -> dict:
+    measured = bucket.sketch.count
+    point = {
+        "invocations": bucket.invocations,
+        "tokens": bucket.tokens,
+        "revenue": round(bucket.revenue, 6),
+        "average_response_time": round(bucket.latency_sum_ms / measured / 1000, 6) if measured else None,
+        "p50_latency_ms": _round(bucket.sketch.quantile(0.5)),
+        "p95_latency_ms": _round(bucket.sketch.quantile(0.95)),
+        "p99_latency_ms": _round(bucket.sketch.quantile(0.99)),
+    }
+    if start is not None:
+        point = {"timestamp": start.isoformat(), **point}
+    return point
+
+
+def _round(value: Optional[float]) -> Optional[float]:
+    return None if value is None else round(value, 3)
+
+
+async def run_rollups(job: RollupJob, session_factory, interval: float):
+    """Background task that keeps the rollups caught up."""
+    while True:
+        try:
+            await asyncio.to_thread(_run_once, job, session_factory)
+        except Exception as e:
+            logger.error(f"Analytics rollup failed: {e}")
+        await asyncio.sleep(interval)
+
+
+def _run_once(job: RollupJob, session_factory):
+    db = session_factory()
+    try:
+        job.run_until_caught_up(db)
+    finally:
+        db.close()
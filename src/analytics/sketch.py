@@ -0,0 +1,74 @@
+import json
+import math
+from typing import Dict, Optional
+
+
+class LatencySketch:
+    """
+    Mergeable quantile sketch with bounded relative error (DDSketch).
+
+    Values fall into logarithmic buckets ``gamma**(i-1) < v <= gamma**i``
+    with ``gamma = (1 + a) / (1 - a)``, so any quantile is reported within
+    a relative error ``a`` of a true sample. Two sketches merge by adding
+    bucket counts, which is what lets hourly rollups combine into daily
+    ones and per-agent sketches into per-developer ones.
+    """
+
+    def __init__(self, relative_accuracy: float = 0.01, bins: Optional[Dict[int, int]] = None, zero_count: int = 0):
+        self.relative_accuracy = relative_accuracy
+        self.gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self._log_gamma = math.log(self.gamma)
+        self.bins: Dict[int, int] = dict(bins or {})
+        # Values too small to bucket (<= 1 microsecond, in ms)
+        self.zero_count = zero_count
+
+    @property
+    def count(self) -> int:
+        return self.zero_count + sum(self.bins.values())
+
+    def add(self, value: float, count: int = 1):
+        if value <= 1e-3:
+            self.zero_count += count
+            return
+        index = math.ceil(math.log(value) / self._log_gamma)
+        self.bins[index] = self.bins.get(index, 0) + count
+
+    def merge(self, other: "LatencySketch"):
+        if other.relative_accuracy != self.relative_accuracy:
+            raise ValueError("Cannot merge sketches with different accuracy")
+        self.zero_count += other.zero_count
+        for index, count in other.bins.items():
+            self.bins[index] = self.bins.get(index, 0) + count
+
+    def quantile(self, q: float) -> Optional[float]:
+        total = self.count
+        if total == 0:
+            return None
+        rank = q * (total - 1)
+        seen = self.zero_count
+        if rank < seen:
+            return 0.0
+        for index in sorted(self.bins):
+            seen += self.bins[index]
+            if rank < seen:
+                # Midpoint of the bucket in relative terms
+                return 2 * self.gamma ** index / (self.gamma + 1)
+        return 2 * self.gamma ** max(self.bins) / (self.gamma + 1)
+
+    def to_json(self) -> str:
+        return json.dumps({
+            "a": self.relative_accuracy,
+            "z": self.zero_count,
+            "b": {str(index): count for index, count in self.bins.items()},
+        })
+
+    @classmethod
+    def from_json(cls, value: Optional[str]) -> "LatencySketch":
+        if not value:
+            return cls()
+        data = json.loads(value)
+        return cls(
+            relative_accuracy=data["a"],
+            bins={int(index): count for index, count in data["b"].items()},
+            zero_count=data["z"],
+        )
@@ -0,0 +1,96 @@
+from dataclasses import dataclass
+from typing import FrozenSet, Optional
+
+from fastapi import HTTPException, status
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import Session, object_session
+
+from ..cache.invalidation import invalidation_bus, publish_after_commit
+from ..cache.ttl import TTLCache
+from ..config import get_settings
+from ..database.models import User
+
+settings = get_settings()
+
+ROLE_DEVELOPER = "developer"
+ROLE_USER = "user"
+
+
+@dataclass(frozen=True)
+class Principal:
+    """The authenticated caller, without the mutable parts of the User row."""
+    id: int
+    username: str
+    is_developer: bool
+    is_active: bool
+    # Set when authenticated with an API key; None means no agent restriction
+    api_key_id: Optional[int] = None
+    agent_scopes: Optional[FrozenSet[int]] = None
+
+    @property
+    def role(self) -> str:
+        return ROLE_DEVELOPER if self.is_developer else ROLE_USER
+
+    def can_use_agent(self, agent_id: int) -> bool:
+        return self.agent_scopes is None or agent_id in self.agent_scopes
+
+    def require_agent_scope(self, agent_id: int):
+        if not self.can_use_agent(agent_id):
+            raise HTTPException(
+                status_code=status.HTTP_403_FORBIDDEN,
+                detail="API key is not allowed to use this agent"
+            )
+
+    @classmethod
+    def from_user(cls, user: User) -> "Principal":
+        return cls(
+            id=user.id,
+            username=user.username,
+            is_developer=bool(user.is_developer),
+            is_active=user.is_active is not False,
+        )
+
+
+# Verified principals keyed by user id
+principal_cache = TTLCache(
+    maxsize=settings.PRINCIPAL_CACHE_SIZE,
+    ttl=settings.PRINCIPAL_CACHE_TTL_SECONDS,
+)
+
+
+def load_principal(db: Session, user_id: int) -> Optional[Principal]:
+    """Cached principal for a user id, reading the users table on a miss."""
+    principal = principal_cache.get(user_id)
+    if principal is None:
+        user = db.get(User, user_id)
+        if user is None:
+            return None
+        principal = Principal.from_user(user)
+        principal_cache.set(principal.id, principal)
+    return principal
+
+
+def access_token_claims(user: User) -> dict:
+    return {"sub": user.username, "uid": user.id, "role": Principal.from_user(user).role}
+
+
+def invalidate_principal(user_id: int):
+    invalidation_bus.publish("principal", user_id)
+
+
+invalidation_bus.subscribe("principal", principal_cache.invalidate)
+
+
+@event.listens_for(User, "after_update")
+def _invalidate_on_update(mapper, connection, target):
+    # Drop the cached principal when anything it carries changes
+    state = inspect(target)
+    for attr in ("username", "is_developer", "is_active"):
+        if state.attrs[attr].history.has_changes():
+            publish_after_commit(object_session(target), "principal", target.id)
+            return
+
+
+@event.listens_for(User, "after_delete")
+def _invalidate_on_delete(mapper, connection, target):
+    publish_after_commit(object_session(target), "principal", target.id)
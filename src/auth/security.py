@@ -1,20 +1,44 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
-from typing import Optional
+from typing import Optional, Tuple
 
 from fastapi import Depends, HTTPException, status
-from fastapi.security import OAuth2PasswordBearer
+from fastapi.security import APIKeyHeader, OAuth2PasswordBearer
 from jose import jwt, JWTError
 from passlib.context import CryptContext
 from sqlalchemy.orm import Session
 
 from ..database.models import User
 from ..database.schemas import TokenData
+from ..database.session import get_db
 from ..config import get_settings
+from ..observability.tracing import traced
+from .principal import Principal, load_principal
+from .api_keys import authenticate_api_key, is_api_key
 
 settings = get_settings()
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+# Hashes with any other cost are flagged by needs_update and upgraded on login
+pwd_context = CryptContext(
+    schemes=["bcrypt"],
+    deprecated="auto",
+    bcrypt__rounds=settings.BCRYPT_ROUNDS,
+    bcrypt__min_rounds=settings.BCRYPT_ROUNDS,
+    bcrypt__max_rounds=settings.BCRYPT_ROUNDS,
+)
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="token")
+# Programmatic clients may send an API key either as the bearer token or
+# in X-API-Key, so neither scheme rejects a missing header on its own
+optional_oauth2_scheme = OAuth2PasswordBearer(tokenUrl="token", auto_error=False)
+api_key_header = APIKeyHeader(name="X-API-Key", auto_error=False)
+
+# bcrypt releases the GIL, so a small thread pool keeps hashing off the
+# event loop while bounding how many hashes run at once per worker
+_hash_executor = ThreadPoolExecutor(
+    max_workers=settings.PASSWORD_HASH_WORKERS,
+    thread_name_prefix="password-hash",
+)
 
 def verify_password(plain_password, hashed_password):
     return pwd_context.verify(plain_password, hashed_password)
@@ -22,6 +46,28 @@ def verify_password(plain_password, hashed_password):
 def get_password_hash(password):
     return pwd_context.hash(password)
 
+async def _run_in_hash_pool(func, *args):
+    return await asyncio.get_running_loop().run_in_executor(_hash_executor, func, *args)
+
+async def get_password_hash_async(password: str) -> str:
+    return await _run_in_hash_pool(get_password_hash, password)
+
+def _verify_and_rehash(plain_password: str, hashed_password: str) -> Tuple[bool, Optional[str]]:
+    if not pwd_context.verify(plain_password, hashed_password):
+        return False, None
+    if pwd_context.needs_update(hashed_password):
+        return True, pwd_context.hash(plain_password)
+    return True, None
+
+async def verify_password_async(plain_password: str, hashed_password: str) -> Tuple[bool, Optional[str]]:
+    """
+    Verify a password in the hash pool.
+
+    Returns ``(valid, new_hash)``; ``new_hash`` is set when the stored hash
+    uses an outdated scheme or cost and should be replaced.
+    """
+    return await _run_in_hash_pool(_verify_and_rehash, plain_password, hashed_password)
+
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     to_encode = data.copy()
     if expires_delta:
@@ -32,31 +78,74 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     encoded_jwt = jwt.encode(to_encode, settings.SECRET_KEY, algorithm=settings.ALGORITHM)
     return encoded_jwt
 
-def get_current_user(token: str = Depends(oauth2_scheme), db: Session = None):
-    credentials_exception = HTTPException(
+def _credentials_exception():
+    return HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
         headers={"WWW-Authenticate": "Bearer"},
     )
+
+def decode_access_token(token: str) -> TokenData:
     try:
         payload = jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
-        username: str = payload.get("sub")
-        if username is None:
-            raise credentials_exception
-        token_data = TokenData(username=username)
     except JWTError:
-        raise credentials_exception
-    
-    # Fetch user from database
-    if db is None:
-        raise credentials_exception
-    
-    user = db.query(User).filter(User.username == token_data.username).first()
+        raise _credentials_exception()
+    username: str = payload.get("sub")
+    if username is None:
+        raise _credentials_exception()
+    return TokenData(username=username, user_id=payload.get("uid"), role=payload.get("role"))
+
+@traced("auth.get_current_principal")
+async def get_current_principal(
+    token: Optional[str] = Depends(optional_oauth2_scheme),
+    api_key: Optional[str] = Depends(api_key_header),
+    db: Session = Depends(get_db)
+) -> Principal:
+    """
+    Resolve the caller from a JWT or API key without touching the database
+    when the principal is cached. Use this for routes that only need
+    identity and role; use get_current_user where the User row (e.g.
+    balance) matters.
+    """
+    if api_key is None and token is not None and is_api_key(token):
+        api_key = token
+    if api_key is not None:
+        principal = authenticate_api_key(db, api_key)
+        if principal is None:
+            raise _credentials_exception()
+    else:
+        if token is None:
+            raise _credentials_exception()
+        principal = _principal_from_jwt(db, token)
+
+    if not principal.is_active:
+        raise HTTPException(status_code=400, detail="Inactive user")
+    return principal
+
+def _principal_from_jwt(db: Session, token: str) -> Principal:
+    token_data = decode_access_token(token)
+    if token_data.user_id is not None:
+        principal = load_principal(db, token_data.user_id)
+    else:
+        # Tokens issued before the uid claim existed only carry the username
+        user = db.query(User).filter(User.username == token_data.username).first()
+        principal = load_principal(db, user.id) if user else None
+    if principal is None or principal.username != token_data.username:
+        raise _credentials_exception()
+    return principal
+
+@traced("auth.get_current_user")
+async def get_current_user(
+    principal: Principal = Depends(get_current_principal),
+    db: Session = Depends(get_db)
+) -> User:
+    """Fresh User row for routes that read or change the token balance."""
+    user = db.get(User, principal.id)
     if user is None:
-        raise credentials_exception
+        raise _credentials_exception()
     return user
 
-def get_current_active_user(current_user: User = Depends(get_current_user)):
+async def get_current_active_user(current_user: User = Depends(get_current_user)):
     if not current_user.is_active:
         raise HTTPException(status_code=400, detail="Inactive user")
     return current_user
@@ -0,0 +1,114 @@
+import hashlib
+import hmac
+import secrets
+import uuid
+from datetime import datetime, timedelta
+from typing import Optional, Tuple
+
+from fastapi import HTTPException, status
+from sqlalchemy import event, inspect, update
+from sqlalchemy.orm import Session
+
+from ..config import get_settings
+from ..database.models import RefreshToken, User
+
+settings = get_settings()
+
+
+def _invalid_refresh_token():
+    return HTTPException(
+        status_code=status.HTTP_401_UNAUTHORIZED,
+        detail="Invalid refresh token",
+        headers={"WWW-Authenticate": "Bearer"},
+    )
+
+
+def hash_refresh_token(raw_token: str) -> str:
+    # Refresh tokens are high-entropy random strings, so a keyed SHA-256 is
+    # enough to make a leaked table useless without paying for bcrypt
+    return hmac.new(settings.SECRET_KEY.encode(), raw_token.encode(), hashlib.sha256).hexdigest()
+
+
+def issue_refresh_token(db: Session, user_id: int, family_id: Optional[str] = None) -> Tuple[str, RefreshToken]:
+    """Create a refresh token; only its hash is stored. Caller commits."""
+    raw_token = secrets.token_urlsafe(32)
+    token = RefreshToken(
+        user_id=user_id,
+        family_id=family_id or uuid.uuid4().hex,
+        token_hash=hash_refresh_token(raw_token),
+        created_at=datetime.utcnow(),
+        expires_at=datetime.utcnow() + timedelta(days=settings.REFRESH_TOKEN_EXPIRE_DAYS),
+    )
+    db.add(token)
+    db.flush()
+    return raw_token, token
+
+
+def rotate_refresh_token(db: Session, raw_token: str) -> Tuple[int, str]:
+    """
+    Exchange a refresh token for a new one in the same family.
+
+    Presenting a token that was already rotated means it leaked (or the
+    client is replaying it), so the whole family is revoked.
+    Returns ``(user_id, new_raw_token)``.
+    """
+    now = datetime.utcnow()
+    token = db.query(RefreshToken).filter(
+        RefreshToken.token_hash == hash_refresh_token(raw_token)
+    ).first()
+    if token is None:
+        raise _invalid_refresh_token()
+    if token.revoked_at is not None:
+        if token.replaced_by_id is not None:
+            revoke_family(db, token.family_id)
+            db.commit()
+        raise _invalid_refresh_token()
+    if token.expires_at <= now:
+        raise _invalid_refresh_token()
+
+    user_id, family_id = token.user_id, token.family_id
+    new_raw_token, new_token = issue_refresh_token(db, user_id, family_id)
+    # Compare-and-set, so two concurrent refreshes with the same token
+    # can't both succeed
+    claimed = db.query(RefreshToken).filter(
+        RefreshToken.id == token.id,
+        RefreshToken.revoked_at.is_(None)
+    ).update({
+        RefreshToken.revoked_at: now,
+        RefreshToken.replaced_by_id: new_token.id,
+    }, synchronize_session=False)
+    if claimed != 1:
+        db.rollback()
+        revoke_family(db, family_id)
+        db.commit()
+        raise _invalid_refresh_token()
+    db.commit()
+    return user_id, new_raw_token
+
+
+def revoke_refresh_token(db: Session, raw_token: str):
+    """Log out the session the token belongs to."""
+    token = db.query(RefreshToken).filter(
+        RefreshToken.token_hash == hash_refresh_token(raw_token)
+    ).first()
+    if token is not None:
+        revoke_family(db, token.family_id)
+        db.commit()
+
+
+def revoke_family(db: Session, family_id: str):
+    db.query(RefreshToken).filter(
+        RefreshToken.family_id == family_id,
+        RefreshToken.revoked_at.is_(None)
+    ).update({RefreshToken.revoked_at: datetime.utcnow()}, synchronize_session=False)
+
+
+@event.listens_for(User, "after_update")
+def _revoke_on_deactivation(mapper, connection, target):
+    history = inspect(target).attrs.is_active.history
+    if history.has_changes() and target.is_active is False:
+        connection.execute(
+            update(RefreshToken)
+            .where(RefreshToken.user_id == target.id, RefreshToken.revoked_at.is_(None))
+            .values(revoked_at=datetime.utcnow())
+        )
@@ -0,0 +1,303 @@
+import glob
+import json
+import logging
+import os
+import select
+import socket
+import tempfile
+import threading
+import time
+import uuid
+from abc import ABC, abstractmethod
+from collections import defaultdict
+from typing import Any, Callable, Dict, List, Optional
+
+from sqlalchemy import event
+from sqlalchemy.engine import make_url
+from sqlalchemy.orm import Session
+
+from ..config import get_settings
+
+logger = logging.getLogger(__name__)
+
+settings = get_settings()
+
+Callback = Callable[[Any], None]
+
+
+class InvalidationBus:
+    """
+    Publish/subscribe for cache invalidations between worker processes.
+
+    Cache owners subscribe a callback to a key namespace ("principal",
+    "catalog", ...). ``publish`` runs the local callbacks straight away and
+    hands the message to the transport, which delivers it to the other
+    workers' callbacks. This base class has no transport, so on its own it
+    only serves a single worker.
+    """
+
+    def __init__(self):
+        self.origin = uuid.uuid4().hex
+        self._subscribers: Dict[str, List[Callback]] = defaultdict(list)
+        self._lock = threading.Lock()
+        # Seconds between publish on another worker and delivery here
+        self.last_delivery_lag: Optional[float] = None
+
+    def subscribe(self, namespace: str, callback: Callback):
+        with self._lock:
+            self._subscribers[namespace].append(callback)
+
+    def unsubscribe(self, namespace: str, callback: Callback):
+        with self._lock:
+            if callback in self._subscribers.get(namespace, ()):
+                self._subscribers[namespace].remove(callback)
+
+    def publish(self, namespace: str, key: Any = None):
+        self._dispatch(namespace, key)
+        message = json.dumps({
+            "ns": namespace,
+            "key": key,
+            "origin": self.origin,
+            "sent_at": time.time(),
+        })
+        try:
+            self._send(message)
+        except Exception as e:
+            # Other workers fall back to their cache TTLs
+            logger.error(f"Failed to broadcast invalidation {namespace}:{key}: {e}")
+
+    def start(self):
+        pass
+
+    def stop(self):
+        pass
+
+    def _send(self, message: str):
+        pass
+
+    def _receive(self, message: str):
+        try:
+            data = json.loads(message)
+        except ValueError:
+            logger.warning(f"Ignoring malformed invalidation message: {message!r}")
+            return
+        if data.get("origin") == self.origin:
+            return
+        self.last_delivery_lag = max(0.0, time.time() - data.get("sent_at", time.time()))
+        self._dispatch(data.get("ns"), data.get("key"))
+
+    def _dispatch(self, namespace: str, key: Any):
+        with self._lock:
+            callbacks = list(self._subscribers.get(namespace, ()))
+        for callback in callbacks:
+            try:
+                callback(key)
+            except Exception as e:
+                logger.error(f"Invalidation callback for {namespace} failed: {e}")
+
+
+class _ListenerThreadBus(InvalidationBus, ABC):
+    """Runs ``_listen`` on a daemon thread between ``start`` and ``stop``."""
+
+    def __init__(self):
+        super().__init__()
+        self._stopping = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self):
+        if self._thread is not None:
+            return
+        self._stopping.clear()
+        self._thread = threading.Thread(target=self._listen, name=f"{type(self).__name__}-listener", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        if self._thread is None:
+            return
+        self._stopping.set()
+        self._thread.join(timeout=5)
+        self._thread = None
+
+    @abstractmethod
+    def _listen(self):
+        """Deliver messages to ``_receive`` until ``_stopping`` is set."""
+
+
+class SocketBus(_ListenerThreadBus):
+    """
+    Unix datagram sockets in a shared directory, for SQLite and local dev.
+
+    Each worker binds one socket in ``directory``; a publish is one
+    datagram to every other socket there. Sockets left behind by dead
+    workers are removed the first time a send to them is refused.
+    """
+
+    def __init__(self, directory: str, poll_interval: float = 0.5):
+        super().__init__()
+        self.directory = directory
+        self.poll_interval = poll_interval
+        self.path = os.path.join(directory, f"{os.getpid()}-{self.origin[:8]}.sock")
+        os.makedirs(directory, exist_ok=True)
+        self._sender = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+        self._sender.setblocking(False)
+        self._receiver: Optional[socket.socket] = None
+
+    def start(self):
+        if self._receiver is None:
+            self._receiver = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+            self._receiver.bind(self.path)
+        super().start()
+
+    def stop(self):
+        super().stop()
+        if self._receiver is not None:
+            self._receiver.close()
+            self._receiver = None
+            try:
+                os.unlink(self.path)
+            except FileNotFoundError:
+                pass
+
+    def _send(self, message: str):
+        payload = message.encode()
+        for peer in glob.glob(os.path.join(self.directory, "*.sock")):
+            if peer == self.path:
+                continue
+            try:
+                self._sender.sendto(payload, peer)
+            except (ConnectionRefusedError, FileNotFoundError):
+                try:
+                    os.unlink(peer)
+                except FileNotFoundError:
+                    pass
+            except BlockingIOError:
+                # The peer's receive buffer is full; it will catch up via TTL
+                logger.warning(f"Dropped invalidation for busy worker socket {peer}")
+
+    def _listen(self):
+        while not self._stopping.is_set():
+            readable, _, _ = select.select([self._receiver], [], [], self.poll_interval)
+            if readable:
+                self._receive(self._receiver.recv(65536).decode())
+
+
+class PostgresBus(_ListenerThreadBus):
+    """
+    Postgres LISTEN/NOTIFY on ``channel``.
+
+    The listener holds one dedicated autocommit connection and reconnects
+    with backoff if it drops. Notifications are only delivered to
+    connected listeners, so anything published while a worker is
+    reconnecting is covered by the cache TTLs.
+    """
+
+    def __init__(self, database_url: str, channel: str = "cache_invalidation", poll_interval: float = 0.5):
+        super().__init__()
+        # psycopg2 wants a plain libpq URL, without the SQLAlchemy driver suffix
+        self.dsn = make_url(database_url).set(drivername="postgresql").render_as_string(hide_password=False)
+        self.channel = channel
+        self.poll_interval = poll_interval
+        self._publisher = None
+        self._publish_lock = threading.Lock()
+
+    def _connect(self):
+        import psycopg2
+        import psycopg2.extensions
+        conn = psycopg2.connect(self.dsn)
+        conn.set_isolation_level(psycopg2.extensions.ISOLATION_LEVEL_AUTOCOMMIT)
+        return conn
+
+    def _send(self, message: str):
+        with self._publish_lock:
+            if self._publisher is None or self._publisher.closed:
+                self._publisher = self._connect()
+            try:
+                with self._publisher.cursor() as cursor:
+                    cursor.execute("SELECT pg_notify(%s, %s)", (self.channel, message))
+            except Exception:
+                self._publisher.close()
+                self._publisher = None
+                raise
+
+    def _listen(self):
+        backoff = 0.5
+        while not self._stopping.is_set():
+            try:
+                conn = self._connect()
+            except Exception as e:
+                logger.error(f"Invalidation listener could not connect: {e}")
+                self._stopping.wait(backoff)
+                backoff = min(backoff * 2, 30)
+                continue
+            backoff = 0.5
+            try:
+                with conn.cursor() as cursor:
+                    cursor.execute(f'LISTEN "{self.channel}"')
+                while not self._stopping.is_set():
+                    readable, _, _ = select.select([conn], [], [], self.poll_interval)
+                    if not readable:
+                        continue
+                    conn.poll()
+                    while conn.notifies:
+                        self._receive(conn.notifies.pop(0).payload)
+            except Exception as e:
+                logger.error(f"Invalidation listener connection lost: {e}")
+            finally:
+                conn.close()
+
+    def stop(self):
+        super().stop()
+        with self._publish_lock:
+            if self._publisher is not None:
+                self._publisher.close()
+                self._publisher = None
+
+
+def create_invalidation_bus(backend: str, database_url: str, socket_dir: Optional[str] = None,
+                            channel: str = "cache_invalidation") -> InvalidationBus:
+    """
+    ``backend`` is "postgres", "socket", "memory" (no cross-worker delivery)
+    or "auto", which picks postgres for a Postgres DATABASE_URL and
+    sockets otherwise.
+    """
+    if backend == "auto":
+        backend = "postgres" if database_url.startswith("postgres") else "socket"
+    if backend == "postgres":
+        return PostgresBus(database_url, channel)
+    if backend == "socket":
+        return SocketBus(socket_dir or os.path.join(tempfile.gettempdir(), "ai-agent-marketplace-invalidation"))
+    if backend == "memory":
+        return InvalidationBus()
+    raise ValueError(f"Unknown invalidation backend: {backend}")
+
+
+invalidation_bus = create_invalidation_bus(
+    settings.INVALIDATION_BACKEND,
+    settings.DATABASE_URL,
+    settings.INVALIDATION_SOCKET_DIR,
+    settings.INVALIDATION_CHANNEL,
+)
+
+
+def publish_after_commit(session: Optional[Session], namespace: str, key: Any = None):
+    """
+    Publish once ``session`` commits, so no worker can reload and cache
+    the rows as they were before the change. Dropped on rollback.
+    """
+    if session is None:
+        invalidation_bus.publish(namespace, key)
+        return
+    pending = session.info.setdefault("pending_invalidations", [])
+    if (namespace, key) not in pending:
+        pending.append((namespace, key))
+
+
+@event.listens_for(Session, "after_commit")
+def _publish_pending(session):
+    for namespace, key in session.info.pop("pending_invalidations", ()):
+        invalidation_bus.publish(namespace, key)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_pending(session):
+    session.info.pop("pending_invalidations", None)
@@ -1,5 +1,6 @@
 from pydantic_settings import BaseSettings
 from functools import lru_cache
+from typing import Optional
 import os
 from dotenv import load_dotenv
 
@@ -10,6 +11,9 @@ if os.path.exists(".env"):
 class Settings(BaseSettings):
     # API Keys and Secrets
     OPENAI_API_KEY: str
+    # Point the agents at another OpenAI-compatible server, e.g. the fake
+    # one in benchmarks/fake_openai.py for load and fault testing
+    OPENAI_BASE_URL: Optional[str] = None
     SECRET_KEY: str
     DATABASE_URL: str
     STRIPE_SECRET_KEY: str
@@ -17,11 +21,115 @@ class Settings(BaseSettings):
     STRIPE_WEBHOOK_SECRET: str = "whsec_test"  # Default test webhook secret
     
     # Application Settings
-    ACCESS_TOKEN_EXPIRE_MINUTES: int = 30
+    ACCESS_TOKEN_EXPIRE_MINUTES: int = 15
+    REFRESH_TOKEN_EXPIRE_DAYS: int = 14
     DEBUG: bool = False
     ENVIRONMENT: str = "development"
     ALGORITHM: str = "HS256"
 
+    # Report per-request db/llm time in a Server-Timing response header
+    SERVER_TIMING_ENABLED: bool = False
+
+    # Prometheus /metrics; set PROMETHEUS_MULTIPROC_DIR when running
+    # several workers so the endpoint aggregates all of them
+    METRICS_ENABLED: bool = True
+
+    # Event loop lag sampling; callbacks holding the loop longer than the
+    # threshold are logged with their stack and listed at /debug/event-loop.
+    # A shorter interval measures blocks more exactly (they're undercounted
+    # by up to one interval) at the cost of more wakeups per worker
+    LOOP_MONITOR_ENABLED: bool = True
+    LOOP_MONITOR_INTERVAL_SECONDS: float = 0.1
+    LOOP_BLOCK_THRESHOLD_MS: float = 100
+    LOOP_BLOCK_HISTORY: int = 50
+
+    # Trace spans exported as OTLP/JSON lines; {pid} gives each worker a file
+    TRACING_ENABLED: bool = False
+    TRACING_SAMPLE_RATE: float = 1.0
+    TRACING_EXPORT_PATH: str = "traces/traces-{pid}.jsonl"
+
+    # JSON logs written by a background thread; LOG_LEVELS overrides levels
+    # per logger ("sqlalchemy.engine=INFO,src.main=DEBUG") and
+    # LOG_SAMPLE_RATES keeps a fraction of noisy events ("agent.invoked=0.1")
+    LOG_LEVEL: str = "INFO"
+    LOG_LEVELS: str = ""
+    LOG_FORMAT: str = "json"
+    LOG_SAMPLE_RATES: str = ""
+    LOG_MAX_FIELD_LENGTH: int = 256
+    LOG_QUEUE_SIZE: int = 10000
+
+    # Sampling profiler for requests sending X-Profile: <PROFILING_TOKEN>,
+    # or a random PROFILING_SAMPLE_RATE of them; off when both are unset
+    PROFILING_TOKEN: str = ""
+    PROFILING_SAMPLE_RATE: float = 0.0
+    PROFILING_INTERVAL_SECONDS: float = 0.005
+    PROFILING_OUTPUT_DIR: str = "profiles"
+
+    # Rate limiting; the backend is "sqlite" (shared by workers on one host),
+    # "memory" (single worker) or a "module:Class" BucketStore import path
+    RATE_LIMIT_ENABLED: bool = True
+    RATE_LIMIT_PER_MINUTE: int = 100
+    RATE_LIMIT_LOGIN_PER_MINUTE: int = 10
+    RATE_LIMIT_INVOKE_PER_MINUTE: int = 20
+    RATE_LIMIT_BACKEND: str = "sqlite"
+    RATE_LIMIT_SQLITE_PATH: Optional[str] = None
+
+    # Password hashing
+    BCRYPT_ROUNDS: int = 12
+    PASSWORD_HASH_WORKERS: int = 4
+
+    # Verified JWT principals cached per worker
+    PRINCIPAL_CACHE_SIZE: int = 10000
+    PRINCIPAL_CACHE_TTL_SECONDS: int = 60
+
+    # API keys for programmatic clients
+    API_KEY_CACHE_SIZE: int = 10000
+    API_KEY_CACHE_TTL_SECONDS: int = 300
+
+    # Agent catalog and per-user purchased sets served from memory
+    CATALOG_CACHE_TTL_SECONDS: int = 300
+    PURCHASED_CACHE_SIZE: int = 10000
+    PURCHASED_CACHE_TTL_SECONDS: int = 300
+
+    # Popular/trending agent ordering
+    POPULARITY_HALF_LIFE_HOURS: float = 168
+    TRENDING_HALF_LIFE_HOURS: float = 24
+    POPULARITY_CHECKPOINT_INTERVAL_SECONDS: int = 30
+
+    # Co-purchase recommendations
+    RECOMMENDATIONS_TOP_K: int = 10
+    # Purchases update the index as they happen; the rebuild only repairs
+    # invalidation messages lost between workers, so this bounds that drift
+    RECOMMENDATIONS_REBUILD_INTERVAL_HOURS: float = 24
+
+    # Analytics rollups; invocations younger than the settle time wait for
+    # the next run so rows committed out of id order aren't skipped
+    ANALYTICS_ROLLUP_INTERVAL_SECONDS: int = 60
+    ANALYTICS_SETTLE_SECONDS: int = 30
+    ANALYTICS_BATCH_SIZE: int = 5000
+
+    # Developer payouts: "day", "week" or "month" periods
+    PAYOUT_PERIOD: str = "month"
+    PAYOUT_CHUNK_SIZE: int = 100000
+
+    # Cross-worker cache invalidation: "auto" (postgres for a Postgres
+    # DATABASE_URL, unix sockets otherwise), "postgres", "socket" or "memory"
+    INVALIDATION_BACKEND: str = "auto"
+    INVALIDATION_SOCKET_DIR: Optional[str] = None
+    INVALIDATION_CHANNEL: str = "cache_invalidation"
+
+    # Invocation records: "sync", "group" (batched, waits for commit) or "async" (write-behind)
+    INVOCATION_WRITE_MODE: str = "async"
+    INVOCATION_QUEUE_SIZE: int = 10000
+    INVOCATION_BATCH_SIZE: int = 100
+    INVOCATION_FLUSH_INTERVAL_MS: int = 50
+
+    # Idempotency-Key handling for purchase and invoke
+    IDEMPOTENCY_TTL_HOURS: int = 24
+    IDEMPOTENCY_LOCK_TIMEOUT_SECONDS: int = 300
+    IDEMPOTENCY_WAIT_TIMEOUT_SECONDS: int = 120
+    IDEMPOTENCY_SWEEP_INTERVAL_SECONDS: int = 300
+
     class Config:
         env_file = ".env"
         env_file_encoding = "utf-8"
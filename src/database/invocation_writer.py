@@ -0,0 +1,219 @@
+import asyncio
+import json
+import logging
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional
+
+from sqlalchemy import insert
+from sqlalchemy.orm import Session
+
+from .models import AgentInvocation
+from ..observability.tracing import current_context, tracer
+
+logger = logging.getLogger(__name__)
+
+WRITE_MODES = ("sync", "group", "async")
+
+_STOP = object()
+
+
+class InvocationWriter:
+    """
+    Write-behind queue for AgentInvocation records.
+
+    Records are put on a bounded in-process queue and a background task
+    inserts them in multi-row batches, flushing when ``batch_size`` records
+    are pending or ``flush_interval`` seconds after the first one arrived.
+
+    Durability is selected with ``mode``:
+    - ``sync``: insert and commit inline, as before
+    - ``group``: enqueue and wait until the batch holding the record commits
+    - ``async``: enqueue and return; records still queued are lost if the
+      process dies before the next flush (they are flushed on clean shutdown)
+
+    ``on_insert(db, rows)`` is called with the inserted rows and their ids
+    inside the inserting transaction, for indexes that must stay in step
+    with the table.
+    """
+
+    def __init__(
+        self,
+        session_factory,
+        mode: str = "async",
+        max_queue_size: int = 10000,
+        batch_size: int = 100,
+        flush_interval: float = 0.05,
+        on_insert: Optional[Callable[[Session, List[Dict[str, Any]]], None]] = None,
+    ):
+        if mode not in WRITE_MODES:
+            raise ValueError(f"Unknown invocation write mode: {mode}")
+        self.session_factory = session_factory
+        self.mode = mode
+        self.max_queue_size = max_queue_size
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.on_insert = on_insert
+        self._queue: Optional[asyncio.Queue] = None
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    async def start(self):
+        if self.mode == "sync" or self.running:
+            return
+        self._queue = asyncio.Queue(maxsize=self.max_queue_size)
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Flush everything still queued and stop the background task."""
+        if not self.running:
+            return
+        await self._queue.put((_STOP, None, None))
+        await self._task
+        self._task = None
+        self._queue = None
+
+    async def submit(
+        self,
+        user_id: int,
+        agent_id: int,
+        input_data: Any,
+        output_data: Any,
+        tokens_used: int = 0,
+        purchase_id: Optional[int] = None,
+        cost: float = 0.0,
+        latency_ms: Optional[float] = None,
+    ):
+        """
+        Record an invocation.
+
+        ``input_data`` and ``output_data`` are serialized to JSON by the
+        writer, so callers can hand over the raw request and result dicts.
+        """
+        row = {
+            "user_id": user_id,
+            "agent_id": agent_id,
+            "purchase_id": purchase_id,
+            "input_data": input_data,
+            "output_data": output_data,
+            "tokens_used": tokens_used,
+            "cost": cost,
+            "latency_ms": latency_ms,
+            "created_at": datetime.utcnow(),
+        }
+        if not self.running:
+            # Sync mode, or the app was started without the lifespan hook
+            await asyncio.to_thread(self._write_batch, [row])
+            return
+
+        # The batch is written from the writer task; keep the request's
+        # trace so the flush span can link back to it
+        trace = current_context()
+        if self.mode == "group":
+            done = asyncio.get_running_loop().create_future()
+            await self._queue.put((row, done, trace))
+            await done
+        else:
+            # Blocks when the queue is full so a slow database applies
+            # backpressure instead of growing memory without bound
+            await self._queue.put((row, None, trace))
+
+    async def _run(self):
+        stopping = False
+        while not stopping:
+            item, done, trace = await self._queue.get()
+            if item is _STOP:
+                break
+            batch = [(item, done, trace)]
+            deadline = asyncio.get_running_loop().time() + self.flush_interval
+            while len(batch) < self.batch_size:
+                timeout = deadline - asyncio.get_running_loop().time()
+                if timeout <= 0:
+                    break
+                try:
+                    item, done, trace = await asyncio.wait_for(self._queue.get(), timeout)
+                except asyncio.TimeoutError:
+                    break
+                if item is _STOP:
+                    stopping = True
+                    break
+                batch.append((item, done, trace))
+            await self._flush(batch)
+
+        # Drain anything enqueued behind the stop marker
+        remaining = []
+        while not self._queue.empty():
+            item, done, trace = self._queue.get_nowait()
+            if item is not _STOP:
+                remaining.append((item, done, trace))
+        for start in range(0, len(remaining), self.batch_size):
+            await self._flush(remaining[start:start + self.batch_size])
+
+    async def _flush(self, batch):
+        rows = [row for row, _, _ in batch]
+        links = [trace for _, _, trace in batch if trace is not None]
+        error = None
+        failed: Dict[int, Exception] = {}
+        try:
+            with tracer.span("invocation_writer.flush", links=links, rows=len(rows)):
+                failed = await asyncio.to_thread(self._write_batch, rows)
+        except Exception as e:
+            logger.error(f"Failed to write {len(rows)} invocation records: {e}")
+            error = e
+        for index, (_, done, _) in enumerate(batch):
+            if done is None or done.done():
+                continue
+            row_error = error or failed.get(index)
+            if row_error is None:
+                done.set_result(None)
+            else:
+                done.set_exception(row_error)
+
+    def _write_batch(self, rows: List[Dict[str, Any]]) -> Dict[int, Exception]:
+        """
+        Insert ``rows``, returning the errors of those that were dropped by
+        their index. Raises if nothing could be written.
+        """
+        payload = [
+            {
+                **row,
+                "input_data": json.dumps(row["input_data"]),
+                "output_data": json.dumps(row["output_data"]),
+            }
+            for row in rows
+        ]
+        failed: Dict[int, Exception] = {}
+        db = self.session_factory()
+        try:
+            self._insert(db, payload)
+            db.commit()
+        except Exception:
+            db.rollback()
+            if len(payload) == 1:
+                raise
+            # Retry row by row so one bad record doesn't sink the whole batch
+            for index, row in enumerate(payload):
+                try:
+                    self._insert(db, [row])
+                    db.commit()
+                except Exception as e:
+                    db.rollback()
+                    failed[index] = e
+                    logger.error(f"Dropping invocation record for user {row['user_id']}: {e}")
+            if len(failed) == len(payload):
+                raise
+        finally:
+            db.close()
+        return failed
+
+    def _insert(self, db: Session, payload: List[Dict[str, Any]]):
+        if self.on_insert is None:
+            db.execute(insert(AgentInvocation), payload)
+            return
+        ids = db.execute(
+            insert(AgentInvocation).returning(AgentInvocation.id, sort_by_parameter_order=True),
+            payload
+        ).scalars().all()
+        self.on_insert(db, [{**row, "id": row_id} for row, row_id in zip(payload, ids)])
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Float, Boolean, ForeignKey, DateTime
+from sqlalchemy import Column, Integer, String, Text, Float, Boolean, ForeignKey, DateTime, UniqueConstraint
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import relationship
 from datetime import datetime
@@ -32,6 +32,7 @@ class Agent(Base):
     price = Column(Float)
     is_active = Column(Boolean, default=True)
     created_at = Column(DateTime, default=datetime.utcnow)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
     # Relationships
     developer = relationship("User", back_populates="agents")
@@ -62,6 +63,9 @@ class AgentInvocation(Base):
     input_data = Column(String)
     output_data = Column(String)
     tokens_used = Column(Integer, default=0)
+    # Tokens charged to the user and time spent in the agent
+    cost = Column(Float, default=0.0)
+    latency_ms = Column(Float, nullable=True)
     summary = Column(String, nullable=True)
     created_at = Column(DateTime, default=datetime.utcnow)
 
@@ -69,3 +73,106 @@ class AgentInvocation(Base):
     user = relationship("User", back_populates="invocations")
     agent = relationship("Agent", back_populates="invocations")
     purchase = relationship("AgentPurchase", back_populates="invocations")
+
+class IdempotencyKey(Base):
+    __tablename__ = "idempotency_keys"
+    __table_args__ = (UniqueConstraint("user_id", "key", name="uq_idempotency_user_key"),)
+
+    id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    key = Column(String, nullable=False)
+    endpoint = Column(String, nullable=False)
+    request_hash = Column(String, nullable=False)
+    status = Column(String, default="in_progress")  # in_progress, completed
+    response_status = Column(Integer, nullable=True)
+    response_body = Column(String, nullable=True)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    expires_at = Column(DateTime, index=True)
+
+class RefreshToken(Base):
+    __tablename__ = "refresh_tokens"
+
+    id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(Integer, ForeignKey("users.id"), index=True, nullable=False)
+    # All tokens rotated from the same login share a family
+    family_id = Column(String, index=True, nullable=False)
+    token_hash = Column(String, unique=True, index=True, nullable=False)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    expires_at = Column(DateTime, nullable=False)
+    revoked_at = Column(DateTime, nullable=True)
+    replaced_by_id = Column(Integer, ForeignKey("refresh_tokens.id"), nullable=True)
+
+class ApiKey(Base):
+    __tablename__ = "api_keys"
+
+    id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(Integer, ForeignKey("users.id"), index=True, nullable=False)
+    name = Column(String, nullable=False)
+    # Public part of the key, used for the indexed lookup
+    prefix = Column(String, unique=True, index=True, nullable=False)
+    secret_hash = Column(String, nullable=False)
+    # JSON list of agent ids the key may use; NULL allows every agent
+    agent_scopes = Column(String, nullable=True)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    expires_at = Column(DateTime, nullable=True)
+    revoked_at = Column(DateTime, nullable=True)
+
+class AgentPopularity(Base):
+    __tablename__ = "agent_popularity"
+
+    agent_id = Column(Integer, ForeignKey("agents.id"), primary_key=True)
+    # Exponentially decayed event counts as of updated_at
+    popular_score = Column(Float, nullable=False, default=0.0)
+    trending_score = Column(Float, nullable=False, default=0.0)
+    invocations = Column(Integer, nullable=False, default=0)
+    purchases = Column(Integer, nullable=False, default=0)
+    updated_at = Column(DateTime, nullable=False)
+
+class AnalyticsRollup(Base):
+    __tablename__ = "analytics_rollups"
+    __table_args__ = (
+        UniqueConstraint("granularity", "scope", "scope_id", "bucket_start", name="uq_analytics_rollup_bucket"),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    # "hour" or "day"
+    granularity = Column(String, nullable=False)
+    # "agent" or "developer"
+    scope = Column(String, nullable=False)
+    scope_id = Column(Integer, nullable=False)
+    bucket_start = Column(DateTime, nullable=False)
+    invocations = Column(Integer, nullable=False, default=0)
+    tokens = Column(Integer, nullable=False, default=0)
+    revenue = Column(Float, nullable=False, default=0.0)
+    latency_sum_ms = Column(Float, nullable=False, default=0.0)
+    # Serialized LatencySketch for percentiles
+    latency_sketch = Column(Text, nullable=True)
+
+class AnalyticsWatermark(Base):
+    __tablename__ = "analytics_watermarks"
+
+    name = Column(String, primary_key=True)
+    # Highest agent_invocations.id folded into the rollups
+    last_invocation_id = Column(Integer, nullable=False, default=0)
+    updated_at = Column(DateTime, nullable=True)
+
+class DeveloperPayout(Base):
+    __tablename__ = "developer_payouts"
+    __table_args__ = (
+        UniqueConstraint("developer_id", "period", "period_start", name="uq_developer_payout_period"),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    developer_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    # "day", "week" or "month"
+    period = Column(String, nullable=False)
+    period_start = Column(DateTime, nullable=False)
+    period_end = Column(DateTime, nullable=False)
+    purchases = Column(Integer, nullable=False, default=0)
+    purchase_revenue = Column(Float, nullable=False, default=0.0)
+    invocations = Column(Integer, nullable=False, default=0)
+    invocation_revenue = Column(Float, nullable=False, default=0.0)
+    amount = Column(Float, nullable=False, default=0.0)
+    # "pending" until paid out; paid records are never recomputed
+    status = Column(String, nullable=False, default="pending")
+    computed_at = Column(DateTime, nullable=False)
@@ -6,9 +6,16 @@ from datetime import datetime
 class TokenResponse(BaseModel):
     access_token: str
     token_type: str
+    expires_in: Optional[int] = None
+    refresh_token: Optional[str] = None
+
+class RefreshTokenRequest(BaseModel):
+    refresh_token: str
 
 class TokenData(BaseModel):
     username: Optional[str] = None
+    user_id: Optional[int] = None
+    role: Optional[str] = None
 
 # User schemas
 class UserBase(BaseModel):
@@ -28,6 +35,24 @@ class UserResponse(UserBase):
     class Config:
         from_attributes = True
 
+# API key schemas
+class ApiKeyCreate(BaseModel):
+    name: str
+    agent_ids: Optional[List[int]] = None
+    expires_in_days: Optional[int] = None
+
+class ApiKeyResponse(BaseModel):
+    id: int
+    name: str
+    prefix: str
+    agent_ids: Optional[List[int]] = None
+    created_at: datetime
+    expires_at: Optional[datetime] = None
+    revoked_at: Optional[datetime] = None
+
+class ApiKeyCreated(ApiKeyResponse):
+    key: str
+
 # Agent schemas
 class AgentBase(BaseModel):
     name: str
@@ -0,0 +1,330 @@
+import csv
+import io
+import logging
+import multiprocessing
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from datetime import datetime
+from functools import lru_cache
+from typing import Deque, Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+from sqlalchemy import create_engine, text
+
+from .models import Base
+
+logger = logging.getLogger(__name__)
+
+# bcrypt hash of "password123", so generated users can log in
+PASSWORD_HASH = "$2b$12$kcc87AWf.3XDPSuLE/tr4eZSQZ0QmrlUEOIL5iERT6ZWvGp3ywpZa"
+
+# The first agents get the names main.py maps to real implementations
+AGENT_NAMES = (
+    "Interview Prep Assistant",
+    "Code Reviewer",
+    "Resume Reviewer",
+    "Technical Troubleshooter",
+    "Writing Assistant",
+)
+
+WORDS = (
+    "agent review code error deploy service request latency resume interview "
+    "question answer improve structure example system database query index "
+    "cache token user python config network timeout retry step result"
+).split()
+
+# Tables in foreign key order, with the columns the generator fills
+TABLES = (
+    ("users", ("id", "username", "email", "hashed_password", "is_developer", "token_balance", "created_at", "is_active")),
+    ("agents", ("id", "name", "description", "developer_id", "price", "is_active", "created_at", "updated_at")),
+    ("agent_purchases", ("id", "user_id", "agent_id", "purchase_price", "purchase_date")),
+    ("agent_invocations", (
+        "id", "user_id", "agent_id", "input_data", "output_data", "tokens_used", "cost", "latency_ms", "created_at",
+    )),
+)
+
+# Relative traffic per hour of day (UTC), peaking mid-afternoon
+_HOURLY = 1 + 0.6 * np.sin(2 * np.pi * (np.arange(24) - 9) / 24)
+_HOUR_CDF = np.cumsum(_HOURLY) / _HOURLY.sum()
+
+
+@dataclass
+class SyntheticConfig:
+    """
+    Row counts and shape of a generated dataset. Agent and user activity
+    follow Zipf-like popularity (``agent_skew``, ``user_skew``), payload
+    sizes are lognormal around the medians, and timestamps spread over
+    ``days`` ending at ``end`` with a daily cycle.
+    """
+    users: int = 10_000
+    agents: int = 500
+    purchases: int = 50_000
+    invocations: int = 1_000_000
+    developer_share: float = 0.02
+    agent_skew: float = 1.1
+    user_skew: float = 0.8
+    # Median bytes of text in invocation payloads; False stores "{}"
+    payloads: bool = True
+    input_median: int = 400
+    output_median: int = 2500
+    days: int = 365
+    end: datetime = field(default_factory=lambda: datetime(2026, 10, 1))
+    seed: int = 42
+    chunk_size: int = 20_000
+
+    @property
+    def developers(self) -> int:
+        return max(1, min(self.users, round(self.users * self.developer_share)))
+
+    def count(self, table: str) -> int:
+        return {
+            "users": self.users,
+            "agents": self.agents,
+            "agent_purchases": self.purchases,
+            "agent_invocations": self.invocations,
+        }[table]
+
+
+def _rng(config: SyntheticConfig, *key: int) -> np.random.Generator:
+    # Every chunk has its own stream, so output doesn't depend on how
+    # chunks are spread over workers
+    return np.random.default_rng([config.seed, *key])
+
+
+@lru_cache(maxsize=8)
+def _popularity(seed: int, n: int, skew: float, salt: int) -> Tuple[np.ndarray, np.ndarray]:
+    """1-based ids in popularity order, and the cumulative share of each rank."""
+    ids = np.random.default_rng([seed, salt]).permutation(n) + 1
+    weights = 1 / np.arange(1, n + 1) ** skew
+    return ids, np.cumsum(weights) / weights.sum()
+
+
+def _popular(config: SyntheticConfig, rng: np.random.Generator, n: int, skew: float, salt: int, size: int) -> np.ndarray:
+    ids, cdf = _popularity(config.seed, n, skew, salt)
+    return ids[np.minimum(np.searchsorted(cdf, rng.random(size)), n - 1)]
+
+
+@lru_cache(maxsize=4)
+def _agent_prices(seed: int, agents: int) -> np.ndarray:
+    rng = np.random.default_rng([seed, 101])
+    return np.round(np.clip(rng.lognormal(np.log(10), 0.6, agents), 1, 200), 2)
+
+
+@lru_cache(maxsize=1)
+def _filler() -> str:
+    rng = np.random.default_rng(7)
+    return " ".join(WORDS[i] for i in rng.integers(0, len(WORDS), 40_000))
+
+
+def _timestamps(config: SyntheticConfig, rng: np.random.Generator, size: int, daily_cycle: bool = True) -> List[str]:
+    end = np.datetime64(config.end.replace(microsecond=0), "s")
+    days = rng.integers(1, config.days + 1, size)
+    if daily_cycle:
+        seconds = np.searchsorted(_HOUR_CDF, rng.random(size)) * 3600 + rng.integers(0, 3600, size)
+    else:
+        seconds = rng.integers(0, 86400, size)
+    stamps = end - days * 86400 + seconds
+    return np.char.replace(np.datetime_as_string(stamps, unit="s"), "T", " ").tolist()
+
+
+def _users(config, rng, start, stop):
+    n = stop - start
+    ids = range(start + 1, stop + 1)
+    balances = np.round(rng.lognormal(np.log(50), 1.2, n), 2).tolist()
+    active = (rng.random(n) > 0.01).tolist()
+    created = _timestamps(config, rng, n, daily_cycle=False)
+    developers = config.developers
+    return [
+        (i, f"user{i}", f"user{i}@example.com", PASSWORD_HASH, i <= developers, balances[k], created[k], active[k])
+        for k, i in enumerate(ids)
+    ]
+
+
+def _agents(config, rng, start, stop):
+    n = stop - start
+    developers = _popular(config, rng, config.developers, 1.0, 102, n).tolist()
+    prices = _agent_prices(config.seed, config.agents)[start:stop].tolist()
+    active = (rng.random(n) > 0.05).tolist()
+    created = _timestamps(config, rng, n, daily_cycle=False)
+    lengths = np.clip(rng.lognormal(np.log(120), 0.5, n), 20, 1000).astype(int).tolist()
+    offsets = rng.integers(0, 100_000, n).tolist()
+    filler = _filler()
+    rows = []
+    for k in range(n):
+        i = start + k + 1
+        name = AGENT_NAMES[i - 1] if i <= len(AGENT_NAMES) else f"Agent {i}"
+        description = filler[offsets[k]:offsets[k] + lengths[k]].strip()
+        rows.append((i, name, description, developers[k], prices[k], i <= len(AGENT_NAMES) or active[k], created[k], created[k]))
+    return rows
+
+
+def _purchases(config, rng, start, stop):
+    n = stop - start
+    users = _popular(config, rng, config.users, config.user_skew, 103, n).tolist()
+    agents = _popular(config, rng, config.agents, config.agent_skew, 104, n)
+    prices = _agent_prices(config.seed, config.agents)[agents - 1].tolist()
+    dates = _timestamps(config, rng, n)
+    agents = agents.tolist()
+    return [(start + k + 1, users[k], agents[k], prices[k], dates[k]) for k in range(n)]
+
+
+def _invocations(config, rng, start, stop):
+    n = stop - start
+    users = _popular(config, rng, config.users, config.user_skew, 103, n).tolist()
+    agents = _popular(config, rng, config.agents, config.agent_skew, 104, n).tolist()
+    created = _timestamps(config, rng, n)
+    input_sizes = np.clip(rng.lognormal(np.log(config.input_median), 0.9, n), 10, 16_384).astype(int)
+    output_sizes = np.clip(rng.lognormal(np.log(config.output_median), 1.0, n), 10, 65_536).astype(int)
+    # Roughly four bytes of text per token, plus prompt overhead
+    tokens = (input_sizes + output_sizes) // 4 + 60
+    cost = np.round(tokens / 1000 * rng.uniform(0.002, 0.06, n), 4).tolist()
+    latency = np.round(250 + output_sizes / 4 * rng.lognormal(np.log(12), 0.4, n), 1).tolist()
+    tokens = tokens.tolist()
+    if config.payloads:
+        filler = _filler()
+        offsets = rng.integers(0, len(filler) - 65_536, (2, n)).tolist()
+        input_sizes, output_sizes = input_sizes.tolist(), output_sizes.tolist()
+        inputs = [f'{{"input_text": "{filler[o:o + s]}"}}' for o, s in zip(offsets[0], input_sizes)]
+        outputs = [
+            f'{{"output_text": "{filler[o:o + s]}", "token_usage": {{"total_tokens": {t}}}, "cost": {c}}}'
+            for o, s, t, c in zip(offsets[1], output_sizes, tokens, cost)
+        ]
+    else:
+        inputs = outputs = ["{}"] * n
+    return [
+        (start + k + 1, users[k], agents[k], inputs[k], outputs[k], tokens[k], cost[k], latency[k], created[k])
+        for k in range(n)
+    ]
+
+
+_GENERATORS = {
+    "users": _users,
+    "agents": _agents,
+    "agent_purchases": _purchases,
+    "agent_invocations": _invocations,
+}
+
+
+def generate_rows(config: SyntheticConfig, table: str, start: int, stop: int) -> List[tuple]:
+    """Rows ``start < id <= stop`` of ``table``; the same for a given seed."""
+    table_index = [name for name, _ in TABLES].index(table)
+    return _GENERATORS[table](config, _rng(config, table_index, start // config.chunk_size), start, stop)
+
+
+def _write(conn, table: str, columns, rows, placeholder: str = "%s"):
+    cursor = conn.cursor()
+    if hasattr(cursor, "copy_expert"):
+        # psycopg2: COPY is several times faster than batched INSERTs
+        buffer = io.StringIO()
+        csv.writer(buffer).writerows(rows)
+        buffer.seek(0)
+        cursor.copy_expert(f"COPY {table} ({', '.join(columns)}) FROM STDIN WITH (FORMAT csv)", buffer)
+    else:
+        cursor.executemany(
+            f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({', '.join([placeholder] * len(columns))})",
+            rows,
+        )
+    cursor.close()
+    conn.commit()
+
+
+_worker_engines = {}
+
+
+def _chunk(task):
+    url, config, table, columns, start, stop = task
+    rows = generate_rows(config, table, start, stop)
+    if url is None:
+        return rows
+    # Parallel writers: each worker loads its own chunks
+    engine = _worker_engines.get(url)
+    if engine is None:
+        engine = _worker_engines[url] = create_engine(url, pool_size=1)
+    conn = engine.raw_connection()
+    try:
+        _write(conn, table, columns, rows)
+    finally:
+        conn.close()
+    return len(rows)
+
+
+def _ordered(pool, func, tasks, window: int) -> Iterator:
+    """
+    ``pool.imap(func, tasks)`` with at most ``window`` chunks submitted and
+    not yet consumed. ``imap`` queues every task up front, so when only this
+    process writes (SQLite) finished chunks would pile up in memory
+    whenever generating outpaces inserting.
+    """
+    pending: Deque = deque()
+    for task in tasks:
+        if len(pending) >= window:
+            yield pending.popleft().get()
+        pending.append(pool.apply_async(func, (task,)))
+    while pending:
+        yield pending.popleft().get()
+
+
+def generate(
+    database_url: str,
+    config: SyntheticConfig,
+    workers: Optional[int] = None,
+    create_schema: bool = False,
+) -> Dict[str, int]:
+    """
+    Bulk-load ``config``'s dataset into empty tables and return the row
+    count per table.
+
+    Chunks are generated in ``workers`` processes (all cores by default;
+    1 runs in-process). On PostgreSQL every worker COPYs its own chunks;
+    SQLite allows one writer, so chunks are inserted in order by this
+    process with ``executemany``.
+    """
+    engine = create_engine(database_url)
+    if create_schema:
+        Base.metadata.create_all(bind=engine)
+    with engine.connect() as conn:
+        for table, _ in TABLES:
+            if conn.execute(text(f"SELECT 1 FROM {table} LIMIT 1")).first() is not None:
+                raise ValueError(f"Table {table} is not empty")
+
+    postgres = engine.dialect.name == "postgresql"
+    workers = workers or multiprocessing.cpu_count()
+    pool = multiprocessing.Pool(workers) if workers > 1 else None
+    placeholder = "?" if engine.dialect.paramstyle == "qmark" else "%s"
+    conn = engine.raw_connection()
+    counts = {}
+    try:
+        if engine.dialect.name == "sqlite":
+            conn.execute("PRAGMA synchronous = OFF")
+        for table, columns in TABLES:
+            total = config.count(table)
+            tasks = [
+                (database_url if postgres and pool else None, config, table, columns, start,
+                 min(start + config.chunk_size, total))
+                for start in range(0, total, config.chunk_size)
+            ]
+            started = time.perf_counter()
+            for result in (_ordered(pool, _chunk, tasks, 2 * workers) if pool else map(_chunk, tasks)):
+                if not isinstance(result, int):
+                    _write(conn, table, columns, result, placeholder)
+            elapsed = time.perf_counter() - started
+            logger.info("%s: %d rows in %.1fs (%.0f rows/s)", table, total, elapsed, total / elapsed if elapsed else 0)
+            counts[table] = total
+    finally:
+        conn.close()
+        if pool:
+            pool.close()
+            pool.join()
+
+    with engine.begin() as conn:
+        if postgres:
+            # Ids were inserted explicitly, so move the sequences past them
+            for table, _ in TABLES:
+                conn.execute(text(
+                    f"SELECT setval(pg_get_serial_sequence('{table}', 'id'), "
+                    f"(SELECT COALESCE(MAX(id), 0) + 1 FROM {table}), false)"
+                ))
+        conn.execute(text("ANALYZE"))
+    engine.dispose()
+    return counts
@@ -1,29 +1,54 @@
-from fastapi import FastAPI, Depends, HTTPException, status
+from fastapi import FastAPI, Depends, HTTPException, Header, Query, Request, Response, status
 from fastapi.security import OAuth2PasswordRequestForm, OAuth2PasswordBearer
 from fastapi.middleware.cors import CORSMiddleware
-from sqlalchemy.orm import Session, sessionmaker
-from sqlalchemy import create_engine
+from sqlalchemy.orm import Session
+from contextlib import asynccontextmanager
 from datetime import datetime, timedelta
 from typing import List, Dict, Any, Optional
-from jose import jwt, JWTError
+import asyncio
 import json
+import logging
+import time
 
-from src.database.models import Base, User, Agent, AgentPurchase, AgentInvocation
+from src.database.models import Base, User, Agent, AgentPurchase, AgentInvocation, ApiKey, DeveloperPayout
+from src.database.session import engine, SessionLocal, get_db
+from src.database.invocation_writer import InvocationWriter
+from src.marketplace.idempotency import IdempotencyStore, sweep_expired
+from src.cache.invalidation import invalidation_bus
+from src.marketplace.popularity import PopularityTracker, run_checkpoints, checkpoint_once
+from src.marketplace.recommendations import co_purchase_index, publish_purchase, run_rebuilds
+from src.marketplace.catalog import agent_catalog, purchased_agents, catalog_validators, not_modified
+from src.search.history import history_index, ensure_schema_once
+from src.analytics.rollups import RollupJob, run_rollups, rollup_series, rollup_totals, AGENT, DEVELOPER, DAY, GRANULARITIES
+from src.search.catalog import catalog_search_index
+from src.middleware.rate_limit import RateLimiter, RateLimitRule, create_bucket_store, default_sqlite_path
+from src.middleware.timing import ServerTiming, record_timing
+from src.observability.metrics import RequestMetrics, instrument_engine, render_metrics
+from src.observability.blocking import LoopMonitor
+from src.observability.tracing import JsonlExporter, TraceMiddleware, trace_engine, tracer
+from src.observability.logs import RequestContext, configure_logging, parse_levels, payload_shape
+from src.observability.profiling import Profiler
 from src.database.schemas import (
     UserCreate, UserResponse, 
     AgentCreate, AgentResponse,
-    TokenResponse, TokenData,
+    TokenResponse, RefreshTokenRequest,
+    ApiKeyCreate, ApiKeyResponse, ApiKeyCreated,
     PurchaseCreate, AgentPurchaseResponse,
     InvocationCreate, InvocationResponse
 )
 from src.config import get_settings
 from src.auth.security import (
-    get_password_hash,
-    verify_password,
+    get_password_hash_async,
+    verify_password_async,
     create_access_token,
+    get_current_principal,
     get_current_user,
+    get_current_active_user,
     oauth2_scheme
 )
+from src.auth.principal import Principal, access_token_claims
+from src.auth.sessions import issue_refresh_token, rotate_refresh_token, revoke_refresh_token
+from src.auth.api_keys import create_api_key, revoke_api_key, parse_scopes
 
 from src.agents.resume_reviewer import ResumeReviewerAgent
 from src.agents.code_reviewer import CodeReviewAgent
@@ -33,7 +58,105 @@ from src.agents.technical_troubleshooter import TechnicalTroubleshooterAgent
 
 from pydantic import BaseModel
 
-app = FastAPI(title="AI Agent Marketplace")
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Background work opens its own sessions; tests point this at their database
+    SessionLocal = app.state.session_factory
+    invocation_writer.session_factory = SessionLocal
+    # Invocations are indexed as they are written, so the index must exist first
+    await asyncio.to_thread(ensure_schema_once, history_index, SessionLocal)
+    invalidation_bus.start()
+    await invocation_writer.start()
+    idempotency_sweeper = asyncio.create_task(sweep_expired(
+        SessionLocal, settings.IDEMPOTENCY_SWEEP_INTERVAL_SECONDS
+    ))
+    popularity_checkpoints = asyncio.create_task(run_checkpoints(
+        popularity, SessionLocal, settings.POPULARITY_CHECKPOINT_INTERVAL_SECONDS
+    ))
+    co_purchase_rebuilds = asyncio.create_task(run_rebuilds(
+        co_purchase_index, SessionLocal, settings.RECOMMENDATIONS_REBUILD_INTERVAL_HOURS * 3600
+    ))
+    analytics_rollups = asyncio.create_task(run_rollups(
+        rollup_job, SessionLocal, settings.ANALYTICS_ROLLUP_INTERVAL_SECONDS
+    ))
+    loop_monitor_task = asyncio.create_task(loop_monitor.run()) if settings.LOOP_MONITOR_ENABLED else None
+    yield
+    idempotency_sweeper.cancel()
+    popularity_checkpoints.cancel()
+    co_purchase_rebuilds.cancel()
+    analytics_rollups.cancel()
+    if loop_monitor_task:
+        loop_monitor_task.cancel()
+    try:
+        await asyncio.to_thread(checkpoint_once, popularity, SessionLocal)
+    except Exception as e:
+        logger.error("Final popularity checkpoint failed: %s", e, extra={"event": "popularity.checkpoint_failed"})
+    # Flush queued invocation records before the worker exits
+    await invocation_writer.stop()
+    invalidation_bus.stop()
+    if tracer.enabled:
+        tracer.exporter.shutdown()
+
+settings = get_settings()
+
+configure_logging(
+    level=settings.LOG_LEVEL,
+    module_levels=parse_levels(settings.LOG_LEVELS),
+    json_format=settings.LOG_FORMAT == "json",
+    sample_rates={name: float(rate) for name, rate in parse_levels(settings.LOG_SAMPLE_RATES).items()},
+    max_field_length=settings.LOG_MAX_FIELD_LENGTH,
+    queue_size=settings.LOG_QUEUE_SIZE,
+)
+logger = logging.getLogger(__name__)
+
+app = FastAPI(title="AI Agent Marketplace", lifespan=lifespan)
+app.state.session_factory = SessionLocal
+
+# Per-caller token buckets, shared across workers through the bucket store.
+# Registered before CORS so that 429 responses still carry CORS headers.
+rate_limiter = RateLimiter(
+    create_bucket_store(
+        settings.RATE_LIMIT_BACKEND,
+        settings.RATE_LIMIT_SQLITE_PATH or default_sqlite_path()
+    ),
+    rules=[
+        RateLimitRule("login", r"^/token", settings.RATE_LIMIT_LOGIN_PER_MINUTE, by_ip=True),
+        RateLimitRule("invoke", r"^/agents/invoke/", settings.RATE_LIMIT_INVOKE_PER_MINUTE),
+        RateLimitRule("default", r"^/", settings.RATE_LIMIT_PER_MINUTE),
+    ],
+)
+# Like every optional layer below, only installed when enabled, since each
+# one costs a task and a stream hop per request
+if settings.RATE_LIMIT_ENABLED:
+    app.middleware("http")(rate_limiter)
+
+# Server-Timing breakdowns (db, llm, total) for load tests
+if settings.SERVER_TIMING_ENABLED:
+    app.middleware("http")(ServerTiming())
+
+# Prometheus request metrics; outside the rate limiter so 429s are counted
+if settings.METRICS_ENABLED:
+    app.middleware("http")(RequestMetrics())
+
+# Trace spans for requests, SQL and model calls, written to local OTLP/JSON files
+if settings.TRACING_ENABLED:
+    tracer.exporter = JsonlExporter(settings.TRACING_EXPORT_PATH)
+    tracer.sample_rate = settings.TRACING_SAMPLE_RATE
+    tracer.enabled = True
+    app.middleware("http")(TraceMiddleware(tracer))
+
+# Sampling profiler; only installed when a token or sample rate is set
+profiler = Profiler(
+    settings.PROFILING_OUTPUT_DIR,
+    token=settings.PROFILING_TOKEN,
+    sample_rate=settings.PROFILING_SAMPLE_RATE,
+    interval=settings.PROFILING_INTERVAL_SECONDS,
+)
+if profiler.enabled:
+    app.middleware("http")(profiler)
+
+# Request ids for log correlation; outermost so every log line carries one
+app.middleware("http")(RequestContext())
 
 # Configure CORS
 app.add_middleware(
@@ -45,41 +168,46 @@ app.add_middleware(
 )
 
 # Database setup
-settings = get_settings()
-engine = create_engine(settings.DATABASE_URL)
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 Base.metadata.create_all(bind=engine)
+if settings.METRICS_ENABLED:
+    instrument_engine(engine)
+trace_engine(engine)
 
-# Dependency to get database session
-def get_db():
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
-
-# Dependency to get current user
-async def get_current_user(
-    db: Session = Depends(get_db),
-    token: str = Depends(oauth2_scheme)
-) -> User:
-    credentials_exception = HTTPException(
-        status_code=status.HTTP_401_UNAUTHORIZED,
-        detail="Could not validate credentials",
-        headers={"WWW-Authenticate": "Bearer"},
-    )
-    try:
-        payload = jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
-        username: str = payload.get("sub")
-        if username is None:
-            raise credentials_exception
-        token_data = TokenData(username=username)
-    except JWTError:
-        raise credentials_exception
-    user = db.query(User).filter(User.username == token_data.username).first()
-    if user is None:
-        raise credentials_exception
-    return user
+# Invocation history is written behind the request path in batches
+invocation_writer = InvocationWriter(
+    SessionLocal,
+    mode=settings.INVOCATION_WRITE_MODE,
+    max_queue_size=settings.INVOCATION_QUEUE_SIZE,
+    batch_size=settings.INVOCATION_BATCH_SIZE,
+    flush_interval=settings.INVOCATION_FLUSH_INTERVAL_MS / 1000,
+    on_insert=history_index.index,
+)
+
+# Decayed usage counters behind the popular/trending sort orders
+popularity = PopularityTracker(
+    popular_half_life=settings.POPULARITY_HALF_LIFE_HOURS * 3600,
+    trending_half_life=settings.TRENDING_HALF_LIFE_HOURS * 3600,
+)
+
+# Hourly/daily analytics, folded in from the invocation history
+rollup_job = RollupJob(
+    batch_size=settings.ANALYTICS_BATCH_SIZE,
+    settle_seconds=settings.ANALYTICS_SETTLE_SECONDS,
+)
+
+# Event loop lag, and stacks of callbacks that block the loop
+loop_monitor = LoopMonitor(
+    threshold=settings.LOOP_BLOCK_THRESHOLD_MS / 1000,
+    interval=settings.LOOP_MONITOR_INTERVAL_SECONDS,
+    history=settings.LOOP_BLOCK_HISTORY,
+)
+
+# Stored responses for retried purchase/invoke requests
+idempotency_store = IdempotencyStore(
+    ttl=timedelta(hours=settings.IDEMPOTENCY_TTL_HOURS),
+    lock_timeout=timedelta(seconds=settings.IDEMPOTENCY_LOCK_TIMEOUT_SECONDS),
+    wait_timeout=settings.IDEMPOTENCY_WAIT_TIMEOUT_SECONDS,
+)
 
 class TokenPurchaseRequest(BaseModel):
     amount: float
@@ -90,7 +218,9 @@ async def register_user(user: UserCreate, db: Session = Depends(get_db)):
     if db_user:
         raise HTTPException(status_code=400, detail="Username already registered")
     
-    hashed_password = get_password_hash(user.password)
+    # End the read transaction so no pooled connection is held while hashing
+    db.rollback()
+    hashed_password = await get_password_hash_async(user.password)
     db_user = User(
         username=user.username,
         email=user.email,
@@ -110,23 +240,61 @@ async def login_for_access_token(
     db: Session = Depends(get_db)
 ):
     user = db.query(User).filter(User.username == form_data.username).first()
-    if not user or not verify_password(form_data.password, user.hashed_password):
+    # Release the pooled connection before waiting on bcrypt; the loaded
+    # user stays usable as a detached object
+    db.close()
+    valid, new_hash = (False, None)
+    if user:
+        valid, new_hash = await verify_password_async(form_data.password, user.hashed_password)
+    if not valid:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect username or password",
             headers={"WWW-Authenticate": "Bearer"},
         )
+    if new_hash:
+        # Transparently move the stored hash to the current bcrypt cost
+        db.query(User).filter(User.id == user.id).update({User.hashed_password: new_hash})
     
+    refresh_token, _ = issue_refresh_token(db, user.id)
+    db.commit()
+    return _token_response(user, refresh_token)
+
+@app.post("/token/refresh", response_model=TokenResponse)
+async def refresh_access_token(request: RefreshTokenRequest, db: Session = Depends(get_db)):
+    """Rotate a refresh token and issue a new access token, without bcrypt"""
+    user_id, refresh_token = rotate_refresh_token(db, request.refresh_token)
+    user = db.get(User, user_id)
+    if user is None or not user.is_active:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Invalid refresh token",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+    return _token_response(user, refresh_token)
+
+@app.post("/token/revoke")
+async def revoke_token(request: RefreshTokenRequest, db: Session = Depends(get_db)):
+    """Log out: revoke the refresh token and every token rotated from it"""
+    revoke_refresh_token(db, request.refresh_token)
+    return {"status": "success"}
+
+def _token_response(user: User, refresh_token: str) -> dict:
     access_token_expires = timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
     access_token = create_access_token(
-        data={"sub": user.username}, expires_delta=access_token_expires
+        data=access_token_claims(user), expires_delta=access_token_expires
     )
-    return {"access_token": access_token, "token_type": "bearer"}
+    return {
+        "access_token": access_token,
+        "token_type": "bearer",
+        "expires_in": int(access_token_expires.total_seconds()),
+        "refresh_token": refresh_token
+    }
 
 @app.post("/agents/create", response_model=AgentResponse)
 async def create_agent(
     agent: AgentCreate, 
-    current_user: User = Depends(get_current_user),
+    current_user: Principal = Depends(get_current_principal),
     db: Session = Depends(get_db)
 ):
     if not current_user.is_developer:
@@ -149,65 +317,153 @@ async def create_agent(
 
 @app.get("/agents", response_model=List[AgentResponse])
 async def list_agents(
-    current_user: User = Depends(get_current_user),
+    response: Response,
+    sort: Optional[str] = Query(None, pattern="^(popular|trending)$"),
+    current_user: Principal = Depends(get_current_principal),
+    if_none_match: Optional[str] = Header(None),
+    if_modified_since: Optional[str] = Header(None),
     db: Session = Depends(get_db)
 ):
-    """List all available agents"""
-    agents = db.query(Agent).filter(Agent.is_active == True).all()
-    
-    # Get all purchased agents for the current user
-    purchased_agent_ids = {
-        purchase.agent_id for purchase in 
-        db.query(AgentPurchase).filter(AgentPurchase.user_id == current_user.id).all()
-    }
-    
+    """List all available agents, optionally most popular or trending first"""
+    catalog = agent_catalog.snapshot(db)
+    purchased = purchased_agents(db, current_user.id)
+
+    agent_ids = popularity.order(catalog.active_ids, sort) if sort else catalog.active_ids
+    # Rankings are per worker and change between checkpoints, so a sorted
+    # listing is tagged with the order it returns
+    etag, last_modified = catalog_validators(catalog, purchased, order=agent_ids if sort else None)
+    if not_modified(etag, last_modified, if_none_match, None if sort else if_modified_since):
+        return _not_modified(etag, last_modified)
+    _set_validators(response, etag, last_modified)
+
     return [
-        AgentResponse(
-            id=agent.id,
-            name=agent.name,
-            description=agent.description,
-            price=agent.price,
-            developer_id=agent.developer_id,
-            is_active=agent.is_active,
-            is_purchased=agent.id in purchased_agent_ids,
-            created_at=agent.created_at
-        )
-        for agent in agents
+        catalog.agents[agent_id].model_copy(update={"is_purchased": agent_id in purchased.agent_ids})
+        for agent_id in agent_ids
     ]
 
+@app.get("/agents/search")
+async def search_agents(
+    q: Optional[str] = Query(None, max_length=200),
+    min_price: Optional[float] = Query(None, ge=0),
+    max_price: Optional[float] = Query(None, ge=0),
+    developer_id: Optional[int] = None,
+    page: int = Query(1, ge=1),
+    page_size: int = Query(20, ge=1, le=100),
+    current_user: Principal = Depends(get_current_principal),
+    db: Session = Depends(get_db)
+):
+    """Search active agents by name and description, best match first"""
+    catalog_search_index.ensure_current(db)
+    result = catalog_search_index.search(
+        q, min_price=min_price, max_price=max_price, developer_id=developer_id,
+        limit=page_size, offset=(page - 1) * page_size
+    )
+    purchased = purchased_agents(db, current_user.id)
+    return {
+        "query": q,
+        "total": result.total,
+        "page": page,
+        "page_size": page_size,
+        "results": [{
+            **agent.model_dump(),
+            "is_purchased": agent.id in purchased.agent_ids,
+            "score": score
+        } for agent, score in result.agents]
+    }
+
 @app.get("/agents/{agent_id}", response_model=AgentResponse)
 async def get_agent(
     agent_id: int,
-    current_user: User = Depends(get_current_user),
+    response: Response,
+    current_user: Principal = Depends(get_current_principal),
+    if_none_match: Optional[str] = Header(None),
+    if_modified_since: Optional[str] = Header(None),
     db: Session = Depends(get_db)
 ):
-    agent = db.query(Agent).filter(Agent.id == agent_id).first()
+    catalog = agent_catalog.snapshot(db)
+    agent = catalog.agents.get(agent_id)
     if not agent:
         raise HTTPException(status_code=404, detail="Agent not found")
     
     # Check if user has purchased this agent
-    purchase = db.query(AgentPurchase).filter(
-        AgentPurchase.user_id == current_user.id,
-        AgentPurchase.agent_id == agent_id
-    ).first()
-    
-    return AgentResponse(
-        id=agent.id,
-        name=agent.name,
-        description=agent.description,
-        price=agent.price,
-        developer_id=agent.developer_id,
-        is_active=agent.is_active,
-        is_purchased=purchase is not None,
-        created_at=agent.created_at
-    )
+    purchased = purchased_agents(db, current_user.id)
+
+    etag, last_modified = catalog_validators(catalog, purchased, agent_id)
+    if not_modified(etag, last_modified, if_none_match, if_modified_since):
+        return _not_modified(etag, last_modified)
+    _set_validators(response, etag, last_modified)
+
+    return agent.model_copy(update={"is_purchased": agent_id in purchased.agent_ids})
+
+def _set_validators(response: Response, etag: str, last_modified: str):
+    response.headers["ETag"] = etag
+    response.headers["Last-Modified"] = last_modified
+    # Browsers must revalidate, since the purchased flags are per user
+    response.headers["Cache-Control"] = "private, no-cache"
+
+def _not_modified(etag: str, last_modified: str) -> Response:
+    response = Response(status_code=status.HTTP_304_NOT_MODIFIED)
+    _set_validators(response, etag, last_modified)
+    return response
+
+@app.get("/agents/{agent_id}/recommendations", response_model=List[AgentResponse])
+async def get_agent_recommendations(
+    agent_id: int,
+    current_user: Principal = Depends(get_current_principal),
+    db: Session = Depends(get_db)
+):
+    """Agents most often bought by users who also bought this one"""
+    catalog = agent_catalog.snapshot(db)
+    if agent_id not in catalog.agents:
+        raise HTTPException(status_code=404, detail="Agent not found")
+    purchased = purchased_agents(db, current_user.id)
+    return [
+        catalog.agents[neighbour].model_copy(update={"is_purchased": neighbour in purchased.agent_ids})
+        for neighbour, _ in co_purchase_index.neighbours(agent_id)
+        if neighbour in catalog.agents and catalog.agents[neighbour].is_active
+    ]
+
+@app.get("/agents/{agent_id}/analytics")
+async def get_agent_analytics(
+    agent_id: int,
+    granularity: str = Query(DAY, pattern=f"^({'|'.join(GRANULARITIES)})$"),
+    days: int = Query(30, ge=1, le=365),
+    current_user: Principal = Depends(get_current_principal),
+    db: Session = Depends(get_db)
+):
+    """Usage, revenue and latency percentiles for one of the caller's agents"""
+    agent = agent_catalog.snapshot(db).agents.get(agent_id)
+    if not agent:
+        raise HTTPException(status_code=404, detail="Agent not found")
+    if agent.developer_id != current_user.id:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Only the agent's developer can view its analytics"
+        )
+    since = datetime.utcnow() - timedelta(days=days)
+    return {
+        "id": agent.id,
+        "name": agent.name,
+        "granularity": granularity,
+        "time_series": rollup_series(db, AGENT, [agent.id], granularity, since)
+    }
 
 @app.post("/agents/purchase", response_model=AgentPurchaseResponse)
 async def purchase_agent(
     purchase: PurchaseCreate,
+    idempotency_key: Optional[str] = Header(None),
+    principal: Principal = Depends(get_current_principal),
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
+    principal.require_agent_scope(purchase.agent_id)
+    return await idempotency_store.run(
+        db, current_user.id, idempotency_key,
+        "POST /agents/purchase", purchase.model_dump(),
+        lambda: _purchase_agent(purchase, current_user, db)
+    )
+
+async def _purchase_agent(purchase: PurchaseCreate, current_user: User, db: Session):
     # Check if agent exists
     agent = db.query(Agent).filter(Agent.id == purchase.agent_id).first()
     if not agent:
@@ -236,6 +492,8 @@ async def purchase_agent(
     db.add(db_purchase)
     db.commit()
     db.refresh(db_purchase)
+    popularity.record(purchase.agent_id, "purchase")
+    publish_purchase(current_user.id, purchase.agent_id, purchased_agents(db, current_user.id).agent_ids)
     
     return AgentPurchaseResponse(
         agent_id=purchase.agent_id,
@@ -248,62 +506,76 @@ async def purchase_agent(
 async def invoke_agent(
     agent_id: int,
     input_data: dict,
+    idempotency_key: Optional[str] = Header(None),
+    principal: Principal = Depends(get_current_principal),
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
-    print(f"Invoking agent {agent_id} with input: {input_data}")
+    principal.require_agent_scope(agent_id)
+    return await idempotency_store.run(
+        db, current_user.id, idempotency_key,
+        f"POST /agents/invoke/{agent_id}", input_data,
+        lambda: _invoke_agent(agent_id, input_data, current_user, db)
+    )
+
+async def _invoke_agent(agent_id: int, input_data: dict, current_user: User, db: Session):
     agent = db.query(Agent).filter(Agent.id == agent_id).first()
     if not agent:
-        print(f"Agent {agent_id} not found in database")
         raise HTTPException(status_code=404, detail="Agent not found")
     
-    print(f"Found agent in database: {agent.name}")
     # Get the agent instance from available agents
     agent_key = AGENT_NAME_TO_KEY.get(agent.name)
-    print(f"Looking up agent with key: {agent_key}")
-    print(f"Available agents: {list(AVAILABLE_AGENTS.keys())}")
-    
     if not agent_key:
-        print(f"No mapping found for agent name: {agent.name}")
+        logger.warning("No implementation mapping for agent %s", agent.name, extra={"event": "agent.unmapped", "agent_id": agent_id})
         raise HTTPException(status_code=404, detail=f"No implementation mapping for agent: {agent.name}")
     
     agent_instance = AVAILABLE_AGENTS.get(agent_key)
     if not agent_instance:
-        print(f"No implementation found for agent key: {agent_key}")
+        logger.error("No implementation for agent key %s", agent_key, extra={"event": "agent.unmapped", "agent_id": agent_id})
         raise HTTPException(status_code=404, detail="Agent implementation not found")
     
     try:
-        print(f"Processing request with agent instance: {type(agent_instance).__name__}")
+        started = time.perf_counter()
         result = await agent_instance.process_request(input_data)
-        print(f"Got result from agent: {result}")
-        
-        # Record the invocation
-        db_invocation = AgentInvocation(
-            user_id=current_user.id,
-            agent_id=agent_id,
-            input_data=json.dumps(input_data),  # Properly serialize to JSON
-            output_data=json.dumps(result),     # Properly serialize to JSON
-            tokens_used=result.get("token_usage", {}).get("total_tokens", 0)
-        )
-        db.add(db_invocation)
+        latency_ms = (time.perf_counter() - started) * 1000
+        record_timing("llm", latency_ms / 1000)
         
-        # Update user's token balance
+        # Update user's token balance; this stays on the request path
         cost = result.get("cost", 0)
         if current_user.token_balance < cost:
             raise HTTPException(status_code=400, detail="Insufficient token balance")
-        current_user.token_balance -= cost
+        with tracer.span("invoke.charge", cost=cost):
+            current_user.token_balance -= cost
+            db.commit()
+        popularity.record(agent_id, "invoke")
         
-        db.commit()
+        # Record the invocation; the payload insert is batched by the writer
+        await invocation_writer.submit(
+            user_id=current_user.id,
+            agent_id=agent_id,
+            input_data=input_data,
+            output_data=result,
+            tokens_used=result.get("token_usage", {}).get("total_tokens", 0),
+            cost=cost,
+            latency_ms=latency_ms
+        )
+        logger.info(
+            "Invoked %s", agent_key,
+            extra={"event": "agent.invoked", "agent_id": agent_id, "user_id": current_user.id,
+                   "latency_ms": round(latency_ms, 1), "cost": cost, "input": payload_shape(input_data)},
+        )
         return result
         
+    except HTTPException:
+        raise
     except Exception as e:
-        print(f"Error processing request: {str(e)}")
+        logger.exception("Agent %s failed", agent_key, extra={"event": "agent.failed", "agent_id": agent_id, "input": payload_shape(input_data)})
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.post("/agents/summarize")
 async def summarize_conversation(
     request: dict,
-    current_user: User = Depends(get_current_user),
+    current_user: Principal = Depends(get_current_principal),
     db: Session = Depends(get_db)
 ):
     try:
@@ -392,33 +664,196 @@ async def purchase_tokens(
 async def get_current_user_info(current_user: User = Depends(get_current_user)):
     return UserResponse.model_validate(current_user)
 
+@app.post("/users/me/api-keys", response_model=ApiKeyCreated)
+async def create_user_api_key(
+    request: ApiKeyCreate,
+    current_user: Principal = Depends(get_current_principal),
+    db: Session = Depends(get_db)
+):
+    """Create an API key; the full key is only returned here"""
+    _require_interactive_login(current_user)
+    expires_at = None
+    if request.expires_in_days:
+        expires_at = datetime.utcnow() + timedelta(days=request.expires_in_days)
+    raw_key, record = create_api_key(
+        db, current_user.id, request.name,
+        agent_ids=request.agent_ids, expires_at=expires_at
+    )
+    return ApiKeyCreated(key=raw_key, **_api_key_fields(record))
+
+@app.get("/users/me/api-keys", response_model=List[ApiKeyResponse])
+async def list_user_api_keys(
+    current_user: Principal = Depends(get_current_principal),
+    db: Session = Depends(get_db)
+):
+    _require_interactive_login(current_user)
+    records = db.query(ApiKey).filter(ApiKey.user_id == current_user.id).order_by(ApiKey.id).all()
+    return [ApiKeyResponse(**_api_key_fields(record)) for record in records]
+
+@app.delete("/users/me/api-keys/{key_id}", response_model=ApiKeyResponse)
+async def revoke_user_api_key(
+    key_id: int,
+    current_user: Principal = Depends(get_current_principal),
+    db: Session = Depends(get_db)
+):
+    _require_interactive_login(current_user)
+    record = db.query(ApiKey).filter(ApiKey.id == key_id, ApiKey.user_id == current_user.id).first()
+    if not record:
+        raise HTTPException(status_code=404, detail="API key not found")
+    revoke_api_key(db, record)
+    return ApiKeyResponse(**_api_key_fields(record))
+
+def _require_interactive_login(principal: Principal):
+    # Keys must not be able to mint or revoke other keys
+    if principal.api_key_id is not None:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="API keys cannot manage API keys"
+        )
+
+def _api_key_fields(record: ApiKey) -> dict:
+    scopes = parse_scopes(record.agent_scopes)
+    return {
+        "id": record.id,
+        "name": record.name,
+        "prefix": record.prefix,
+        "agent_ids": sorted(scopes) if scopes is not None else None,
+        "created_at": record.created_at,
+        "expires_at": record.expires_at,
+        "revoked_at": record.revoked_at
+    }
+
 @app.get("/users/me/invocations", response_model=List[Dict[str, Any]])
 async def get_user_invocations(
-    current_user: User = Depends(get_current_user),
+    current_user: Principal = Depends(get_current_principal),
     db: Session = Depends(get_db)
 ):
     """Get all invocations for the current user"""
-    invocations = db.query(AgentInvocation).filter(
+    # Agent names come from the same query rather than one lazy load per row
+    invocations = db.query(AgentInvocation, Agent.name).outerjoin(
+        Agent, AgentInvocation.agent_id == Agent.id
+    ).filter(
         AgentInvocation.user_id == current_user.id
     ).order_by(AgentInvocation.created_at.desc()).all()
     
     return [{
         "id": inv.id,
         "agent_id": inv.agent_id,
-        "agent_name": inv.agent.name,
+        "agent_name": agent_name,
         "input_data": inv.input_data,
         "output_data": inv.output_data,
         "tokens_used": inv.tokens_used,
         "created_at": inv.created_at.isoformat()
-    } for inv in invocations]
+    } for inv, agent_name in invocations]
+
+@app.get("/users/me/invocations/search")
+async def search_user_invocations(
+    q: str = Query(..., min_length=1, max_length=200),
+    page: int = Query(1, ge=1),
+    page_size: int = Query(20, ge=1, le=100),
+    current_user: Principal = Depends(get_current_principal),
+    db: Session = Depends(get_db)
+):
+    """Full-text search over the current user's invocation history, best match first"""
+    hits, total = history_index.search(
+        db, current_user.id, q, limit=page_size, offset=(page - 1) * page_size
+    )
+    return {
+        "query": q,
+        "total": total,
+        "page": page,
+        "page_size": page_size,
+        "results": [{
+            "id": hit.invocation_id,
+            "agent_id": hit.agent_id,
+            "agent_name": hit.agent_name,
+            "created_at": hit.created_at,
+            "rank": hit.rank,
+            "snippet": hit.snippet
+        } for hit in hits]
+    }
+
+@app.get("/developers/me/analytics")
+async def get_developer_analytics(
+    granularity: str = Query(DAY, pattern=f"^({'|'.join(GRANULARITIES)})$"),
+    days: int = Query(30, ge=1, le=365),
+    current_user: Principal = Depends(get_current_principal),
+    db: Session = Depends(get_db)
+):
+    """Usage, revenue and latency percentiles across all of the caller's agents"""
+    _require_developer(current_user)
+    since = datetime.utcnow() - timedelta(days=days)
+    return {
+        "developer_id": current_user.id,
+        "granularity": granularity,
+        "time_series": rollup_series(db, DEVELOPER, [current_user.id], granularity, since),
+        "agents": _developer_agent_totals(db, current_user.id, since)
+    }
+
+@app.get("/marketplace/developer-earnings")
+async def get_developer_earnings(
+    current_user: Principal = Depends(get_current_principal),
+    db: Session = Depends(get_db)
+):
+    """All-time invocation revenue per agent for the calling developer"""
+    _require_developer(current_user)
+    agents = _developer_agent_totals(db, current_user.id)
+    return {
+        "total_earnings": round(sum(agent["revenue"] for agent in agents), 6),
+        "earnings_by_agent": [{
+            "agent_id": agent["agent_id"],
+            "agent_name": agent["agent_name"],
+            "earnings": agent["revenue"],
+            "invocations": agent["invocations"]
+        } for agent in agents]
+    }
+
+@app.get("/developers/me/payouts")
+async def list_developer_payouts(
+    current_user: Principal = Depends(get_current_principal),
+    db: Session = Depends(get_db)
+):
+    """Computed payout records for the calling developer, newest period first"""
+    _require_developer(current_user)
+    payouts = db.query(DeveloperPayout).filter(
+        DeveloperPayout.developer_id == current_user.id
+    ).order_by(DeveloperPayout.period_start.desc()).all()
+    return [{
+        "id": payout.id,
+        "period": payout.period,
+        "period_start": payout.period_start.isoformat(),
+        "period_end": payout.period_end.isoformat(),
+        "purchases": payout.purchases,
+        "purchase_revenue": payout.purchase_revenue,
+        "invocations": payout.invocations,
+        "invocation_revenue": payout.invocation_revenue,
+        "amount": payout.amount,
+        "status": payout.status
+    } for payout in payouts]
+
+def _require_developer(principal: Principal):
+    if not principal.is_developer:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Only developers can view earnings and analytics"
+        )
+
+def _developer_agent_totals(db: Session, developer_id: int, since: Optional[datetime] = None) -> List[dict]:
+    agents = [agent for agent in agent_catalog.snapshot(db).agents.values() if agent.developer_id == developer_id]
+    totals = rollup_totals(db, AGENT, [agent.id for agent in agents], since)
+    empty = {"invocations": 0, "tokens": 0, "revenue": 0.0}
+    return [
+        {"agent_id": agent.id, "agent_name": agent.name, **totals.get(agent.id, empty)}
+        for agent in sorted(agents, key=lambda agent: agent.id)
+    ]
 
 @app.get("/agents/invocations")
 async def list_invocations(
-    current_user: User = Depends(get_current_user),
+    current_user: Principal = Depends(get_current_principal),
     db: Session = Depends(get_db)
 ):
     invocations = (
-        db.query(AgentInvocation)
+        db.query(AgentInvocation, Agent.name)
         .join(AgentPurchase, AgentInvocation.purchase_id == AgentPurchase.id)
         .join(Agent, AgentPurchase.agent_id == Agent.id)
         .filter(AgentPurchase.user_id == current_user.id)
@@ -436,10 +871,26 @@ async def list_invocations(
             "output_data": invocation.output_data,
             "tokens_used": invocation.tokens_used,
             "created_at": invocation.created_at,
-            "agent_name": invocation.agent.name
-        } for invocation in invocations]
+            "agent_name": agent_name
+        } for invocation, agent_name in invocations]
     }
 
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    """Prometheus metrics for every worker"""
+    if not settings.METRICS_ENABLED:
+        raise HTTPException(status_code=404, detail="Not Found")
+    body, content_type = render_metrics()
+    return Response(content=body, media_type=content_type)
+
+@app.get("/debug/event-loop", include_in_schema=False)
+async def event_loop_debug(request: Request):
+    """Current loop lag and the latest blocking callbacks with their stacks"""
+    # Stacks expose code paths: only in DEBUG or with the profiling token
+    if not settings.LOOP_MONITOR_ENABLED or not (settings.DEBUG or profiler.authorized(request)):
+        raise HTTPException(status_code=404, detail="Not Found")
+    return loop_monitor.snapshot()
+
 # Pre-configured agents
 AVAILABLE_AGENTS = {
     "resume_reviewer": ResumeReviewerAgent(),
@@ -0,0 +1,156 @@
+import hashlib
+import threading
+import time
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from typing import Callable, Dict, FrozenSet, Optional, Sequence, Tuple
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session, object_session
+
+from ..cache.invalidation import invalidation_bus, publish_after_commit
+from ..cache.ttl import TTLCache
+from ..config import get_settings
+from ..database.models import Agent, AgentPurchase
+from ..database.schemas import AgentResponse
+
+settings = get_settings()
+
+_EPOCH = datetime(1970, 1, 1)
+
+
+@dataclass(frozen=True)
+class CatalogSnapshot:
+    """Every agent as of one load, with a validator for the whole set."""
+    agents: Dict[int, AgentResponse]
+    active_ids: Tuple[int, ...]
+    etag: str
+    last_modified: datetime
+
+
+@dataclass(frozen=True)
+class PurchasedSet:
+    agent_ids: FrozenSet[int]
+    last_purchase: datetime
+
+
+class AgentCatalog:
+    """
+    In-process copy of the agents table.
+
+    The catalog only changes when an agent is created or updated, so one
+    query rebuilds it and every ``/agents`` request after that is served
+    from memory. Commits touching an ``Agent`` invalidate it on every
+    worker through the invalidation bus; the TTL is the backstop for
+    missed messages.
+    """
+
+    def __init__(self, ttl: float, clock: Callable[[], float] = time.monotonic):
+        self.ttl = ttl
+        self._clock = clock
+        self._snapshot: Optional[CatalogSnapshot] = None
+        self._loaded_at = 0.0
+        self._lock = threading.Lock()
+
+    def snapshot(self, db: Session) -> CatalogSnapshot:
+        snapshot = self._snapshot
+        if snapshot is not None and self._clock() - self._loaded_at < self.ttl:
+            return snapshot
+        with self._lock:
+            if self._snapshot is not None and self._clock() - self._loaded_at < self.ttl:
+                return self._snapshot
+            self._snapshot = self._load(db)
+            self._loaded_at = self._clock()
+            return self._snapshot
+
+    def invalidate(self):
+        with self._lock:
+            self._snapshot = None
+
+    @staticmethod
+    def _load(db: Session) -> CatalogSnapshot:
+        rows = db.query(Agent).order_by(Agent.id).all()
+        agents = {agent.id: AgentResponse.model_validate(agent) for agent in rows}
+        digest = hashlib.sha1()
+        for agent in agents.values():
+            digest.update(agent.model_dump_json().encode())
+        return CatalogSnapshot(
+            agents=agents,
+            active_ids=tuple(agent.id for agent in rows if agent.is_active),
+            etag=digest.hexdigest()[:16],
+            last_modified=max((agent.updated_at or agent.created_at or _EPOCH for agent in rows), default=_EPOCH),
+        )
+
+
+agent_catalog = AgentCatalog(ttl=settings.CATALOG_CACHE_TTL_SECONDS)
+
+# Agent ids each user has purchased, keyed by user id
+purchased_cache = TTLCache(
+    maxsize=settings.PURCHASED_CACHE_SIZE,
+    ttl=settings.PURCHASED_CACHE_TTL_SECONDS,
+)
+
+invalidation_bus.subscribe("catalog", lambda key: agent_catalog.invalidate())
+invalidation_bus.subscribe("purchased", purchased_cache.invalidate)
+
+
+def purchased_agents(db: Session, user_id: int) -> PurchasedSet:
+    purchased = purchased_cache.get(user_id)
+    if purchased is None:
+        rows = db.query(AgentPurchase.agent_id, AgentPurchase.purchase_date).filter(
+            AgentPurchase.user_id == user_id
+        ).all()
+        purchased = PurchasedSet(
+            agent_ids=frozenset(agent_id for agent_id, _ in rows),
+            last_purchase=max((date or _EPOCH for _, date in rows), default=_EPOCH),
+        )
+        purchased_cache.set(user_id, purchased)
+    return purchased
+
+
+def catalog_validators(snapshot: CatalogSnapshot, purchased: PurchasedSet, agent_id: Optional[int] = None,
+                       order: Optional[Sequence[int]] = None) -> Tuple[str, str]:
+    """
+    ``(etag, last_modified)`` for a user's view of the catalog, or of one
+    agent when ``agent_id`` is given. The view depends on the purchased
+    set, so that is folded into the tag, as is the ``order`` of a ranked
+    listing.
+    """
+    if agent_id is None:
+        catalog_tag = snapshot.etag
+        owned = ",".join(str(i) for i in sorted(purchased.agent_ids))
+    else:
+        catalog_tag = hashlib.sha1(snapshot.agents[agent_id].model_dump_json().encode()).hexdigest()[:16]
+        owned = str(agent_id in purchased.agent_ids)
+    if order is not None:
+        owned += "|" + ",".join(str(i) for i in order)
+    user_tag = hashlib.sha1(owned.encode()).hexdigest()[:8]
+    last_modified = max(snapshot.last_modified, purchased.last_purchase)
+    return f'W/"{catalog_tag}-{user_tag}"', format_datetime(last_modified.replace(tzinfo=timezone.utc), usegmt=True)
+
+
+def not_modified(etag: str, last_modified: str, if_none_match: Optional[str], if_modified_since: Optional[str]) -> bool:
+    # If-None-Match wins when both are sent (RFC 9110 13.2.2)
+    if if_none_match is not None:
+        tags = {tag.strip() for tag in if_none_match.split(",")}
+        return "*" in tags or etag in tags or etag[2:] in tags
+    if if_modified_since is not None:
+        try:
+            return parsedate_to_datetime(last_modified) <= parsedate_to_datetime(if_modified_since)
+        except (TypeError, ValueError):
+            return False
+    return False
+
+
+@event.listens_for(Agent, "after_insert")
+@event.listens_for(Agent, "after_update")
+@event.listens_for(Agent, "after_delete")
+def _invalidate_catalog(mapper, connection, target):
+    publish_after_commit(object_session(target), "catalog", target.id)
+
+
+@event.listens_for(AgentPurchase, "after_insert")
+@event.listens_for(AgentPurchase, "after_delete")
+def _invalidate_purchased(mapper, connection, target):
+    publish_after_commit(object_session(target), "purchased", target.user_id)
@@ -0,0 +1,222 @@
+import asyncio
+import hashlib
+import json
+import logging
+from datetime import datetime, timedelta
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+from fastapi import HTTPException, status
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from ..database.models import IdempotencyKey
+
+logger = logging.getLogger(__name__)
+
+IN_PROGRESS = "in_progress"
+COMPLETED = "completed"
+
+
+class IdempotencyStore:
+    """
+    Replays stored responses for requests carrying an ``Idempotency-Key``.
+
+    The first request with a key claims it by inserting an ``in_progress``
+    row; the (user_id, key) unique constraint makes the claim atomic across
+    workers. Retries within the TTL get the stored response without running
+    the handler again, and retries that arrive while the original is still
+    running wait for its result.
+    """
+
+    def __init__(
+        self,
+        ttl: timedelta = timedelta(hours=24),
+        lock_timeout: timedelta = timedelta(minutes=5),
+        wait_timeout: float = 120.0,
+        poll_interval: float = 0.25,
+    ):
+        self.ttl = ttl
+        self.lock_timeout = lock_timeout
+        self.wait_timeout = wait_timeout
+        self.poll_interval = poll_interval
+        # Requests currently running in this process, so local retries can
+        # wait on an event instead of polling the database
+        self._inflight: Dict[Tuple[int, str], asyncio.Event] = {}
+
+    async def run(
+        self,
+        db: Session,
+        user_id: int,
+        key: Optional[str],
+        endpoint: str,
+        request_data: Any,
+        handler: Callable[[], Awaitable[Any]],
+    ):
+        if not key:
+            return await handler()
+
+        request_hash = _fingerprint(endpoint, request_data)
+        deadline = asyncio.get_running_loop().time() + self.wait_timeout
+
+        while True:
+            record = self._claim(db, user_id, key, endpoint, request_hash)
+            if record is None:
+                return await self._execute(db, user_id, key, handler)
+
+            if record.endpoint != endpoint or record.request_hash != request_hash:
+                raise HTTPException(
+                    status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+                    detail="Idempotency-Key was already used with a different request"
+                )
+            if record.status == COMPLETED:
+                return _replay(record)
+
+            # The original request is still running; wait for it to finish,
+            # then loop to pick up its stored response (or the released key)
+            remaining = deadline - asyncio.get_running_loop().time()
+            if remaining <= 0:
+                raise HTTPException(
+                    status_code=status.HTTP_409_CONFLICT,
+                    detail="A request with this Idempotency-Key is still in progress"
+                )
+            event = self._inflight.get((user_id, key))
+            try:
+                if event is not None:
+                    await asyncio.wait_for(event.wait(), remaining)
+                else:
+                    await asyncio.sleep(min(self.poll_interval, remaining))
+            except asyncio.TimeoutError:
+                pass
+
+    def _claim(self, db: Session, user_id: int, key: str, endpoint: str, request_hash: str):
+        """Insert an in-progress row, or return the existing one for this key."""
+        now = datetime.utcnow()
+        db.add(IdempotencyKey(
+            user_id=user_id,
+            key=key,
+            endpoint=endpoint,
+            request_hash=request_hash,
+            status=IN_PROGRESS,
+            created_at=now,
+            # An in-progress claim only blocks retries for lock_timeout, so
+            # a worker dying mid-request doesn't wedge the key for the TTL
+            expires_at=now + self.lock_timeout,
+        ))
+        try:
+            db.commit()
+            return None
+        except IntegrityError:
+            db.rollback()
+
+        record = db.query(IdempotencyKey).filter(
+            IdempotencyKey.user_id == user_id,
+            IdempotencyKey.key == key
+        ).populate_existing().first()
+        if record is not None and record.expires_at is not None and record.expires_at < now:
+            # Expired, or abandoned by a worker that died mid-request
+            db.delete(record)
+            db.commit()
+            return self._claim(db, user_id, key, endpoint, request_hash)
+        if record is None:
+            # Released between our insert and the lookup; try again
+            return self._claim(db, user_id, key, endpoint, request_hash)
+        return record
+
+    async def _execute(self, db: Session, user_id: int, key: str, handler):
+        event = asyncio.Event()
+        self._inflight[(user_id, key)] = event
+        try:
+            try:
+                result = await handler()
+            except HTTPException as e:
+                if e.status_code >= 500:
+                    self._release(db, user_id, key)
+                    raise
+                db.rollback()
+                self._complete(db, user_id, key, e.status_code, {"detail": e.detail})
+                raise
+            except Exception:
+                self._release(db, user_id, key)
+                raise
+            self._complete(db, user_id, key, status.HTTP_200_OK, jsonable_encoder(result))
+            return result
+        finally:
+            self._inflight.pop((user_id, key), None)
+            event.set()
+
+    def _complete(self, db: Session, user_id: int, key: str, status_code: int, body: Any):
+        db.query(IdempotencyKey).filter(
+            IdempotencyKey.user_id == user_id,
+            IdempotencyKey.key == key
+        ).update({
+            IdempotencyKey.status: COMPLETED,
+            IdempotencyKey.response_status: status_code,
+            IdempotencyKey.response_body: json.dumps(body),
+            IdempotencyKey.expires_at: datetime.utcnow() + self.ttl,
+        }, synchronize_session=False)
+        db.commit()
+
+    def _release(self, db: Session, user_id: int, key: str):
+        """Drop the claim after a server error so the client can retry."""
+        try:
+            db.rollback()
+            db.query(IdempotencyKey).filter(
+                IdempotencyKey.user_id == user_id,
+                IdempotencyKey.key == key
+            ).delete(synchronize_session=False)
+            db.commit()
+        except Exception as e:
+            logger.error(f"Failed to release idempotency key {key}: {e}")
+            db.rollback()
+
+
+def purge_expired(db: Session, batch_size: int = 1000) -> int:
+    """Delete expired idempotency records, at most ``batch_size`` per call."""
+    expired_ids = [
+        row.id for row in
+        db.query(IdempotencyKey.id)
+        .filter(IdempotencyKey.expires_at < datetime.utcnow())
+        .limit(batch_size)
+        .all()
+    ]
+    if not expired_ids:
+        return 0
+    db.query(IdempotencyKey).filter(
+        IdempotencyKey.id.in_(expired_ids)
+    ).delete(synchronize_session=False)
+    db.commit()
+    return len(expired_ids)
+
+
+async def sweep_expired(session_factory, interval: float, batch_size: int = 1000):
+    """Background task that keeps the idempotency table bounded."""
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            await asyncio.to_thread(_sweep_once, session_factory, batch_size)
+        except Exception as e:
+            logger.error(f"Idempotency sweep failed: {e}")
+
+
+def _sweep_once(session_factory, batch_size: int):
+    db = session_factory()
+    try:
+        while purge_expired(db, batch_size) == batch_size:
+            pass
+    finally:
+        db.close()
+
+
+def _fingerprint(endpoint: str, request_data: Any) -> str:
+    payload = json.dumps(jsonable_encoder(request_data), sort_keys=True)
+    return hashlib.sha256(f"{endpoint}\n{payload}".encode()).hexdigest()
+
+
+def _replay(record: IdempotencyKey) -> JSONResponse:
+    return JSONResponse(
+        status_code=record.response_status,
+        content=json.loads(record.response_body),
+        headers={"Idempotent-Replayed": "true"},
+    )
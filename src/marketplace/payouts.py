@@ -0,0 +1,216 @@
+import logging
+from dataclasses import dataclass
+from datetime import datetime
+from itertools import chain
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+from sqlalchemy import BigInteger, Integer, cast, func, select
+from sqlalchemy.orm import Session
+
+from ..database.models import Agent, AgentInvocation, AgentPurchase, DeveloperPayout
+
+logger = logging.getLogger(__name__)
+
+DAY = "day"
+WEEK = "week"
+MONTH = "month"
+PERIODS = (DAY, WEEK, MONTH)
+
+# Per-key columns accumulated by the engine
+PURCHASES, PURCHASE_REVENUE, INVOCATIONS, INVOCATION_REVENUE = range(4)
+
+# Period starts are day numbers (days since 1970-01-01); keys pack the
+# developer id above them so one integer sorts by developer, then period
+_DAY_BITS = 20
+
+
+def period_days(days: np.ndarray, period: str) -> np.ndarray:
+    """Day number of the start of the period containing each day number."""
+    if period == DAY:
+        return days
+    if period == WEEK:
+        # 1970-01-01 was a Thursday; weeks start on Monday
+        return days - (days + 3) % 7
+    if period == MONTH:
+        months = days.astype("datetime64[D]").astype("datetime64[M]")
+        return months.astype("datetime64[D]").astype(np.int64)
+    raise ValueError(f"Unknown payout period: {period}")
+
+
+def period_start(at: datetime, period: str) -> datetime:
+    """Start of the period containing ``at``."""
+    day = np.array([(at - datetime(1970, 1, 1)).days], dtype=np.int64)
+    return _to_datetime(int(period_days(day, period)[0]))
+
+
+def _to_datetime(day: int) -> datetime:
+    return np.datetime64(day, "D").astype("datetime64[s]").astype(datetime)
+
+
+def _next_period(start: datetime, period: str) -> datetime:
+    day = (start - datetime(1970, 1, 1)).days
+    step = {DAY: 1, WEEK: 7, MONTH: 31}[period]
+    return _to_datetime(int(period_days(np.array([day + step], dtype=np.int64), period)[0]))
+
+
+@dataclass
+class PayoutTotals:
+    developer_id: int
+    period_start: datetime
+    purchases: int
+    purchase_revenue: float
+    invocations: int
+    invocation_revenue: float
+
+    @property
+    def amount(self) -> float:
+        return self.purchase_revenue + self.invocation_revenue
+
+
+class PayoutEngine:
+    """
+    Developer earnings per payout period, from purchases and invocation costs.
+
+    Rows are streamed from the database in chunks of ``chunk_size`` as plain
+    ``(agent_id, epoch seconds, amount)`` columns. Each chunk is mapped to
+    developers through an agent -> developer lookup array and reduced with a
+    NumPy group-by (``unique`` + ``bincount``) on a packed developer/period
+    key, so memory stays bounded by the chunk size and the number of
+    developer periods rather than the number of rows.
+    """
+
+    def __init__(self, period: str = MONTH, chunk_size: int = 100_000):
+        if period not in PERIODS:
+            raise ValueError(f"Unknown payout period: {period}")
+        self.period = period
+        self.chunk_size = chunk_size
+
+    def compute(self, db: Session, start: datetime, end: datetime) -> List[PayoutTotals]:
+        """Totals per developer and period for rows in ``[start, end)``."""
+        developer_of = self._developer_lookup(db)
+        partials: List[Tuple[np.ndarray, np.ndarray]] = []
+        sources = (
+            (AgentPurchase.agent_id, AgentPurchase.purchase_date, AgentPurchase.purchase_price, PURCHASES),
+            (AgentInvocation.agent_id, AgentInvocation.created_at, AgentInvocation.cost, INVOCATIONS),
+        )
+        for agent_column, time_column, amount_column, count_slot in sources:
+            query = (
+                select(agent_column, self._epoch(db, time_column), func.coalesce(amount_column, 0.0))
+                .where(agent_column.isnot(None), time_column >= start, time_column < end)
+            )
+            result = db.connection().execute(query, execution_options={"yield_per": self.chunk_size})
+            for rows in result.partitions():
+                # Flattened values; NumPy probes Row objects for array interfaces
+                chunk = np.fromiter(chain.from_iterable(rows), dtype=np.float64, count=3 * len(rows)).reshape(-1, 3)
+                partial = self._reduce(chunk, developer_of, count_slot)
+                if partial is not None:
+                    partials.append(partial)
+        db.rollback()
+        return self._combine(partials)
+
+    def run(self, db: Session, until: datetime, since: Optional[datetime] = None) -> List[DeveloperPayout]:
+        """
+        Compute and store payouts for every period that closed by ``until``
+        (and starts at or after ``since``). Re-running over the same periods
+        updates the pending records in place instead of adding new ones;
+        records already marked paid are never changed.
+        """
+        end = period_start(until, self.period)
+        start = period_start(since, self.period) if since else datetime(1970, 1, 1)
+        totals = self.compute(db, start, end)
+
+        existing = {
+            (payout.developer_id, payout.period_start): payout
+            for payout in db.query(DeveloperPayout).filter(
+                DeveloperPayout.period == self.period,
+                DeveloperPayout.period_start >= start,
+                DeveloperPayout.period_start < end
+            )
+        }
+        now = datetime.utcnow()
+        payouts = []
+        for total in totals:
+            payout = existing.get((total.developer_id, total.period_start))
+            if payout is None:
+                payout = DeveloperPayout(
+                    developer_id=total.developer_id,
+                    period=self.period,
+                    period_start=total.period_start,
+                    period_end=_next_period(total.period_start, self.period),
+                    status="pending",
+                )
+                db.add(payout)
+            elif payout.status != "pending":
+                payouts.append(payout)
+                continue
+            payout.purchases = total.purchases
+            payout.purchase_revenue = total.purchase_revenue
+            payout.invocations = total.invocations
+            payout.invocation_revenue = total.invocation_revenue
+            payout.amount = round(total.amount, 6)
+            payout.computed_at = now
+            payouts.append(payout)
+        db.commit()
+        logger.info(f"Computed {len(payouts)} {self.period} payouts up to {end.isoformat()}")
+        return payouts
+
+    @staticmethod
+    def _developer_lookup(db: Session) -> np.ndarray:
+        agents = db.query(Agent.id, Agent.developer_id).all()
+        lookup = np.full(max((agent_id for agent_id, _ in agents), default=0) + 1, -1, dtype=np.int64)
+        for agent_id, developer_id in agents:
+            if developer_id is not None:
+                lookup[agent_id] = developer_id
+        return lookup
+
+    @staticmethod
+    def _epoch(db: Session, column):
+        if db.get_bind().dialect.name == "sqlite":
+            # julianday parses faster than strftime('%s')
+            return cast((func.julianday(column) - 2440587.5) * 86400, Integer)
+        return cast(func.extract("epoch", column), BigInteger)
+
+    def _reduce(self, chunk: np.ndarray, developer_of: np.ndarray, count_slot: int):
+        if not len(chunk):
+            return None
+        agent_ids = chunk[:, 0].astype(np.int64)
+        known = agent_ids < len(developer_of)
+        developers = np.full(len(agent_ids), -1, dtype=np.int64)
+        developers[known] = developer_of[agent_ids[known]]
+        keep = developers >= 0
+        if not keep.any():
+            return None
+        days = chunk[keep, 1].astype(np.int64) // 86400
+        keys = (developers[keep] << _DAY_BITS) | period_days(days, self.period)
+        unique_keys, groups = np.unique(keys, return_inverse=True)
+        sums = np.zeros((len(unique_keys), 4))
+        sums[:, count_slot] = np.bincount(groups, minlength=len(unique_keys))
+        sums[:, count_slot + 1] = np.bincount(groups, weights=chunk[keep, 2], minlength=len(unique_keys))
+        return unique_keys, sums
+
+    @staticmethod
+    def _combine(partials: List[Tuple[np.ndarray, np.ndarray]]) -> List[PayoutTotals]:
+        if not partials:
+            return []
+        keys = np.concatenate([keys for keys, _ in partials])
+        sums = np.concatenate([sums for _, sums in partials])
+        unique_keys, groups = np.unique(keys, return_inverse=True)
+        totals = np.column_stack([
+            np.bincount(groups, weights=sums[:, column], minlength=len(unique_keys))
+            for column in range(sums.shape[1])
+        ])
+        developers = unique_keys >> _DAY_BITS
+        days = unique_keys & ((1 << _DAY_BITS) - 1)
+        starts: Dict[int, datetime] = {}
+        return [
+            PayoutTotals(
+                developer_id=int(developer),
+                period_start=starts.setdefault(int(day), _to_datetime(int(day))),
+                purchases=int(row[PURCHASES]),
+                purchase_revenue=round(float(row[PURCHASE_REVENUE]), 6),
+                invocations=int(row[INVOCATIONS]),
+                invocation_revenue=round(float(row[INVOCATION_REVENUE]), 6),
+            )
+            for developer, day, row in zip(developers.tolist(), days.tolist(), totals)
+        ]
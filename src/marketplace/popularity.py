@@ -0,0 +1,178 @@
+import asyncio
+import logging
+import threading
+import time
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Callable, Dict, List
+
+from sqlalchemy.orm import Session
+
+from ..database.models import AgentPopularity
+
+logger = logging.getLogger(__name__)
+
+POPULAR = "popular"
+TRENDING = "trending"
+SIGNALS = (POPULAR, TRENDING)
+
+# A purchase says more about an agent than a single invocation
+EVENT_WEIGHTS = {"invoke": 1.0, "purchase": 5.0}
+
+
+def decay(elapsed_seconds: float, half_life_seconds: float) -> float:
+    return 2.0 ** (-max(0.0, elapsed_seconds) / half_life_seconds)
+
+
+@dataclass
+class _Counter:
+    popular: float
+    trending: float
+    invocations: int
+    purchases: int
+    as_of: float
+
+
+class PopularityTracker:
+    """
+    Exponentially time-decayed event counters per agent.
+
+    Each agent carries two scores with different half-lives: ``popular``
+    (weeks) and ``trending`` (a day or so). Events are counted in memory as
+    they happen and a periodic checkpoint folds them into the
+    ``agent_popularity`` table, then reloads the table to pick up the other
+    workers' events and re-ranks. Requests only ever read the precomputed
+    ranking, never the invocation history.
+    """
+
+    def __init__(self, popular_half_life: float, trending_half_life: float, clock: Callable[[], float] = time.time):
+        self.half_lives = {POPULAR: popular_half_life, TRENDING: trending_half_life}
+        self._clock = clock
+        self._lock = threading.Lock()
+        # Events recorded since the last checkpoint
+        self._pending: Dict[int, _Counter] = {}
+        self._rankings: Dict[str, Dict[int, float]] = {signal: {} for signal in SIGNALS}
+
+    def _decayed(self, counter: _Counter, now: float) -> _Counter:
+        elapsed = now - counter.as_of
+        return _Counter(
+            popular=counter.popular * decay(elapsed, self.half_lives[POPULAR]),
+            trending=counter.trending * decay(elapsed, self.half_lives[TRENDING]),
+            invocations=counter.invocations,
+            purchases=counter.purchases,
+            as_of=now,
+        )
+
+    def record(self, agent_id: int, event: str):
+        """Count an ``invoke`` or ``purchase`` event for an agent."""
+        weight = EVENT_WEIGHTS[event]
+        now = self._clock()
+        with self._lock:
+            counter = self._pending.get(agent_id)
+            counter = self._decayed(counter, now) if counter else _Counter(0.0, 0.0, 0, 0, now)
+            counter.popular += weight
+            counter.trending += weight
+            counter.invocations += event == "invoke"
+            counter.purchases += event == "purchase"
+            self._pending[agent_id] = counter
+
+    def ranking(self, signal: str) -> Dict[int, float]:
+        """Scores by agent id as of the last checkpoint."""
+        return self._rankings[signal]
+
+    def order(self, agent_ids: List[int], signal: str) -> List[int]:
+        """``agent_ids`` by descending score; unscored agents keep their order at the end."""
+        scores = self._rankings[signal]
+        return sorted(agent_ids, key=lambda agent_id: -scores.get(agent_id, 0.0))
+
+    def checkpoint(self, db: Session):
+        """Fold pending events into the table and reload every agent's scores."""
+        now = self._clock()
+        with self._lock:
+            pending, self._pending = self._pending, {}
+        try:
+            if pending:
+                self._flush(db, pending, now)
+        except Exception:
+            db.rollback()
+            with self._lock:
+                # Keep the events for the next checkpoint
+                for agent_id, counter in pending.items():
+                    current = self._pending.get(agent_id)
+                    if current is not None:
+                        counter = self._merge(self._decayed(counter, current.as_of), current)
+                    self._pending[agent_id] = counter
+            raise
+        self._reload(db, now)
+
+    @staticmethod
+    def _merge(counter: _Counter, other: _Counter) -> _Counter:
+        return _Counter(
+            popular=counter.popular + other.popular,
+            trending=counter.trending + other.trending,
+            invocations=counter.invocations + other.invocations,
+            purchases=counter.purchases + other.purchases,
+            as_of=other.as_of,
+        )
+
+    def _flush(self, db: Session, pending: Dict[int, _Counter], now: float):
+        updated_at = datetime.utcfromtimestamp(now)
+        rows = {
+            row.agent_id: row
+            for row in db.query(AgentPopularity)
+            .filter(AgentPopularity.agent_id.in_(pending))
+            .with_for_update()
+            .all()
+        }
+        for agent_id, counter in pending.items():
+            counter = self._decayed(counter, now)
+            row = rows.get(agent_id)
+            if row is None:
+                db.add(AgentPopularity(
+                    agent_id=agent_id,
+                    popular_score=counter.popular,
+                    trending_score=counter.trending,
+                    invocations=counter.invocations,
+                    purchases=counter.purchases,
+                    updated_at=updated_at,
+                ))
+                continue
+            stored = self._decayed(self._row_counter(row), now)
+            row.popular_score = stored.popular + counter.popular
+            row.trending_score = stored.trending + counter.trending
+            row.invocations = stored.invocations + counter.invocations
+            row.purchases = stored.purchases + counter.purchases
+            row.updated_at = updated_at
+        db.commit()
+
+    @staticmethod
+    def _row_counter(row: AgentPopularity) -> _Counter:
+        as_of = (row.updated_at - datetime(1970, 1, 1)).total_seconds()
+        return _Counter(row.popular_score, row.trending_score, row.invocations, row.purchases, as_of)
+
+    def _reload(self, db: Session, now: float):
+        rankings = {signal: {} for signal in SIGNALS}
+        for row in db.query(AgentPopularity).all():
+            counter = self._decayed(self._row_counter(row), now)
+            rankings[POPULAR][row.agent_id] = counter.popular
+            rankings[TRENDING][row.agent_id] = counter.trending
+        db.rollback()
+        self._rankings = rankings
+
+
+async def run_checkpoints(tracker: PopularityTracker, session_factory, interval: float):
+    """Background task that checkpoints ``tracker`` every ``interval`` seconds."""
+    while True:
+        try:
+            await asyncio.to_thread(checkpoint_once, tracker, session_factory)
+        except Exception as e:
+            logger.error(f"Popularity checkpoint failed: {e}")
+        await asyncio.sleep(interval)
+
+
+def checkpoint_once(tracker: PopularityTracker, session_factory):
+    db = session_factory()
+    try:
+        tracker.checkpoint(db)
+    finally:
+        db.close()
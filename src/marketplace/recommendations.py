@@ -0,0 +1,186 @@
+import asyncio
+import logging
+import threading
+from collections import defaultdict
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy.orm import Session
+
+from ..cache.invalidation import invalidation_bus
+from ..config import get_settings
+from ..database.models import AgentPurchase
+
+logger = logging.getLogger(__name__)
+
+settings = get_settings()
+
+
+class CoPurchaseIndex:
+    """
+    "Users who bought X also bought Y", from a sparse agent x agent
+    co-occurrence matrix.
+
+    ``_counts[x][y]`` is the number of users who bought both x and y. Each
+    purchase bumps one row and one column entry per agent the buyer already
+    owned, and the top-k neighbour lists of the agents involved are patched
+    in place, so ``neighbours`` is a plain lookup. ``rebuild`` recomputes
+    everything from the purchases table with SciPy for the initial load or
+    to repair drift.
+
+    Purchases reach every worker's index as they happen (``record_purchase``),
+    so recommendations are current within a bus delivery; the periodic
+    rebuild only repairs messages the bus lost. Purchases arriving while a
+    rebuild runs are held back and replayed onto the new matrix unless the
+    rebuild already read them.
+    """
+
+    def __init__(self, k: int = 10):
+        self.k = k
+        self._lock = threading.Lock()
+        self._counts: Dict[int, Dict[int, int]] = defaultdict(dict)
+        self._top: Dict[int, List[Tuple[int, int]]] = {}
+        self._built = False
+        # (user_id, agent_id, owned) received since the running rebuild began
+        self._during_rebuild: Optional[List[Tuple[int, int, List[int]]]] = None
+
+    @property
+    def built(self) -> bool:
+        return self._built
+
+    def neighbours(self, agent_id: int) -> List[Tuple[int, int]]:
+        """Up to k ``(agent_id, co_purchases)`` pairs, most co-purchased first."""
+        return self._top.get(agent_id, [])
+
+    def record_purchase(self, user_id: int, agent_id: int, owned: Iterable[int]):
+        """Apply a committed purchase, keeping it for replay if a rebuild is running."""
+        owned = list(owned)
+        with self._lock:
+            if self._during_rebuild is not None:
+                self._during_rebuild.append((user_id, agent_id, owned))
+            if self._built:
+                self._add(agent_id, owned)
+
+    def add_purchase(self, agent_id: int, owned: Iterable[int]):
+        """Count a purchase of ``agent_id`` by a user who already owned ``owned``."""
+        with self._lock:
+            self._add(agent_id, owned)
+
+    def _add(self, agent_id: int, owned: Iterable[int]):
+        for other in owned:
+            if other == agent_id:
+                continue
+            for row, column in ((agent_id, other), (other, agent_id)):
+                count = self._counts[row].get(column, 0) + 1
+                self._counts[row][column] = count
+                self._offer(row, column, count)
+
+    def _offer(self, row: int, column: int, count: int):
+        # Only the changed entry can enter or move within the row's top k
+        top = [(neighbour, c) for neighbour, c in self._top.get(row, []) if neighbour != column]
+        if len(top) < self.k or count > top[-1][1] or (count == top[-1][1] and column < top[-1][0]):
+            top.append((column, count))
+            top.sort(key=lambda item: (-item[1], item[0]))
+            del top[self.k:]
+        self._top[row] = top
+
+    def rebuild(self, db: Session):
+        """Recompute the matrix and every top-k list from AgentPurchase."""
+        with self._lock:
+            self._during_rebuild = []
+        try:
+            pairs = db.query(AgentPurchase.user_id, AgentPurchase.agent_id).distinct().all()
+            db.rollback()
+            counts, top = self._compute(pairs)
+        except Exception:
+            with self._lock:
+                self._during_rebuild = None
+            raise
+
+        with self._lock:
+            self._counts = counts
+            self._top = top
+            self._built = True
+            missed, self._during_rebuild = self._during_rebuild, None
+            if missed:
+                read = {(user_id, agent_id) for user_id, agent_id in pairs}
+                for user_id, agent_id, owned in missed:
+                    if (user_id, agent_id) not in read:
+                        self._add(agent_id, owned)
+        logger.info(f"Rebuilt co-purchase index from {len(pairs)} purchases")
+
+    def _compute(self, pairs) -> Tuple[Dict[int, Dict[int, int]], Dict[int, List[Tuple[int, int]]]]:
+        import numpy as np
+        from scipy import sparse
+
+        counts: Dict[int, Dict[int, int]] = defaultdict(dict)
+        top: Dict[int, List[Tuple[int, int]]] = {}
+        if pairs:
+            users, agents = np.array(pairs, dtype=np.int64).T
+            user_index, user_rows = np.unique(users, return_inverse=True)
+            agent_ids, agent_columns = np.unique(agents, return_inverse=True)
+            # Users x agents incidence matrix; its Gram matrix is the
+            # agent x agent co-purchase counts
+            purchases = sparse.csr_matrix(
+                (np.ones(len(pairs), dtype=np.int32), (user_rows, agent_columns)),
+                shape=(len(user_index), len(agent_ids)),
+            )
+            co_purchases = (purchases.T @ purchases).tocsr()
+            co_purchases.setdiag(0)
+            co_purchases.eliminate_zeros()
+
+            co_purchases = co_purchases.tocoo()
+            rows = agent_ids[co_purchases.row]
+            columns = agent_ids[co_purchases.col]
+            values = co_purchases.data
+            # Order entries by row, then count descending, then agent id;
+            # an entry's position within its row says whether it is top k
+            order = np.lexsort((columns, -values, rows))
+            rows, columns, values = rows[order], columns[order], values[order]
+            row_starts = np.searchsorted(rows, rows, side="left")
+            keep = np.arange(len(rows)) - row_starts < self.k
+
+            for row, column, value in zip(rows.tolist(), columns.tolist(), values.tolist()):
+                counts[row][column] = value
+            for row, column, value in zip(rows[keep].tolist(), columns[keep].tolist(), values[keep].tolist()):
+                top.setdefault(row, []).append((column, value))
+        return counts, top
+
+
+co_purchase_index = CoPurchaseIndex(k=settings.RECOMMENDATIONS_TOP_K)
+
+
+def publish_purchase(user_id: int, agent_id: int, owned: Iterable[int]):
+    """Apply a committed purchase to the index on every worker."""
+    invalidation_bus.publish("co_purchase", {
+        "user_id": user_id,
+        "agent_id": agent_id,
+        "owned": sorted(set(owned) - {agent_id}),
+    })
+
+
+def _on_purchase(message):
+    co_purchase_index.record_purchase(message["user_id"], message["agent_id"], message["owned"])
+
+
+invalidation_bus.subscribe("co_purchase", _on_purchase)
+
+
+async def run_rebuilds(index: CoPurchaseIndex, session_factory, interval: float):
+    """
+    Background task: build the index at startup, then rebuild every
+    ``interval`` seconds to repair drift (purchases apply as they happen).
+    """
+    while True:
+        try:
+            await asyncio.to_thread(_rebuild_once, index, session_factory)
+        except Exception as e:
+            logger.error(f"Co-purchase rebuild failed: {e}")
+        await asyncio.sleep(interval)
+
+
+def _rebuild_once(index: CoPurchaseIndex, session_factory):
+    db = session_factory()
+    try:
+        index.rebuild(db)
+    finally:
+        db.close()
@@ -7,7 +7,6 @@ from stripe.error import StripeError
 from typing import Union
 import logging
 
-logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 async def error_handler_middleware(request: Request, call_next):
@@ -0,0 +1,251 @@
+import asyncio
+import importlib
+import logging
+import math
+import os
+import re
+import sqlite3
+import tempfile
+import threading
+import time
+from abc import ABC, abstractmethod
+from dataclasses import dataclass
+from typing import List, Optional, Tuple
+
+from fastapi import Request, status
+from fastapi.responses import JSONResponse
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class RateLimitRule:
+    """
+    Requests whose path matches ``pattern`` draw from the ``name`` budget.
+    ``by_ip`` rules (login) are keyed by client IP whatever credentials
+    the request carries.
+    """
+    name: str
+    pattern: str
+    per_minute: int
+    by_ip: bool = False
+
+    @property
+    def capacity(self) -> float:
+        return float(self.per_minute)
+
+    @property
+    def refill_per_second(self) -> float:
+        return self.per_minute / 60.0
+
+
+class BucketStore(ABC):
+    """
+    Token bucket storage. ``take`` atomically refills the bucket for the
+    time elapsed since it was last touched and tries to remove ``cost``
+    tokens, returning ``(allowed, remaining, retry_after_seconds)``.
+
+    Subclass this to back the limiter with a network store (e.g. Redis)
+    and point RATE_LIMIT_BACKEND at the class.
+    """
+
+    @abstractmethod
+    async def take(self, key: str, capacity: float, refill_per_second: float, cost: float = 1.0) -> Tuple[bool, float, float]:
+        pass
+
+    @abstractmethod
+    def reset(self):
+        pass
+
+
+def _refill(tokens: float, updated: float, now: float, capacity: float, rate: float) -> float:
+    return min(capacity, tokens + max(0.0, now - updated) * rate)
+
+
+def _consume(tokens: float, cost: float, rate: float) -> Tuple[bool, float, float]:
+    if tokens >= cost:
+        return True, tokens - cost, 0.0
+    return False, tokens, (cost - tokens) / rate
+
+
+class MemoryBucketStore(BucketStore):
+    """Per-process buckets; only correct with a single worker."""
+
+    def __init__(self, clock=time.monotonic):
+        self._clock = clock
+        self._buckets = {}
+        self._lock = threading.Lock()
+
+    async def take(self, key, capacity, refill_per_second, cost=1.0):
+        now = self._clock()
+        with self._lock:
+            tokens, updated = self._buckets.get(key, (capacity, now))
+            tokens = _refill(tokens, updated, now, capacity, refill_per_second)
+            allowed, tokens, retry_after = _consume(tokens, cost, refill_per_second)
+            self._buckets[key] = (tokens, now)
+        return allowed, tokens, retry_after
+
+    def reset(self):
+        with self._lock:
+            self._buckets.clear()
+
+
+class SQLiteBucketStore(BucketStore):
+    """
+    Buckets in a local SQLite file shared by every worker on the host.
+
+    Each take is a single ``BEGIN IMMEDIATE`` transaction, which serializes
+    the read-modify-write across processes. Counters don't need to survive
+    a crash, so the file runs with ``synchronous=OFF``.
+    """
+
+    PRUNE_EVERY = 1000
+
+    def __init__(self, path: str, clock=time.time):
+        self.path = path
+        self._clock = clock
+        self._local = threading.local()
+        self._takes = 0
+        with self._connect() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS rate_limit_buckets ("
+                "key TEXT PRIMARY KEY, tokens REAL NOT NULL, updated REAL NOT NULL)"
+            )
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5.0, isolation_level=None, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=OFF")
+            self._local.conn = conn
+        return conn
+
+    async def take(self, key, capacity, refill_per_second, cost=1.0):
+        return await asyncio.to_thread(self._take, key, capacity, refill_per_second, cost)
+
+    def _take(self, key, capacity, refill_per_second, cost):
+        conn = self._connect()
+        now = self._clock()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute(
+                "SELECT tokens, updated FROM rate_limit_buckets WHERE key = ?", (key,)
+            ).fetchone()
+            tokens = capacity if row is None else _refill(row[0], row[1], now, capacity, refill_per_second)
+            allowed, tokens, retry_after = _consume(tokens, cost, refill_per_second)
+            conn.execute(
+                "INSERT INTO rate_limit_buckets (key, tokens, updated) VALUES (?, ?, ?) "
+                "ON CONFLICT(key) DO UPDATE SET tokens = excluded.tokens, updated = excluded.updated",
+                (key, tokens, now)
+            )
+            self._takes += 1
+            if self._takes % self.PRUNE_EVERY == 0:
+                # Buckets idle long enough to have refilled carry no state
+                conn.execute(
+                    "DELETE FROM rate_limit_buckets WHERE updated < ?",
+                    (now - 3600,)
+                )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        return allowed, tokens, retry_after
+
+    def reset(self):
+        self._connect().execute("DELETE FROM rate_limit_buckets")
+
+
+def create_bucket_store(backend: str, sqlite_path: Optional[str] = None) -> BucketStore:
+    if backend == "memory":
+        return MemoryBucketStore()
+    if backend == "sqlite":
+        return SQLiteBucketStore(sqlite_path)
+    # Anything else is a "package.module:ClassName" import path
+    module_name, _, class_name = backend.partition(":")
+    store_class = getattr(importlib.import_module(module_name), class_name)
+    return store_class()
+
+
+class RateLimiter:
+    """
+    HTTP middleware enforcing per-caller token buckets.
+
+    Callers are identified by API key prefix (once the key has been
+    verified), JWT user id, or client IP, in that order. Each request is
+    charged to the first rule whose pattern matches its path, so login
+    and invoke traffic have budgets separate from everything else.
+    Rejected requests get 429 with ``Retry-After``.
+    """
+
+    def __init__(self, store: BucketStore, rules: List[RateLimitRule]):
+        self.store = store
+        self.rules = [(re.compile(rule.pattern), rule) for rule in rules]
+
+    def rule_for(self, path: str) -> Optional[RateLimitRule]:
+        for pattern, rule in self.rules:
+            if pattern.match(path):
+                return rule
+        return None
+
+    async def __call__(self, request: Request, call_next):
+        if request.method == "OPTIONS":
+            return await call_next(request)
+        rule = self.rule_for(request.url.path)
+        if rule is None:
+            return await call_next(request)
+
+        bucket_key = f"{rule.name}:{client_identity(request, rule.by_ip)}"
+        try:
+            allowed, remaining, retry_after = await self.store.take(
+                bucket_key, rule.capacity, rule.refill_per_second
+            )
+        except Exception as e:
+            # Fail open: a broken limiter store shouldn't take the API down
+            logger.error(f"Rate limit store error: {e}")
+            return await call_next(request)
+
+        if not allowed:
+            return JSONResponse(
+                status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+                content={"detail": "Rate limit exceeded", "type": "rate_limit_error"},
+                headers={
+                    "Retry-After": str(max(1, math.ceil(retry_after))),
+                    "X-RateLimit-Limit": str(rule.per_minute),
+                    "X-RateLimit-Remaining": "0",
+                },
+            )
+        response = await call_next(request)
+        response.headers["X-RateLimit-Limit"] = str(rule.per_minute)
+        response.headers["X-RateLimit-Remaining"] = str(int(remaining))
+        return response
+
+
+def client_identity(request: Request, by_ip: bool = False) -> str:
+    from ..auth.api_keys import is_api_key, verified_key_prefix
+    from ..auth.security import decode_access_token
+
+    host = request.client.host if request.client else "unknown"
+    if by_ip:
+        return f"ip:{host}"
+    api_key = request.headers.get("x-api-key")
+    authorization = request.headers.get("authorization", "")
+    token = authorization[7:] if authorization[:7].lower() == "bearer " else None
+    if api_key is None and token is not None and is_api_key(token):
+        api_key = token
+    if api_key is not None:
+        # Only a key auth has already verified gets its own bucket; made-up
+        # keys would otherwise buy a fresh budget per request
+        prefix = verified_key_prefix(api_key)
+        return f"key:{prefix}" if prefix is not None else f"ip:{host}"
+    if token:
+        try:
+            token_data = decode_access_token(token)
+            return f"user:{token_data.user_id or token_data.username}"
+        except Exception:
+            pass
+    return f"ip:{host}"
+
+
+def default_sqlite_path() -> str:
+    return os.path.join(tempfile.gettempdir(), "ai-agent-marketplace-ratelimit.db")
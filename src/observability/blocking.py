@@ -0,0 +1,145 @@
+"""
+Event loop lag and blocking detection.
+
+``LoopMonitor.run`` is a heartbeat task that sleeps for ``interval`` and
+records how late it woke up as event loop lag. Meanwhile a watchdog
+thread checks the heartbeat; once it is more than ``threshold`` overdue,
+whatever is holding the loop is still on the loop thread's stack, so the
+watchdog captures that stack and the route being served. When the
+heartbeat gets to run again the block is recorded with its duration:
+in ``event_loop_blocked_seconds``, as a warning log line, in the
+``blocks`` history served at ``/debug/event-loop`` and to any listeners.
+
+Durations are the heartbeat's lateness, which undercounts a block by at
+most ``interval``. A shorter interval is more exact but costs a wakeup
+on the loop each time; the watchdog adds one per ``threshold / 2``. The
+defaults (both 100 ms) come to about 30 wakeups a second per worker, and
+tests wanting exact numbers shorten the interval (see ``loop_budget``).
+Code holding the GIL in C (``json.dumps`` of a large payload) keeps the
+watchdog out too; its stack is captured as soon as the call returns,
+usually still in the calling frame.
+"""
+import asyncio
+import logging
+import sys
+import threading
+import time
+from collections import deque
+from dataclasses import asdict, dataclass
+from typing import Callable, Deque, List
+
+from .metrics import EVENT_LOOP_BLOCKED, EVENT_LOOP_LAG, EVENT_LOOP_LAG_LAST
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class Block:
+    route: str
+    duration_ms: float
+    at: float
+    stack: List[str]
+
+
+def _route(frame) -> str:
+    """Route template of the request being handled on ``frame``'s stack."""
+    while frame is not None:
+        code = frame.f_code
+        if code.co_name == "handle" and code.co_filename.endswith("routing.py"):
+            path = getattr(frame.f_locals.get("self"), "path", None)
+            if isinstance(path, str):
+                return path
+        frame = frame.f_back
+    return "other"
+
+
+def _stack(frame, limit: int = 64) -> List[str]:
+    lines = []
+    while frame is not None and len(lines) < limit:
+        lines.append(f"{frame.f_code.co_filename}:{frame.f_lineno} in {frame.f_code.co_name}")
+        frame = frame.f_back
+    lines.reverse()
+    return lines
+
+
+class LoopMonitor:
+    def __init__(self, threshold: float = 0.1, interval: float = 0.1, history: int = 50):
+        self.threshold = threshold
+        self.interval = interval
+        self.blocks: Deque[Block] = deque(maxlen=history)
+        self.listeners: List[Callable[[Block], None]] = []
+        self.lag = 0.0
+        self.beats = 0
+        self.running = False
+        self._beat = time.monotonic()
+        self._capture = None
+        self._lock = threading.Lock()
+
+    async def run(self):
+        """Heartbeat until cancelled, with the watchdog thread alongside."""
+        loop = asyncio.get_running_loop()
+        self._beat = time.monotonic()
+        stopped = threading.Event()
+        watchdog = threading.Thread(
+            target=self._watch, args=(threading.get_ident(), stopped), name="loop-watchdog", daemon=True
+        )
+        watchdog.start()
+        self.running = True
+        try:
+            while True:
+                started = loop.time()
+                await asyncio.sleep(self.interval)
+                lag = max(0.0, loop.time() - started - self.interval)
+                with self._lock:
+                    self._beat = time.monotonic()
+                    self.beats += 1
+                    capture, self._capture = self._capture, None
+                self.lag = lag
+                EVENT_LOOP_LAG.observe(lag)
+                EVENT_LOOP_LAG_LAST.set(lag)
+                if lag >= self.threshold:
+                    self._record(lag, capture)
+        finally:
+            self.running = False
+            stopped.set()
+
+    def _watch(self, loop_thread: int, stopped: threading.Event):
+        while not stopped.wait(self.threshold / 2):
+            with self._lock:
+                overdue = time.monotonic() - self._beat - self.interval
+                if overdue < self.threshold or self._capture is not None:
+                    continue
+            frame = sys._current_frames().get(loop_thread)
+            if frame is None:
+                continue
+            capture = (_route(frame), _stack(frame))
+            del frame
+            with self._lock:
+                self._capture = capture
+
+    def _record(self, lag: float, capture):
+        route, stack = capture if capture is not None else ("other", [])
+        block = Block(route, round(lag * 1000, 1), time.time(), stack)
+        self.blocks.append(block)
+        EVENT_LOOP_BLOCKED.labels(route).observe(lag)
+        logger.warning(
+            "Event loop blocked for %.0f ms in %s", block.duration_ms, route,
+            extra={"event": "loop.blocked", "route": route, "duration_ms": block.duration_ms,
+                   "stack": stack[-8:][::-1]},
+        )
+        for listener in list(self.listeners):
+            listener(block)
+
+    def wait_for_beats(self, count: int = 2, timeout: float = 1.0):
+        """Block the calling thread until the heartbeat has run ``count`` more times."""
+        target = self.beats + count
+        deadline = time.monotonic() + timeout
+        while self.running and self.beats < target and time.monotonic() < deadline:
+            time.sleep(self.interval / 2)
+
+    def snapshot(self) -> dict:
+        return {
+            "threshold_ms": self.threshold * 1000,
+            "lag_ms": round(self.lag * 1000, 1),
+            "blocks": [asdict(block) for block in reversed(self.blocks)],
+        }
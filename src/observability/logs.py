@@ -0,0 +1,254 @@
+"""
+Structured logging.
+
+``configure_logging`` routes every record through a ``QueueHandler`` so a
+request only pays for putting the record on a queue; a ``QueueListener``
+thread formats it as one JSON object per line and writes it out. Records
+carry the request id (``RequestContext`` middleware) and the active trace
+and span ids, so log lines can be joined with traces.
+
+Payloads are passed as ``extra`` fields and pass through ``redact``:
+secrets are masked and long strings truncated. User content such as
+resumes, code and prompts is only logged as ``payload_shape`` (keys and
+sizes). High-volume INFO/DEBUG events can be sampled by name, e.g.
+``LOG_SAMPLE_RATES="agent.invoked=0.1"`` for ``logger.info(...,
+extra={"event": "agent.invoked"})``; the kept records report their
+``sample_rate`` so counts can be scaled back up.
+"""
+import atexit
+import copy
+import json
+import logging
+import logging.handlers
+import queue
+import random
+import sys
+import uuid
+from contextvars import ContextVar
+from datetime import datetime, timezone
+from typing import Any, Dict, Optional
+
+from fastapi import Request
+
+from .tracing import _current_span
+
+REQUEST_ID_HEADER = "X-Request-ID"
+
+# Keys whose values never reach the logs, wherever they appear in a payload
+SENSITIVE_KEYS = frozenset({
+    "password", "new_password", "hashed_password", "token", "access_token", "refresh_token",
+    "api_key", "authorization", "secret", "client_secret", "card_number",
+})
+
+# LogRecord attributes that aren't user-supplied ``extra`` fields
+_RECORD_ATTRIBUTES = frozenset(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime", "taskName"}
+
+# Correlation ids added by ``ContextFilter``, never truncated
+_CONTEXT_FIELDS = frozenset({"request_id", "trace_id", "span_id"})
+
+_request_id: ContextVar[Optional[str]] = ContextVar("request_id", default=None)
+
+
+def current_request_id() -> Optional[str]:
+    return _request_id.get()
+
+
+def redact(value: Any, max_length: int = 256, _depth: int = 0) -> Any:
+    """``value`` with sensitive keys masked and long strings truncated."""
+    if isinstance(value, dict):
+        if _depth >= 4:
+            return "{...}"
+        return {
+            key: "[redacted]" if str(key).lower() in SENSITIVE_KEYS else redact(item, max_length, _depth + 1)
+            for key, item in value.items()
+        }
+    if isinstance(value, (list, tuple)):
+        if _depth >= 4:
+            return "[...]"
+        items = [redact(item, max_length, _depth + 1) for item in value[:20]]
+        if len(value) > 20:
+            items.append(f"... {len(value) - 20} more")
+        return items
+    if isinstance(value, str) and len(value) > max_length:
+        return f"{value[:max_length]}... ({len(value)} chars)"
+    if value is None or isinstance(value, (bool, int, float)):
+        return value
+    if not isinstance(value, str):
+        return redact(str(value), max_length, _depth)
+    return value
+
+
+def payload_shape(value: Any, _depth: int = 0) -> Any:
+    """
+    Keys and sizes of ``value`` without its content, for logging user
+    payloads.
+    """
+    if isinstance(value, dict):
+        if _depth >= 2:
+            return f"dict[{len(value)}]"
+        return {str(key): payload_shape(item, _depth + 1) for key, item in list(value.items())[:20]}
+    if isinstance(value, (list, tuple)):
+        return f"list[{len(value)}]"
+    if isinstance(value, str):
+        return f"str[{len(value)}]"
+    if value is None or isinstance(value, bool):
+        return value
+    return type(value).__name__
+
+
+class ContextFilter(logging.Filter):
+    """
+    Stamps records with the request, trace and span ids. Runs in the
+    caller's thread, before the record crosses the queue and loses the
+    caller's context.
+    """
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        record.request_id = _request_id.get()
+        span = _current_span.get()
+        record.trace_id = span.context.trace_id if span is not None else None
+        record.span_id = span.context.span_id if span is not None else None
+        return True
+
+
+class SamplingFilter(logging.Filter):
+    """Keeps ``rate`` of the INFO and below records for each sampled event."""
+
+    def __init__(self, rates: Dict[str, float]):
+        super().__init__()
+        self.rates = rates
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        rate = self.rates.get(getattr(record, "event", None))
+        if rate is None or record.levelno > logging.INFO:
+            return True
+        record.sample_rate = rate
+        return random.random() < rate
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per record; ``extra`` fields become top-level keys."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        for key, value in vars(record).items():
+            if key not in _RECORD_ATTRIBUTES and value is not None:
+                entry[key] = value
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            entry["exception"] = record.exc_text
+        return json.dumps(entry, default=str)
+
+
+class _DroppingQueueHandler(logging.handlers.QueueHandler):
+    """Drops records instead of blocking the caller when the queue is full."""
+
+    def __init__(self, log_queue, max_field_length: int = 256):
+        super().__init__(log_queue)
+        self.max_field_length = max_field_length
+        self.dropped = 0
+
+    def enqueue(self, record: logging.LogRecord):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # Everything that depends on the caller's state is settled here:
+        # the message, the traceback and copies of any payloads, which the
+        # request could otherwise change before the listener formats them
+        record = copy.copy(record)
+        record.message = record.getMessage()
+        record.msg, record.args = record.message, None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        for key, value in list(vars(record).items()):
+            if key not in _RECORD_ATTRIBUTES and key not in _CONTEXT_FIELDS and isinstance(value, (dict, list, tuple, str)):
+                setattr(record, key, redact(value, self.max_field_length))
+        return record
+
+
+def parse_levels(spec: str) -> Dict[str, str]:
+    """``"sqlalchemy.engine=WARNING,src.main=DEBUG"`` as a dict."""
+    pairs = (item.split("=", 1) for item in spec.split(",") if "=" in item)
+    return {name.strip(): value.strip() for name, value in pairs}
+
+
+_listener: Optional[logging.handlers.QueueListener] = None
+_handler: Optional[_DroppingQueueHandler] = None
+
+
+def configure_logging(
+    level: str = "INFO",
+    module_levels: Optional[Dict[str, str]] = None,
+    json_format: bool = True,
+    sample_rates: Optional[Dict[str, float]] = None,
+    max_field_length: int = 256,
+    queue_size: int = 10000,
+    stream=None,
+) -> logging.handlers.QueueListener:
+    """Install the queue handler on the root logger; safe to call again."""
+    global _listener, _handler
+    stop_logging()
+
+    output = logging.StreamHandler(stream or sys.stdout)
+    if json_format:
+        output.setFormatter(JsonFormatter())
+    else:
+        output.setFormatter(logging.Formatter(
+            "%(asctime)s %(levelname)s %(name)s [%(request_id)s %(trace_id)s] %(message)s"
+        ))
+    _handler = _DroppingQueueHandler(queue.Queue(maxsize=queue_size), max_field_length)
+    if sample_rates:
+        _handler.addFilter(SamplingFilter(sample_rates))
+    _handler.addFilter(ContextFilter())
+
+    root = logging.getLogger()
+    root.setLevel(level.upper())
+    root.addHandler(_handler)
+    for name, module_level in (module_levels or {}).items():
+        logging.getLogger(name).setLevel(module_level.upper())
+
+    _listener = logging.handlers.QueueListener(_handler.queue, output)
+    _listener.start()
+    atexit.register(stop_logging)
+    return _listener
+
+
+def stop_logging():
+    """Write out queued records and remove the handler."""
+    global _listener, _handler
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+    if _handler is not None:
+        logging.getLogger().removeHandler(_handler)
+        _handler = None
+
+
+class RequestContext:
+    """
+    HTTP middleware assigning each request an id (the caller's
+    ``X-Request-ID`` if it sent a sane one) for log correlation, echoed
+    back in the response.
+    """
+
+    async def __call__(self, request: Request, call_next):
+        request_id = request.headers.get(REQUEST_ID_HEADER, "")
+        if not (0 < len(request_id) <= 64 and request_id.replace("-", "").isalnum()):
+            request_id = uuid.uuid4().hex
+        token = _request_id.set(request_id)
+        try:
+            response = await call_next(request)
+        finally:
+            _request_id.reset(token)
+        response.headers[REQUEST_ID_HEADER] = request_id
+        return response
@@ -0,0 +1,208 @@
+"""
+Prometheus metrics for requests, database statements, the connection
+pool, upstream LLM calls and event loop lag, served from ``/metrics``.
+
+Under gunicorn every worker is its own process, so set
+``PROMETHEUS_MULTIPROC_DIR`` to an empty directory shared by the workers
+(before the app is imported); values are then kept in per-process files
+there and ``/metrics`` aggregates all of them, whichever worker answers
+the scrape. ``gunicorn.conf.py`` clears the directory on start and drops
+the live gauges of workers that exit.
+"""
+import os
+import time
+from typing import Any, AsyncIterator, Callable, Optional, Tuple
+
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    REGISTRY,
+    CollectorRegistry,
+    Counter,
+    Gauge,
+    Histogram,
+    generate_latest,
+)
+from prometheus_client import multiprocess
+from fastapi import Request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+DB_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+LLM_BUCKETS = (0.1, 0.25, 0.5, 1.0, 2.0, 4.0, 8.0, 15.0, 30.0, 60.0, 120.0)
+LAG_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+# Live gauges write their file as soon as they are created, so the directory
+# must exist for any process importing this module (alembic, scripts, tests)
+if os.environ.get("PROMETHEUS_MULTIPROC_DIR"):
+    os.makedirs(os.environ["PROMETHEUS_MULTIPROC_DIR"], exist_ok=True)
+
+HTTP_REQUEST_DURATION = Histogram(
+    "http_request_duration_seconds", "Time to produce a response",
+    ["method", "route", "status"],
+)
+HTTP_REQUESTS_IN_PROGRESS = Gauge(
+    "http_requests_in_progress", "Requests being handled",
+    multiprocess_mode="livesum",
+)
+DB_STATEMENT_DURATION = Histogram(
+    "db_statement_duration_seconds", "Time spent executing SQL statements",
+    ["operation"], buckets=DB_BUCKETS,
+)
+DB_POOL_CHECKED_OUT = Gauge(
+    "db_pool_checked_out_connections", "Connections currently checked out of the pool",
+    multiprocess_mode="livesum",
+)
+DB_POOL_CAPACITY = Gauge(
+    "db_pool_capacity_connections", "Pool size plus allowed overflow",
+    multiprocess_mode="livesum",
+)
+LLM_REQUEST_DURATION = Histogram(
+    "llm_request_duration_seconds", "Time for an upstream chat completion",
+    ["agent", "model", "outcome"], buckets=LLM_BUCKETS,
+)
+LLM_TIME_TO_FIRST_TOKEN = Histogram(
+    "llm_time_to_first_token_seconds", "Time until the first streamed chunk",
+    ["agent", "model"], buckets=LLM_BUCKETS,
+)
+LLM_TOKENS = Counter(
+    "llm_tokens", "Tokens sent to and generated by the upstream model",
+    ["agent", "model", "direction"],
+)
+LLM_COST = Counter(
+    "llm_cost", "Token cost charged for upstream completions",
+    ["agent", "model"],
+)
+EVENT_LOOP_LAG = Histogram(
+    "event_loop_lag_seconds", "How late a sleep on the event loop woke up",
+    buckets=LAG_BUCKETS,
+)
+EVENT_LOOP_LAG_LAST = Gauge(
+    "event_loop_lag_last_seconds", "Most recent event loop lag sample",
+    multiprocess_mode="livemax",
+)
+EVENT_LOOP_BLOCKED = Histogram(
+    "event_loop_blocked_seconds", "Callbacks that held the event loop past the blocking threshold",
+    ["route"], buckets=LAG_BUCKETS,
+)
+
+
+def render_metrics() -> Tuple[bytes, str]:
+    """The exposition body and its content type, across all workers."""
+    if "PROMETHEUS_MULTIPROC_DIR" in os.environ:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    return generate_latest(registry), CONTENT_TYPE_LATEST
+
+
+class RequestMetrics:
+    """
+    HTTP middleware recording latency by method, route template and
+    status. Paths that match no route share one ``unmatched`` label so
+    scanners can't create unbounded series.
+    """
+
+    async def __call__(self, request: Request, call_next):
+        started = time.perf_counter()
+        status = 500
+        HTTP_REQUESTS_IN_PROGRESS.inc()
+        try:
+            response = await call_next(request)
+            status = response.status_code
+            return response
+        finally:
+            HTTP_REQUESTS_IN_PROGRESS.dec()
+            route = request.scope.get("route")
+            HTTP_REQUEST_DURATION.labels(
+                request.method, getattr(route, "path", "unmatched"), str(status)
+            ).observe(time.perf_counter() - started)
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("metrics_started", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    started = conn.info["metrics_started"].pop()
+    operation = statement.lstrip().split(None, 1)[0].upper() if statement.strip() else "OTHER"
+    DB_STATEMENT_DURATION.labels(operation).observe(time.perf_counter() - started)
+
+
+def _handle_error(context):
+    started = context.connection.info.get("metrics_started") if context.connection is not None else None
+    if started:
+        started.pop()
+
+
+def instrument_engine(engine: Engine):
+    """Record statement time and pool usage for ``engine``."""
+    if event.contains(engine, "before_cursor_execute", _before_cursor_execute):
+        return
+    event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+    event.listen(engine, "handle_error", _handle_error)
+
+    pool = engine.pool
+    if hasattr(pool, "size") and hasattr(pool, "_max_overflow"):
+        DB_POOL_CAPACITY.inc(pool.size() + max(pool._max_overflow, 0))
+    event.listen(pool, "checkout", lambda *args: DB_POOL_CHECKED_OUT.inc())
+    event.listen(pool, "checkin", lambda *args: DB_POOL_CHECKED_OUT.dec())
+
+
+def _record_usage(agent: str, model: str, usage, cost_of: Optional[Callable[[int, int], float]]):
+    if usage is None:
+        return
+    LLM_TOKENS.labels(agent, model, "input").inc(usage.prompt_tokens or 0)
+    LLM_TOKENS.labels(agent, model, "output").inc(usage.completion_tokens or 0)
+    if cost_of is not None:
+        LLM_COST.labels(agent, model).inc(cost_of(usage.prompt_tokens or 0, usage.completion_tokens or 0))
+
+
+def _outcome(error: Exception) -> str:
+    status_code = getattr(error, "status_code", None)
+    return str(status_code) if status_code else "error"
+
+
+async def observe_completion(
+    agent: str,
+    create: Callable[..., Any],
+    cost_of: Optional[Callable[[int, int], float]] = None,
+    **kwargs,
+):
+    """
+    Call ``create(**kwargs)`` (``client.chat.completions.create``) and
+    record its latency, tokens and cost by agent and model. Streamed
+    responses also record time to first token, and are timed until the
+    caller has read the last chunk.
+    """
+    model = kwargs.get("model", "unknown")
+    started = time.perf_counter()
+    try:
+        response = await create(**kwargs)
+    except Exception as e:
+        LLM_REQUEST_DURATION.labels(agent, model, _outcome(e)).observe(time.perf_counter() - started)
+        raise
+    if kwargs.get("stream"):
+        return _observe_stream(response, agent, model, cost_of, started)
+    LLM_REQUEST_DURATION.labels(agent, model, "ok").observe(time.perf_counter() - started)
+    _record_usage(agent, model, response.usage, cost_of)
+    return response
+
+
+async def _observe_stream(stream, agent, model, cost_of, started) -> AsyncIterator[Any]:
+    outcome = "ok"
+    first = True
+    try:
+        async for chunk in stream:
+            if first:
+                LLM_TIME_TO_FIRST_TOKEN.labels(agent, model).observe(time.perf_counter() - started)
+                first = False
+            _record_usage(agent, model, getattr(chunk, "usage", None), cost_of)
+            yield chunk
+    except Exception as e:
+        outcome = _outcome(e)
+        raise
+    finally:
+        LLM_REQUEST_DURATION.labels(agent, model, outcome).observe(time.perf_counter() - started)
+
@@ -0,0 +1,180 @@
+"""
+On-demand request profiling.
+
+A request is profiled when it carries ``X-Profile: <PROFILING_TOKEN>`` or
+is picked by ``PROFILING_SAMPLE_RATE``. While it is in flight a sampler
+thread reads the stack of the event loop thread every
+``PROFILING_INTERVAL_SECONDS``; samples taken while the loop is idle (no
+coroutine on the stack) are skipped, so the profile shows what the
+request kept the loop busy with, sync database calls included. Work
+handed to ``asyncio.to_thread`` runs elsewhere and isn't sampled.
+
+Profiles are written as collapsed stacks (``frame;frame;frame count``, as
+read by flamegraph.pl, speedscope and inferno) to
+``PROFILING_OUTPUT_DIR/<request id>.folded``. Samples are per thread, so
+requests overlapping a profiled one on the same worker show up in its
+profile too. With no token and a zero rate the middleware isn't
+installed at all, and the sampler thread only runs while a profiled
+request is in flight.
+"""
+import asyncio
+import hmac
+import inspect
+import logging
+import os
+import random
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+from typing import Dict, List, Optional
+
+from fastapi import Request
+
+from .logs import current_request_id
+
+logger = logging.getLogger(__name__)
+
+PROFILE_HEADER = "X-Profile"
+
+_ASYNC_FLAGS = inspect.CO_COROUTINE | inspect.CO_ITERABLE_COROUTINE | inspect.CO_ASYNC_GENERATOR
+_MAX_DEPTH = 256
+
+_labels: Dict[object, str] = {}
+
+
+def _label(code) -> str:
+    label = _labels.get(code)
+    if label is None:
+        path = code.co_filename
+        try:
+            path = os.path.relpath(path)
+        except ValueError:
+            pass
+        if path.startswith(".."):
+            path = os.path.join(*path.split(os.sep)[-2:])
+        label = _labels[code] = f"{code.co_name} ({path}:{code.co_firstlineno})"
+    return label
+
+
+def collapse(frame) -> Optional[str]:
+    """``frame``'s stack, root first, as one collapsed line; None if no task is running."""
+    labels: List[str] = []
+    busy = False
+    while frame is not None and len(labels) < _MAX_DEPTH:
+        busy = busy or bool(frame.f_code.co_flags & _ASYNC_FLAGS)
+        labels.append(_label(frame.f_code))
+        frame = frame.f_back
+    if not busy:
+        return None
+    labels.reverse()
+    return ";".join(labels)
+
+
+class Profile:
+    def __init__(self, request_id: str, thread_id: int):
+        self.request_id = request_id
+        self.thread_id = thread_id
+        self.samples: Counter = Counter()
+        self.started = time.perf_counter()
+
+    def folded(self) -> str:
+        return "".join(f"{stack} {count}\n" for stack, count in sorted(self.samples.items()))
+
+
+class Sampler:
+    """Thread sampling the stacks of threads with profiles in flight."""
+
+    def __init__(self, interval: float = 0.005):
+        self.interval = interval
+        self._active: Dict[int, List[Profile]] = {}
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+
+    def add(self, profile: Profile):
+        with self._lock:
+            self._active.setdefault(profile.thread_id, []).append(profile)
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="profile-sampler", daemon=True)
+                self._thread.start()
+
+    def remove(self, profile: Profile):
+        with self._lock:
+            profiles = self._active.get(profile.thread_id, [])
+            if profile in profiles:
+                profiles.remove(profile)
+            if not profiles:
+                self._active.pop(profile.thread_id, None)
+
+    def _run(self):
+        while True:
+            time.sleep(self.interval)
+            with self._lock:
+                if not self._active:
+                    # Stop when idle; the next add() starts a new thread
+                    self._thread = None
+                    return
+                active = {thread_id: list(profiles) for thread_id, profiles in self._active.items()}
+            frames = sys._current_frames()
+            for thread_id, profiles in active.items():
+                frame = frames.get(thread_id)
+                stack = collapse(frame) if frame is not None else None
+                if stack is not None:
+                    for profile in profiles:
+                        profile.samples[stack] += 1
+            del frames
+
+
+class Profiler:
+    """
+    HTTP middleware profiling requests that present the operator token in
+    ``X-Profile`` or are picked at ``sample_rate``. Requests that asked
+    get the profile's file name back in ``X-Profile``.
+    """
+
+    def __init__(self, output_dir: str = "profiles", token: str = "", sample_rate: float = 0.0,
+                 interval: float = 0.005):
+        self.output_dir = output_dir
+        self.token = token
+        self.sample_rate = sample_rate
+        self.sampler = Sampler(interval)
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.token) or self.sample_rate > 0
+
+    def authorized(self, request: Request) -> bool:
+        """Whether ``request`` carries the operator token."""
+        value = request.headers.get(PROFILE_HEADER)
+        return bool(self.token and value) and hmac.compare_digest(value.encode(), self.token.encode())
+
+    async def __call__(self, request: Request, call_next):
+        requested = self.authorized(request)
+        if not requested and not (self.sample_rate > 0 and random.random() < self.sample_rate):
+            return await call_next(request)
+
+        profile = Profile(current_request_id() or uuid.uuid4().hex, threading.get_ident())
+        self.sampler.add(profile)
+        try:
+            response = await call_next(request)
+        finally:
+            self.sampler.remove(profile)
+            duration = time.perf_counter() - profile.started
+            path = await asyncio.to_thread(self._write, profile)
+            route = request.scope.get("route")
+            logger.info(
+                "Profiled %s %s", request.method, getattr(route, "path", request.url.path),
+                extra={"event": "profile.written", "path": path, "samples": sum(profile.samples.values()),
+                       "duration_ms": round(duration * 1000, 1)},
+            )
+        if requested:
+            response.headers[PROFILE_HEADER] = os.path.basename(path)
+        return response
+
+    def _write(self, profile: Profile) -> str:
+        os.makedirs(self.output_dir, exist_ok=True)
+        path = os.path.join(self.output_dir, f"{profile.request_id}.folded")
+        with open(path, "w") as f:
+            f.write(profile.folded())
+        return path
@@ -0,0 +1,346 @@
+"""
+Lightweight request tracing.
+
+Spans are opened around HTTP requests (``TraceMiddleware``), SQL
+statements (``trace_engine``), agent model calls and anything wrapped in
+``tracer.span()`` or ``@traced``. The current span lives in a context
+variable, so tasks and ``asyncio.to_thread`` calls started while handling
+a request are parented to it automatically; queued work such as the
+invocation writer carries ``current_context()`` along and links to it.
+
+Finished spans are written by a background thread as OTLP/JSON lines
+(one ``resourceSpans`` document per line, the format of the collector's
+file exporter), so traces can be inspected offline or replayed into any
+OTLP backend. Incoming W3C ``traceparent`` headers are honoured and the
+trace id is returned in ``X-Trace-Id``.
+"""
+import functools
+import inspect
+import json
+import os
+import queue
+import random
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass
+from typing import Any, Dict, Iterable, List, Optional
+
+from fastapi import Request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+# OTLP span kinds
+INTERNAL, SERVER, CLIENT = 1, 2, 3
+# OTLP status codes
+STATUS_UNSET, STATUS_OK, STATUS_ERROR = 0, 1, 2
+
+TRACE_ID_HEADER = "X-Trace-Id"
+
+
+@dataclass(frozen=True)
+class SpanContext:
+    trace_id: str
+    span_id: str
+    sampled: bool = True
+
+
+class Span:
+    __slots__ = ("tracer", "name", "context", "parent_id", "kind", "attributes", "links", "start_ns", "end_ns", "status", "status_message")
+
+    def __init__(self, tracer, name, context, parent_id, kind, attributes, links):
+        self.tracer = tracer
+        self.name = name
+        self.context = context
+        self.parent_id = parent_id
+        self.kind = kind
+        self.attributes = attributes
+        self.links = links
+        self.start_ns = time.time_ns()
+        self.end_ns = None
+        self.status = STATUS_UNSET
+        self.status_message = None
+
+    def set_attribute(self, key: str, value: Any):
+        self.attributes[key] = value
+
+    def record_exception(self, error: BaseException):
+        self.status = STATUS_ERROR
+        self.status_message = str(error)[:500]
+        self.attributes["exception.type"] = type(error).__name__
+
+    def end(self):
+        if self.end_ns is None:
+            self.end_ns = time.time_ns()
+            if self.context.sampled:
+                self.tracer.exporter.export(self)
+
+
+_current_span: ContextVar[Optional[Span]] = ContextVar("current_span", default=None)
+
+
+def current_context() -> Optional[SpanContext]:
+    """Context of the active span, to carry into work queued for later."""
+    span = _current_span.get()
+    return span.context if span is not None else None
+
+
+def current_trace_id() -> Optional[str]:
+    span = _current_span.get()
+    return span.context.trace_id if span is not None else None
+
+
+def parse_traceparent(header: Optional[str]) -> Optional[SpanContext]:
+    """``00-<trace id>-<parent id>-<flags>`` as a remote parent, if valid."""
+    if not header:
+        return None
+    parts = header.strip().split("-")
+    if len(parts) != 4 or len(parts[1]) != 32 or len(parts[2]) != 16:
+        return None
+    try:
+        int(parts[1], 16), int(parts[2], 16)
+        flags = int(parts[3], 16)
+    except ValueError:
+        return None
+    if parts[1] == "0" * 32 or parts[2] == "0" * 16:
+        return None
+    return SpanContext(parts[1], parts[2], sampled=bool(flags & 1))
+
+
+class Tracer:
+    def __init__(self, exporter=None, enabled: bool = False, sample_rate: float = 1.0):
+        self.exporter = exporter
+        self.enabled = enabled and exporter is not None
+        self.sample_rate = sample_rate
+
+    def start_span(
+        self,
+        name: str,
+        kind: int = INTERNAL,
+        parent: Optional[SpanContext] = None,
+        links: Iterable[SpanContext] = (),
+        **attributes,
+    ) -> Span:
+        """A span under ``parent`` (default: the active span); not made active."""
+        if parent is None:
+            parent = current_context()
+        if parent is None:
+            context = SpanContext(os.urandom(16).hex(), os.urandom(8).hex(), random.random() < self.sample_rate)
+        else:
+            context = SpanContext(parent.trace_id, os.urandom(8).hex(), parent.sampled)
+        return Span(self, name, context, parent.span_id if parent else None, kind, attributes, list(links))
+
+    @contextmanager
+    def span(self, name: str, kind: int = INTERNAL, parent: Optional[SpanContext] = None, links=(), **attributes):
+        """Run the block in a new active span; yields None when tracing is off."""
+        if not self.enabled:
+            yield None
+            return
+        span = self.start_span(name, kind, parent, links, **attributes)
+        token = _current_span.set(span)
+        try:
+            yield span
+        except BaseException as e:
+            span.record_exception(e)
+            raise
+        finally:
+            _current_span.reset(token)
+            span.end()
+
+
+tracer = Tracer()
+
+
+def traced(name: str):
+    """Decorator running a sync or async function in a span named ``name``."""
+    def decorate(func):
+        if inspect.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def wrapper(*args, **kwargs):
+                with tracer.span(name):
+                    return await func(*args, **kwargs)
+        else:
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                with tracer.span(name):
+                    return func(*args, **kwargs)
+        return wrapper
+    return decorate
+
+
+class TraceMiddleware:
+    """
+    HTTP middleware opening the root span of each request, named after
+    the route template, and returning its trace id in ``X-Trace-Id``.
+    """
+
+    def __init__(self, tracer: Tracer):
+        self.tracer = tracer
+
+    async def __call__(self, request: Request, call_next):
+        if not self.tracer.enabled:
+            return await call_next(request)
+        parent = parse_traceparent(request.headers.get("traceparent"))
+        with self.tracer.span(
+            request.method, SERVER, parent,
+            **{"http.method": request.method, "http.target": request.url.path},
+        ) as span:
+            response = await call_next(request)
+            route = request.scope.get("route")
+            if route is not None:
+                span.name = f"{request.method} {route.path}"
+                span.set_attribute("http.route", route.path)
+            span.set_attribute("http.status_code", response.status_code)
+            if response.status_code >= 500:
+                span.status = STATUS_ERROR
+            response.headers[TRACE_ID_HEADER] = span.context.trace_id
+            return response
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    # Only statements run on behalf of a traced request or job
+    if not tracer.enabled or _current_span.get() is None:
+        return
+    operation = statement.lstrip().split(None, 1)[0].upper() if statement.strip() else "SQL"
+    span = tracer.start_span(
+        f"db {operation}", CLIENT,
+        **{"db.system": conn.dialect.name, "db.statement": statement[:1000]},
+    )
+    conn.info.setdefault("trace_spans", []).append(span)
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    spans = conn.info.get("trace_spans")
+    if spans:
+        span = spans.pop()
+        if cursor.rowcount is not None and cursor.rowcount >= 0:
+            span.set_attribute("db.rows", cursor.rowcount)
+        span.end()
+
+
+def _handle_error(context):
+    spans = context.connection.info.get("trace_spans") if context.connection is not None else None
+    if spans:
+        span = spans.pop()
+        span.record_exception(context.original_exception)
+        span.end()
+
+
+def trace_engine(engine: Engine):
+    """Open a client span for every statement ``engine`` runs inside a trace."""
+    if not event.contains(engine, "before_cursor_execute", _before_cursor_execute):
+        event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+        event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+        event.listen(engine, "handle_error", _handle_error)
+
+
+def _attribute(key: str, value: Any) -> Dict[str, Any]:
+    if isinstance(value, bool):
+        typed = {"boolValue": value}
+    elif isinstance(value, int):
+        typed = {"intValue": str(value)}
+    elif isinstance(value, float):
+        typed = {"doubleValue": value}
+    else:
+        typed = {"stringValue": str(value)}
+    return {"key": key, "value": typed}
+
+
+def otlp_span(span: Span) -> Dict[str, Any]:
+    data = {
+        "traceId": span.context.trace_id,
+        "spanId": span.context.span_id,
+        "name": span.name,
+        "kind": span.kind,
+        "startTimeUnixNano": str(span.start_ns),
+        "endTimeUnixNano": str(span.end_ns),
+        "attributes": [_attribute(key, value) for key, value in span.attributes.items() if value is not None],
+        "status": {"code": span.status},
+    }
+    if span.parent_id:
+        data["parentSpanId"] = span.parent_id
+    if span.status_message:
+        data["status"]["message"] = span.status_message
+    if span.links:
+        data["links"] = [{"traceId": link.trace_id, "spanId": link.span_id} for link in span.links]
+    return data
+
+
+class JsonlExporter:
+    """
+    Appends finished spans to ``path`` as OTLP/JSON lines from a background
+    thread, so request handlers never wait on the file. Spans are dropped
+    (and counted) if the queue fills up. ``{pid}`` in the path gives each
+    worker process its own file.
+    """
+
+    def __init__(self, path: str, service_name: str = "ai-agent-marketplace", max_queue_size: int = 10000,
+                 flush_interval: float = 1.0, max_batch: int = 512):
+        self.path = path
+        self.service_name = service_name
+        self.flush_interval = flush_interval
+        self.max_batch = max_batch
+        self.dropped = 0
+        self._queue: "queue.Queue[Optional[Span]]" = queue.Queue(maxsize=max_queue_size)
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+
+    def export(self, span: Span):
+        if self._thread is None:
+            self._start()
+        try:
+            self._queue.put_nowait(span)
+        except queue.Full:
+            self.dropped += 1
+
+    def _start(self):
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="trace-exporter", daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        stopping = False
+        while not stopping:
+            batch: List[Span] = []
+            try:
+                item = self._queue.get(timeout=self.flush_interval)
+                if item is None:
+                    stopping = True
+                else:
+                    batch.append(item)
+                while len(batch) < self.max_batch and not stopping:
+                    item = self._queue.get_nowait()
+                    if item is None:
+                        stopping = True
+                    else:
+                        batch.append(item)
+            except queue.Empty:
+                pass
+            if batch:
+                self._write(batch)
+
+    def _write(self, spans: List[Span]):
+        document = {"resourceSpans": [{
+            "resource": {"attributes": [
+                _attribute("service.name", self.service_name),
+                _attribute("process.pid", os.getpid()),
+            ]},
+            "scopeSpans": [{"scope": {"name": __name__}, "spans": [otlp_span(span) for span in spans]}],
+        }]}
+        path = self.path.format(pid=os.getpid())
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(path, "a") as f:
+            f.write(json.dumps(document) + "\n")
+
+    def shutdown(self, timeout: float = 5.0):
+        """Write out queued spans and stop the thread."""
+        thread = self._thread
+        if thread is None:
+            return
+        self._queue.put(None)
+        thread.join(timeout)
+        self._thread = None
@@ -0,0 +1,268 @@
+import bisect
+import heapq
+import math
+import re
+import threading
+from collections import Counter
+from dataclasses import dataclass
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from sqlalchemy.orm import Session
+
+from ..cache.invalidation import invalidation_bus
+from ..database.models import Agent
+from ..database.schemas import AgentResponse
+
+# BM25 parameters; names count for more than descriptions
+K1 = 1.2
+B = 0.75
+NAME_WEIGHT = 3
+
+# How many vocabulary terms a trailing prefix may expand to
+MAX_PREFIX_EXPANSIONS = 50
+
+_TOKEN = re.compile(r"\w+")
+
+
+def tokenize(value: str) -> List[str]:
+    return _TOKEN.findall(value.lower())
+
+
+@dataclass(frozen=True)
+class CatalogSearchResult:
+    agents: List[Tuple[AgentResponse, float]]
+    total: int
+
+
+class CatalogSearchIndex:
+    """
+    In-memory inverted index over agent names and descriptions.
+
+    Postings map each term to ``{agent_id: weighted term frequency}`` and
+    queries are scored with BM25, the last query term matching as a prefix.
+    The index is built from the agents table on first use; after that,
+    agents created or changed on any worker are queued through the
+    invalidation bus and re-read individually before the next search.
+    """
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._built = False
+        self._pending: Set[int] = set()
+        self._agents: Dict[int, AgentResponse] = {}
+        self._postings: Dict[str, Dict[int, int]] = {}
+        self._doc_terms: Dict[int, Counter] = {}
+        self._doc_lengths: Dict[int, int] = {}
+        self._total_length = 0
+        # Sorted vocabulary for prefix expansion
+        self._vocabulary: List[str] = []
+        self._active_ids: Set[int] = set()
+        # Active agents in id order and in (price, id) order, for browsing
+        self._by_id: List[int] = []
+        self._by_price: List[Tuple[float, int]] = []
+        # BM25 length normalisation per agent, recomputed after changes
+        self._norm_cache: Optional[Dict[int, float]] = None
+
+    def __len__(self) -> int:
+        return len(self._agents)
+
+    def mark_dirty(self, agent_id: Optional[int] = None):
+        """Queue an agent for re-indexing; ``None`` forces a full rebuild."""
+        with self._lock:
+            if agent_id is None:
+                self._built = False
+            else:
+                self._pending.add(agent_id)
+
+    def ensure_current(self, db: Session):
+        with self._lock:
+            if not self._built:
+                self._pending.clear()
+                self.rebuild(db.query(Agent).all())
+                return
+            if not self._pending:
+                return
+            pending, self._pending = self._pending, set()
+            found = {agent.id: agent for agent in db.query(Agent).filter(Agent.id.in_(pending)).all()}
+            for agent_id in pending:
+                if agent_id in found:
+                    self.add(AgentResponse.model_validate(found[agent_id]))
+                else:
+                    self.remove(agent_id)
+
+    def rebuild(self, agents: Iterable):
+        with self._lock:
+            self._agents.clear()
+            self._postings.clear()
+            self._doc_terms.clear()
+            self._doc_lengths.clear()
+            self._total_length = 0
+            self._vocabulary = []
+            self._active_ids.clear()
+            self._norm_cache = None
+            for agent in agents:
+                self._index(agent if isinstance(agent, AgentResponse) else AgentResponse.model_validate(agent))
+            self._vocabulary = sorted(self._postings)
+            self._by_id = sorted(self._active_ids)
+            self._by_price = sorted((self._agents[agent_id].price, agent_id) for agent_id in self._active_ids)
+            self._built = True
+
+    def add(self, agent: AgentResponse):
+        """Index an agent, replacing any earlier version of it."""
+        with self._lock:
+            self.remove(agent.id)
+            new_terms = self._index(agent)
+            for term in new_terms:
+                bisect.insort(self._vocabulary, term)
+            if agent.is_active:
+                bisect.insort(self._by_id, agent.id)
+                bisect.insort(self._by_price, (agent.price, agent.id))
+
+    def remove(self, agent_id: int):
+        with self._lock:
+            terms = self._doc_terms.pop(agent_id, None)
+            if terms is None:
+                return
+            agent = self._agents.pop(agent_id)
+            if agent_id in self._active_ids:
+                self._active_ids.discard(agent_id)
+                self._by_id.pop(bisect.bisect_left(self._by_id, agent_id))
+                position = bisect.bisect_left(self._by_price, (agent.price, agent_id))
+                if position < len(self._by_price) and self._by_price[position] == (agent.price, agent_id):
+                    self._by_price.pop(position)
+            self._norm_cache = None
+            self._total_length -= self._doc_lengths.pop(agent_id)
+            for term in terms:
+                postings = self._postings[term]
+                del postings[agent_id]
+                if not postings:
+                    del self._postings[term]
+                    position = bisect.bisect_left(self._vocabulary, term)
+                    if position < len(self._vocabulary) and self._vocabulary[position] == term:
+                        self._vocabulary.pop(position)
+
+    def _index(self, agent: AgentResponse) -> List[str]:
+        terms = Counter()
+        for term in tokenize(agent.name):
+            terms[term] += NAME_WEIGHT
+        for term in tokenize(agent.description or ""):
+            terms[term] += 1
+        new_terms = []
+        for term, frequency in terms.items():
+            postings = self._postings.get(term)
+            if not postings:
+                new_terms.append(term)
+                postings = self._postings[term] = {}
+            postings[agent.id] = frequency
+        self._agents[agent.id] = agent
+        if agent.is_active:
+            self._active_ids.add(agent.id)
+        self._norm_cache = None
+        self._doc_terms[agent.id] = terms
+        length = sum(terms.values())
+        self._doc_lengths[agent.id] = length
+        self._total_length += length
+        return new_terms
+
+    def _norms(self) -> Dict[int, float]:
+        if self._norm_cache is None:
+            average_length = self._total_length / max(1, len(self._agents))
+            self._norm_cache = {
+                agent_id: K1 * (1 - B + B * length / average_length)
+                for agent_id, length in self._doc_lengths.items()
+            }
+        return self._norm_cache
+
+    def _expand_prefix(self, prefix: str) -> List[str]:
+        start = bisect.bisect_left(self._vocabulary, prefix)
+        expanded = []
+        for term in self._vocabulary[start:start + MAX_PREFIX_EXPANSIONS]:
+            if not term.startswith(prefix):
+                break
+            expanded.append(term)
+        return expanded
+
+    def search(
+        self,
+        query: Optional[str] = None,
+        min_price: Optional[float] = None,
+        max_price: Optional[float] = None,
+        developer_id: Optional[int] = None,
+        limit: int = 20,
+        offset: int = 0,
+    ) -> CatalogSearchResult:
+        """
+        Active agents matching every query term and filter, best first.
+        Without a query, agents are returned newest first.
+        """
+        def accept(agent: AgentResponse) -> bool:
+            return (
+                agent.is_active
+                and (min_price is None or agent.price >= min_price)
+                and (max_price is None or agent.price <= max_price)
+                and (developer_id is None or agent.developer_id == developer_id)
+            )
+
+        with self._lock:
+            terms = tokenize(query or "")
+            if not terms:
+                if min_price is None and max_price is None and developer_id is None:
+                    end = max(0, len(self._by_id) - offset)
+                    page = self._by_id[max(0, end - limit):end][::-1]
+                    return CatalogSearchResult([(self._agents[agent_id], 0.0) for agent_id in page], len(self._by_id))
+                if min_price is None and max_price is None:
+                    matches = self._active_ids
+                else:
+                    low = bisect.bisect_left(self._by_price, (min_price if min_price is not None else float("-inf"),))
+                    high = bisect.bisect_right(self._by_price, (max_price if max_price is not None else float("inf"), float("inf")))
+                    matches = [agent_id for _, agent_id in self._by_price[low:high]]
+                if developer_id is not None:
+                    matches = [agent_id for agent_id in matches if self._agents[agent_id].developer_id == developer_id]
+                page = heapq.nlargest(offset + limit, matches)[offset:]
+                return CatalogSearchResult([(self._agents[agent_id], 0.0) for agent_id in page], len(matches))
+
+            # Every term must match; the last one may match as a prefix
+            term_groups = [[term] for term in terms[:-1]] + [self._expand_prefix(terms[-1])]
+            if any(not group for group in term_groups):
+                return CatalogSearchResult([], 0)
+            candidates = None
+            for group in sorted(term_groups, key=lambda g: sum(len(self._postings.get(t, {})) for t in g)):
+                ids = set().union(*(self._postings.get(term, {}).keys() for term in group))
+                candidates = ids if candidates is None else candidates & ids
+                if not candidates:
+                    return CatalogSearchResult([], 0)
+
+            if min_price is not None or max_price is not None or developer_id is not None:
+                candidates = [agent_id for agent_id in candidates if accept(self._agents[agent_id])]
+            else:
+                candidates = candidates & self._active_ids
+
+            # Term-at-a-time BM25 over the surviving candidates
+            norms = self._norms()
+            scores = dict.fromkeys(candidates, 0.0)
+            document_count = len(self._agents)
+            for group in term_groups:
+                for term in group:
+                    postings = self._postings.get(term, {})
+                    df = len(postings)
+                    idf_k = math.log(1 + (document_count - df + 0.5) / (df + 0.5)) * (K1 + 1)
+                    if df > len(scores):
+                        for agent_id in scores:
+                            frequency = postings.get(agent_id)
+                            if frequency:
+                                scores[agent_id] += idf_k * frequency / (frequency + norms[agent_id])
+                    else:
+                        for agent_id, frequency in postings.items():
+                            if agent_id in scores:
+                                scores[agent_id] += idf_k * frequency / (frequency + norms[agent_id])
+
+            ranked = heapq.nlargest(offset + limit, scores.items(), key=lambda item: (item[1], item[0]))[offset:]
+            return CatalogSearchResult(
+                [(self._agents[agent_id], round(score, 6)) for agent_id, score in ranked],
+                len(scores),
+            )
+
+
+catalog_search_index = CatalogSearchIndex()
+
+invalidation_bus.subscribe("catalog", catalog_search_index.mark_dirty)
@@ -0,0 +1,271 @@
+import json
+import logging
+import re
+from dataclasses import dataclass
+from typing import Any, Dict, Iterable, List, Optional
+
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+logger = logging.getLogger(__name__)
+
+SEARCH_TABLE = "invocation_search"
+
+# Column weights: the summary says the most about an invocation, then the
+# user's own input, then the agent's (much longer) output
+_SQLITE_WEIGHTS = (3.0, 2.0, 1.0)
+
+# user_id is stored (not tokenized) so searches filter on it without
+# joining every user's matches to agent_invocations
+_SQLITE_DDL = [
+    f"CREATE VIRTUAL TABLE IF NOT EXISTS {SEARCH_TABLE} USING fts5("
+    "summary, input_text, output_text, user_id UNINDEXED, tokenize = 'porter unicode61')",
+]
+
+_POSTGRES_DDL = [
+    f"CREATE TABLE IF NOT EXISTS {SEARCH_TABLE} ("
+    "invocation_id INTEGER PRIMARY KEY REFERENCES agent_invocations(id) ON DELETE CASCADE, "
+    "user_id INTEGER NOT NULL, "
+    "document TSVECTOR NOT NULL)",
+    f"CREATE INDEX IF NOT EXISTS ix_{SEARCH_TABLE}_document ON {SEARCH_TABLE} USING GIN (document)",
+    f"CREATE INDEX IF NOT EXISTS ix_{SEARCH_TABLE}_user_id ON {SEARCH_TABLE} (user_id)",
+]
+
+
+@dataclass
+class SearchHit:
+    invocation_id: int
+    agent_id: int
+    agent_name: Optional[str]
+    created_at: str
+    rank: float
+    snippet: str
+
+
+def extract_text(value: Any) -> str:
+    """
+    Flatten a stored input/output payload into plain text for indexing.
+
+    Payloads are JSON strings whose shape depends on the agent, so every
+    string value is collected rather than picking fields per agent.
+    """
+    if isinstance(value, str):
+        try:
+            value = json.loads(value)
+        except ValueError:
+            return value
+    parts: List[str] = []
+
+    def walk(node):
+        if isinstance(node, str):
+            parts.append(node)
+        elif isinstance(node, dict):
+            for item in node.values():
+                walk(item)
+        elif isinstance(node, (list, tuple)):
+            for item in node:
+                walk(item)
+
+    walk(value)
+    return " ".join(part for part in parts if part)
+
+
+def _fts5_query(query: str) -> Optional[str]:
+    # Quote every term so user input can't inject FTS5 syntax; the last
+    # term is a prefix match so results show up while the user is typing
+    terms = re.findall(r"\w+", query)
+    if not terms:
+        return None
+    quoted = [f'"{term}"' for term in terms]
+    quoted[-1] += "*"
+    return " ".join(quoted)
+
+
+class HistorySearchIndex:
+    """
+    Full-text index over invocation history.
+
+    Uses an FTS5 table on SQLite and a side table of weighted tsvectors
+    with a GIN index on Postgres. Rows are indexed by ``index`` in the
+    same transaction that inserts the invocations, so the index never lags
+    the history table. Rows written before the index existed are added by
+    ``backfill`` (``python -m scripts.index_history``), not at startup.
+    """
+
+    def _dialect(self, bind) -> str:
+        return bind.dialect.name
+
+    def ensure_schema(self, db: Session):
+        """Create the index if missing; every worker runs this at startup."""
+        dialect = self._dialect(db.get_bind())
+        if dialect not in ("sqlite", "postgresql"):
+            logger.warning(f"History search is not supported on {dialect}")
+            return
+        try:
+            if dialect == "postgresql":
+                # Concurrent CREATE ... IF NOT EXISTS can still collide
+                db.execute(text("SELECT pg_advisory_xact_lock(hashtext(:name))"), {"name": SEARCH_TABLE})
+            elif self._outdated_sqlite_table(db):
+                # Built before user_id was stored; backfill rebuilds it
+                db.execute(text(f"DROP TABLE {SEARCH_TABLE}"))
+            for statement in (_SQLITE_DDL if dialect == "sqlite" else _POSTGRES_DDL):
+                db.execute(text(statement))
+            db.commit()
+        except Exception:
+            db.rollback()
+            raise
+        if self.needs_backfill(db):
+            logger.warning(
+                "History search is missing older invocations; run python -m scripts.index_history",
+                extra={"event": "history_search.backfill_needed"},
+            )
+
+    def _outdated_sqlite_table(self, db: Session) -> bool:
+        columns = [row[1] for row in db.execute(text(f"PRAGMA table_info({SEARCH_TABLE})"))]
+        return bool(columns) and "user_id" not in columns
+
+    def _id_column(self, db: Session) -> str:
+        return "rowid" if self._dialect(db.get_bind()) == "sqlite" else "invocation_id"
+
+    def needs_backfill(self, db: Session) -> bool:
+        """Whether invocations newer than the last indexed one exist."""
+        last_indexed = db.execute(text(f"SELECT COALESCE(MAX({self._id_column(db)}), 0) FROM {SEARCH_TABLE}")).scalar()
+        last_invocation = db.execute(text("SELECT COALESCE(MAX(id), 0) FROM agent_invocations")).scalar()
+        return last_invocation > last_indexed
+
+    def backfill(self, db: Session, batch_size: int = 1000) -> int:
+        """
+        Index every invocation the index doesn't have yet, committing each
+        batch. Safe to run while the app is writing, or twice at once.
+        """
+        indexed = f"SELECT 1 FROM {SEARCH_TABLE} s WHERE s.{self._id_column(db)} = inv.id"
+        last_id = 0
+        total = 0
+        while True:
+            rows = db.execute(
+                text(
+                    "SELECT inv.id, inv.user_id, inv.input_data, inv.output_data, inv.summary "
+                    f"FROM agent_invocations inv WHERE inv.id > :last AND NOT EXISTS ({indexed}) "
+                    "ORDER BY inv.id LIMIT :limit"
+                ),
+                {"last": last_id, "limit": batch_size},
+            ).mappings().all()
+            if not rows:
+                return total
+            self.index(db, rows)
+            db.commit()
+            total += len(rows)
+            last_id = rows[-1]["id"]
+
+    def index(self, db: Session, rows: Iterable[Dict[str, Any]]):
+        """
+        Add invocation rows (with ``id``, ``user_id``, ``input_data``,
+        ``output_data`` and optional ``summary``) to the index.
+        """
+        documents = [
+            {
+                "id": row["id"],
+                "user_id": row["user_id"],
+                "summary": row.get("summary") or "",
+                "input_text": extract_text(row["input_data"]),
+                "output_text": extract_text(row["output_data"]),
+            }
+            for row in rows
+        ]
+        if not documents:
+            return
+        if self._dialect(db.get_bind()) == "sqlite":
+            # FTS5 ignores OR IGNORE, so skip indexed rows explicitly
+            db.execute(
+                text(
+                    f"INSERT INTO {SEARCH_TABLE} (rowid, summary, input_text, output_text, user_id) "
+                    "SELECT :id, :summary, :input_text, :output_text, :user_id "
+                    f"WHERE NOT EXISTS (SELECT 1 FROM {SEARCH_TABLE} WHERE rowid = :id)"
+                ),
+                documents,
+            )
+        else:
+            db.execute(
+                text(
+                    f"INSERT INTO {SEARCH_TABLE} (invocation_id, user_id, document) VALUES ("
+                    ":id, :user_id, "
+                    "setweight(to_tsvector('english', :summary), 'A') || "
+                    "setweight(to_tsvector('english', :input_text), 'B') || "
+                    "setweight(to_tsvector('english', :output_text), 'C')) "
+                    "ON CONFLICT (invocation_id) DO NOTHING"
+                ),
+                documents,
+            )
+
+    def search(self, db: Session, user_id: int, query: str, limit: int = 20, offset: int = 0):
+        """Ranked hits for ``query`` in one user's history, and the total match count."""
+        if self._dialect(db.get_bind()) == "sqlite":
+            return self._search_sqlite(db, user_id, query, limit, offset)
+        return self._search_postgres(db, user_id, query, limit, offset)
+
+    def _search_sqlite(self, db, user_id, query, limit, offset):
+        match = _fts5_query(query)
+        if match is None:
+            return [], 0
+        params = {"match": match, "user_id": user_id, "limit": limit, "offset": offset}
+        matches = (
+            f"FROM {SEARCH_TABLE} JOIN agent_invocations inv ON inv.id = {SEARCH_TABLE}.rowid "
+            "LEFT JOIN agents ON agents.id = inv.agent_id "
+            f"WHERE {SEARCH_TABLE} MATCH :match AND {SEARCH_TABLE}.user_id = :user_id"
+        )
+        total = db.execute(text(f"SELECT COUNT(*) {matches}"), params).scalar()
+        weights = ", ".join(str(weight) for weight in _SQLITE_WEIGHTS)
+        rows = db.execute(
+            text(
+                "SELECT inv.id, inv.agent_id, agents.name AS agent_name, inv.created_at, "
+                f"bm25({SEARCH_TABLE}, {weights}) AS score, "
+                f"snippet({SEARCH_TABLE}, -1, '[', ']', '...', 16) AS snippet "
+                f"{matches} ORDER BY score, inv.created_at DESC LIMIT :limit OFFSET :offset"
+            ),
+            params,
+        ).mappings().all()
+        # bm25 scores are lower-is-better; flip them so rank reads naturally
+        return [self._hit(row, -row["score"]) for row in rows], total
+
+    def _search_postgres(self, db, user_id, query, limit, offset):
+        params = {"query": query, "user_id": user_id, "limit": limit, "offset": offset}
+        matches = (
+            f"FROM {SEARCH_TABLE} s JOIN agent_invocations inv ON inv.id = s.invocation_id "
+            "LEFT JOIN agents ON agents.id = inv.agent_id, "
+            "websearch_to_tsquery('english', :query) q "
+            "WHERE s.user_id = :user_id AND s.document @@ q"
+        )
+        total = db.execute(text(f"SELECT COUNT(*) {matches}"), params).scalar()
+        rows = db.execute(
+            text(
+                "SELECT inv.id, inv.agent_id, agents.name AS agent_name, inv.created_at, "
+                "ts_rank_cd(s.document, q) AS score, "
+                "ts_headline('english', COALESCE(inv.summary, '') || ' ' || inv.input_data, q, "
+                "'StartSel=[, StopSel=], MaxFragments=1, MaxWords=16') AS snippet "
+                f"{matches} ORDER BY score DESC, inv.created_at DESC LIMIT :limit OFFSET :offset"
+            ),
+            params,
+        ).mappings().all()
+        return [self._hit(row, row["score"]) for row in rows], total
+
+    @staticmethod
+    def _hit(row, rank: float) -> SearchHit:
+        return SearchHit(
+            invocation_id=row["id"],
+            agent_id=row["agent_id"],
+            agent_name=row["agent_name"],
+            created_at=row["created_at"] if isinstance(row["created_at"], str) else row["created_at"].isoformat(),
+            rank=round(float(rank), 6),
+            snippet=row["snippet"] or "",
+        )
+
+
+history_index = HistorySearchIndex()
+
+
+def ensure_schema_once(index: HistorySearchIndex, session_factory):
+    db = session_factory()
+    try:
+        index.ensure_schema(db)
+    finally:
+        db.close()
@@ -1,6 +1,9 @@
+import time
+from contextlib import contextmanager
+
 import pytest
 from fastapi.testclient import TestClient
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event
 from sqlalchemy.orm import sessionmaker, Session
 from sqlalchemy.pool import StaticPool
 from typing import Generator
@@ -37,15 +40,26 @@ def test_db() -> Generator[Session, None, None]:
         db.close()
         Base.metadata.drop_all(bind=engine)
 
-@pytest.fixture(scope="function")
-def client(test_db: Session) -> Generator[TestClient, None, None]:
+@contextmanager
+def _app_client(test_db: Session, asgi_app=None) -> Generator[TestClient, None, None]:
     # Import app here to avoid circular imports
-    from src.main import app, get_db, get_current_active_user
+    from src.main import app, get_db, get_current_active_user, rate_limiter, invocation_writer
+    from src.middleware.rate_limit import MemoryBucketStore
     from src.database.models import User
+    from src.auth.principal import principal_cache
+    from src.auth.api_keys import api_key_cache
+    from src.marketplace.catalog import agent_catalog, purchased_cache
+    from src.search.catalog import catalog_search_index
     
     # Clear any existing users
     test_db.query(User).delete()
     test_db.commit()
+    principal_cache.clear()
+    api_key_cache.clear()
+    agent_catalog.invalidate()
+    purchased_cache.clear()
+    catalog_search_index.mark_dirty()
+    rate_limiter.store = MemoryBucketStore()
     
     def override_get_db():
         try:
@@ -55,8 +69,160 @@ def client(test_db: Session) -> Generator[TestClient, None, None]:
     
     app.dependency_overrides[get_db] = override_get_db
     app.dependency_overrides[get_settings] = get_test_settings
+    # The invocation writer and background jobs open their own sessions
+    session_factory, writer_session_factory = app.state.session_factory, invocation_writer.session_factory
+    app.state.session_factory = sessionmaker(autocommit=False, autoflush=False, bind=test_db.get_bind())
     
-    with TestClient(app) as test_client:
+    try:
+        with TestClient(asgi_app or app) as test_client:
+            yield test_client
+    finally:
+        app.dependency_overrides.clear()
+        app.state.session_factory = session_factory
+        invocation_writer.session_factory = writer_session_factory
+
+@pytest.fixture(scope="function")
+def client(test_db: Session) -> Generator[TestClient, None, None]:
+    with _app_client(test_db) as test_client:
         yield test_client
-    
-    app.dependency_overrides.clear()
+
+@pytest.fixture
+def middleware_client(test_db: Session):
+    """
+    ``with middleware_client(ServerTiming()) as client:`` talks to the app
+    wrapped in a middleware that is off (so not installed) by default.
+    """
+    from starlette.middleware.base import BaseHTTPMiddleware
+    from src.main import app
+
+    def wrapped(dispatch):
+        return _app_client(test_db, BaseHTTPMiddleware(app, dispatch=dispatch))
+    return wrapped
+
+class QueryBudget:
+    """
+    Records the statements run on ``engine`` inside a ``with`` block and
+    fails the test, listing every statement, when there are more than
+    ``max_queries`` or they took longer than ``max_time_ms`` in total.
+    """
+
+    def __init__(self, engine, max_queries=None, max_time_ms=None):
+        self.engine = engine
+        self.max_queries = max_queries
+        self.max_time_ms = max_time_ms
+        self.queries = []
+
+    def _before(self, conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("query_budget_started", []).append(time.perf_counter())
+
+    def _after(self, conn, cursor, statement, parameters, context, executemany):
+        elapsed = time.perf_counter() - conn.info["query_budget_started"].pop()
+        self.queries.append((statement, parameters, elapsed * 1000))
+
+    @property
+    def time_ms(self):
+        return sum(ms for _, _, ms in self.queries)
+
+    def __enter__(self):
+        event.listen(self.engine, "before_cursor_execute", self._before)
+        event.listen(self.engine, "after_cursor_execute", self._after)
+        return self
+
+    def __exit__(self, exc_type, exc, traceback):
+        event.remove(self.engine, "before_cursor_execute", self._before)
+        event.remove(self.engine, "after_cursor_execute", self._after)
+        if exc_type is None:
+            self.check()
+
+    def check(self):
+        problems = []
+        if self.max_queries is not None and len(self.queries) > self.max_queries:
+            problems.append(f"{len(self.queries)} queries, budget is {self.max_queries}")
+        if self.max_time_ms is not None and self.time_ms > self.max_time_ms:
+            problems.append(f"{self.time_ms:.1f} ms in queries, budget is {self.max_time_ms} ms")
+        if problems:
+            listing = "\n".join(
+                f"  {i}. [{ms:.2f} ms] {' '.join(statement.split())}  {parameters!r}"
+                for i, (statement, parameters, ms) in enumerate(self.queries, 1)
+            )
+            pytest.fail(f"Query budget exceeded: {'; '.join(problems)}\n{listing}", pytrace=False)
+
+@pytest.fixture
+def query_budget(test_db: Session):
+    """
+    ``with query_budget(max_queries=2): client.get(...)`` fails the test
+    with the offending SQL when the request goes over budget. The test
+    session is emptied first, since each real request starts with a
+    fresh session and nothing already loaded.
+    """
+    def budget(max_queries=None, max_time_ms=None):
+        test_db.expunge_all()
+        return QueryBudget(test_db.get_bind(), max_queries, max_time_ms)
+    return budget
+
+class LoopBudget:
+    """
+    Fails the test, listing route and stack, when a callback on the app's
+    event loop holds it for longer than ``max_ms`` inside a ``with`` block.
+    The monitor's interval is shortened meanwhile, since blocks are
+    undercounted by up to one interval.
+    """
+
+    def __init__(self, monitor, max_ms):
+        self.monitor = monitor
+        self.max_ms = max_ms
+        self.blocks = []
+
+    def __enter__(self):
+        if not self.monitor.running:
+            pytest.fail("The event loop monitor isn't running (LOOP_MONITOR_ENABLED)", pytrace=False)
+        self.threshold, self.interval = self.monitor.threshold, self.monitor.interval
+        self.monitor.threshold = min(self.threshold, self.max_ms / 1000)
+        self.monitor.interval = min(self.interval, self.max_ms / 1000 / 10)
+        self.monitor.listeners.append(self.blocks.append)
+        return self
+
+    def __exit__(self, exc_type, exc, traceback):
+        # Let the heartbeat catch up with a block at the very end
+        self.monitor.wait_for_beats()
+        self.monitor.listeners.remove(self.blocks.append)
+        self.monitor.threshold, self.monitor.interval = self.threshold, self.interval
+        if exc_type is None:
+            self.check()
+
+    def check(self):
+        if self.blocks:
+            listing = "\n".join(
+                f"  {block.duration_ms:.0f} ms in {block.route}:\n" + "".join(f"    {line}\n" for line in block.stack[-12:])
+                for block in self.blocks
+            )
+            pytest.fail(f"Event loop blocked for more than {self.max_ms} ms\n{listing}", pytrace=False)
+
+@pytest.fixture
+def loop_budget(client):
+    """
+    ``with loop_budget(max_ms=50): client.get(...)`` fails the test with
+    the offending stack when the request blocks the event loop.
+    """
+    from src.main import loop_monitor
+
+    def budget(max_ms):
+        return LoopBudget(loop_monitor, max_ms)
+    return budget
+
+@pytest.fixture(scope="session")
+def fake_openai_process():
+    from benchmarks.fake_openai import FakeOpenAIServer
+
+    with FakeOpenAIServer(seed=0) as server:
+        yield server
+
+@pytest.fixture
+def fake_openai(fake_openai_process):
+    """The fake OpenAI-compatible server from benchmarks/, reset to its defaults."""
+    from dataclasses import asdict
+    from benchmarks.fake_openai import FakeConfig
+
+    fake_openai_process.configure(**asdict(FakeConfig(seed=0)))
+    fake_openai_process.reset()
+    return fake_openai_process
@@ -0,0 +1,132 @@
+import random
+from datetime import datetime, timedelta
+
+from fastapi import status
+from sqlalchemy import event
+
+from src.analytics.rollups import RollupJob, rollup_series
+from src.analytics.sketch import LatencySketch
+from src.database.models import Agent, AgentInvocation, AnalyticsRollup, AnalyticsWatermark, User
+
+NOW = datetime(2026, 10, 19, 12, 30)
+
+def _seed(db):
+    developer = User(username="dev", email="dev@example.com", hashed_password="x", is_developer=True)
+    db.add(developer)
+    db.commit()
+    agent = Agent(name="Agent", description="d", developer_id=developer.id, price=1.0, is_active=True)
+    db.add(agent)
+    db.commit()
+    return developer, agent
+
+def _invoke(db, agent, at, cost=2.0, latency_ms=100.0, tokens=10):
+    db.add(AgentInvocation(
+        user_id=agent.developer_id, agent_id=agent.id, input_data="{}", output_data="{}",
+        tokens_used=tokens, cost=cost, latency_ms=latency_ms, created_at=at
+    ))
+    db.commit()
+
+def test_sketch_quantiles_within_relative_error():
+    rng = random.Random(7)
+    values = [rng.lognormvariate(5, 1) for _ in range(20000)]
+    halves = LatencySketch(), LatencySketch()
+    for i, value in enumerate(values):
+        halves[i % 2].add(value)
+    # Merging partial sketches is what combines hours into days
+    merged = LatencySketch.from_json(halves[0].to_json())
+    merged.merge(halves[1])
+    values.sort()
+    assert merged.count == len(values)
+    for q in (0.5, 0.95, 0.99):
+        exact = values[int(q * (len(values) - 1))]
+        assert abs(merged.quantile(q) - exact) / exact <= 0.011
+
+def test_rollups_are_incremental(test_db):
+    developer, agent = _seed(test_db)
+    job = RollupJob(settle_seconds=30, clock=lambda: NOW)
+    _invoke(test_db, agent, NOW - timedelta(hours=2), latency_ms=100.0)
+    _invoke(test_db, agent, NOW - timedelta(hours=2, minutes=-10), latency_ms=300.0)
+    _invoke(test_db, agent, NOW - timedelta(hours=1))
+    # Too recent: left for a later run
+    _invoke(test_db, agent, NOW - timedelta(seconds=5))
+
+    assert job.run_once(test_db) == 3
+    assert job.run_once(test_db) == 0
+    assert test_db.get(AnalyticsWatermark, "invocation_rollups").last_invocation_id == 3
+
+    series = rollup_series(test_db, "agent", [agent.id], "hour", NOW - timedelta(days=1))
+    assert [point["invocations"] for point in series] == [2, 1]
+    assert series[0]["revenue"] == 4.0
+    assert series[0]["tokens"] == 20
+    assert series[0]["average_response_time"] == 0.2
+
+    job._clock = lambda: NOW + timedelta(minutes=1)
+    assert job.run_once(test_db) == 1
+    day = rollup_series(test_db, "developer", [developer.id], "day", NOW - timedelta(days=1))
+    assert len(day) == 1
+    assert day[0]["invocations"] == 4
+    assert abs(day[0]["p50_latency_ms"] - 100.0) <= 1.0
+    # Three hours and one day, for the agent and for its developer
+    assert test_db.query(AnalyticsRollup).count() == 8
+
+def test_racing_run_does_not_double_count(test_db):
+    _, agent = _seed(test_db)
+    _invoke(test_db, agent, NOW - timedelta(hours=1))
+    RollupJob(clock=lambda: NOW).run_once(test_db)
+
+    # A run that read the watermark before another worker advanced it
+    # loses the compare-and-set and discards its merge
+    test_db.query(AnalyticsWatermark).update({AnalyticsWatermark.last_invocation_id: 0})
+    test_db.commit()
+    job = RollupJob(clock=lambda: NOW)
+    merge = job._merge
+    def merge_then_lose_race(db, partials):
+        merge(db, partials)
+        db.query(AnalyticsWatermark).update({AnalyticsWatermark.last_invocation_id: 1})
+    job._merge = merge_then_lose_race
+
+    assert job.run_once(test_db) == 0
+    assert test_db.query(AnalyticsRollup).count() == 4
+    assert all(rollup.invocations == 1 for rollup in test_db.query(AnalyticsRollup))
+
+def test_analytics_endpoints_read_only_rollups(client, test_db):
+    developer = {"username": "andev", "email": "andev@example.com", "password": "testpassword123", "is_developer": True}
+    client.post("/users/register", json=developer)
+    token = client.post("/token", data={"username": "andev", "password": "testpassword123"}).json()["access_token"]
+    headers = {"Authorization": f"Bearer {token}"}
+    agent_id = client.post("/agents/create", headers=headers, json={"name": "Analysed", "description": "d", "price": 1.0}).json()["id"]
+    agent = test_db.get(Agent, agent_id)
+    for minutes in (90, 80, 70):
+        _invoke(test_db, agent, datetime.utcnow() - timedelta(minutes=minutes), cost=1.5, latency_ms=50.0)
+    RollupJob().run_once(test_db)
+
+    statements = []
+    def record(conn, cursor, statement, *args):
+        statements.append(statement)
+    event.listen(test_db.get_bind(), "before_cursor_execute", record)
+    try:
+        response = client.get(f"/agents/{agent_id}/analytics?granularity=hour", headers=headers)
+        earnings = client.get("/marketplace/developer-earnings", headers=headers)
+        overview = client.get("/developers/me/analytics", headers=headers)
+    finally:
+        event.remove(test_db.get_bind(), "before_cursor_execute", record)
+
+    assert response.status_code == status.HTTP_200_OK
+    assert sum(point["invocations"] for point in response.json()["time_series"]) == 3
+    assert earnings.json()["total_earnings"] == 4.5
+    assert earnings.json()["earnings_by_agent"][0]["invocations"] == 3
+    assert overview.json()["agents"][0]["revenue"] == 4.5
+    assert not any("agent_invocations" in statement for statement in statements)
+
+def test_agent_analytics_restricted_to_owner(client, test_db):
+    for name in ("owner", "other"):
+        client.post("/users/register", json={
+            "username": name, "email": f"{name}@example.com", "password": "testpassword123", "is_developer": True
+        })
+    owner = {"Authorization": "Bearer " + client.post("/token", data={"username": "owner", "password": "testpassword123"}).json()["access_token"]}
+    other = {"Authorization": "Bearer " + client.post("/token", data={"username": "other", "password": "testpassword123"}).json()["access_token"]}
+    agent_id = client.post("/agents/create", headers=owner, json={"name": "Mine", "description": "d", "price": 1.0}).json()["id"]
+
+    assert client.get(f"/agents/{agent_id}/analytics", headers=other).status_code == status.HTTP_403_FORBIDDEN
+    assert client.get(f"/agents/{agent_id}/analytics", headers=owner).json()["time_series"] == []
+    assert client.get("/agents/999999/analytics", headers=owner).status_code == status.HTTP_404_NOT_FOUND
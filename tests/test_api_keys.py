@@ -0,0 +1,88 @@
+from unittest.mock import patch
+
+import pytest
+from fastapi import status
+
+class FakeAgent:
+    async def process_request(self, input_data):
+        return {"output_text": "ok", "cost": 0}
+
+@pytest.fixture
+def fake_agent(monkeypatch):
+    import src.main as main
+    monkeypatch.setitem(main.AVAILABLE_AGENTS, "fake", FakeAgent())
+    monkeypatch.setitem(main.AGENT_NAME_TO_KEY, "Fake Agent", "fake")
+
+def get_auth_header(client):
+    client.post(
+        "/users/register",
+        json={
+            "username": "keyowner",
+            "email": "keyowner@example.com",
+            "password": "testpassword123",
+            "is_developer": True
+        }
+    )
+    response = client.post(
+        "/token",
+        data={"username": "keyowner", "password": "testpassword123"}
+    )
+    return {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+def create_agents(client, headers, count):
+    return [
+        client.post(
+            "/agents/create",
+            headers=headers,
+            json={"name": "Fake Agent", "description": "test", "price": 1.0}
+        ).json()["id"]
+        for _ in range(count)
+    ]
+
+def test_api_key_authenticates_without_bcrypt(client, test_db):
+    headers = get_auth_header(client)
+    created = client.post("/users/me/api-keys", headers=headers, json={"name": "batch"}).json()
+    assert created["key"].startswith(f"aam_{created['prefix']}_")
+
+    with patch("src.auth.security.pwd_context.verify") as verify:
+        bearer = client.get("/users/me", headers={"Authorization": f"Bearer {created['key']}"})
+        header = client.get("/users/me", headers={"X-API-Key": created["key"]})
+        assert not verify.called
+
+    assert bearer.status_code == status.HTTP_200_OK
+    assert header.json()["username"] == "keyowner"
+
+def test_wrong_secret_is_rejected(client, test_db):
+    headers = get_auth_header(client)
+    created = client.post("/users/me/api-keys", headers=headers, json={"name": "batch"}).json()
+    forged = f"aam_{created['prefix']}_not-the-secret"
+    response = client.get("/users/me", headers={"X-API-Key": forged})
+    assert response.status_code == status.HTTP_401_UNAUTHORIZED
+
+def test_scoped_key_restricted_to_agents(client, test_db, fake_agent):
+    headers = get_auth_header(client)
+    allowed, other = create_agents(client, headers, 2)
+    created = client.post(
+        "/users/me/api-keys", headers=headers, json={"name": "scoped", "agent_ids": [allowed]}
+    ).json()
+    key_headers = {"X-API-Key": created["key"]}
+
+    assert client.post(f"/agents/invoke/{allowed}", headers=key_headers, json={}).status_code == 200
+    response = client.post(f"/agents/invoke/{other}", headers=key_headers, json={})
+    assert response.status_code == status.HTTP_403_FORBIDDEN
+
+def test_revoked_key_stops_working(client, test_db):
+    headers = get_auth_header(client)
+    created = client.post("/users/me/api-keys", headers=headers, json={"name": "batch"}).json()
+    key_headers = {"X-API-Key": created["key"]}
+    assert client.get("/users/me", headers=key_headers).status_code == 200
+
+    revoked = client.delete(f"/users/me/api-keys/{created['id']}", headers=headers)
+    assert revoked.json()["revoked_at"] is not None
+    assert client.get("/users/me", headers=key_headers).status_code == status.HTTP_401_UNAUTHORIZED
+
+def test_api_key_cannot_create_keys(client, test_db):
+    headers = get_auth_header(client)
+    created = client.post("/users/me/api-keys", headers=headers, json={"name": "batch"}).json()
+    response = client.post("/users/me/api-keys", headers={"X-API-Key": created["key"]}, json={"name": "x"})
+    assert response.status_code == status.HTTP_403_FORBIDDEN
@@ -53,3 +53,58 @@ def test_invalid_login(client, test_db):
         }
     )
     assert response.status_code == status.HTTP_401_UNAUTHORIZED
+
+def test_login_rehashes_outdated_password_hash(client, test_db):
+    from src.auth.security import pwd_context
+    from src.database.models import User
+
+    weak_hash = pwd_context.hash("testpassword123", rounds=4)
+    test_db.add(User(
+        username="legacy",
+        email="legacy@example.com",
+        hashed_password=weak_hash,
+        token_balance=0.0,
+        is_active=True
+    ))
+    test_db.commit()
+    assert pwd_context.needs_update(weak_hash)
+
+    response = client.post(
+        "/token",
+        data={
+            "username": "legacy",
+            "password": "testpassword123"
+        }
+    )
+    assert response.status_code == status.HTTP_200_OK
+
+    user = test_db.query(User).filter(User.username == "legacy").first()
+    test_db.refresh(user)
+    assert user.hashed_password != weak_hash
+    assert not pwd_context.needs_update(user.hashed_password)
+    assert pwd_context.verify("testpassword123", user.hashed_password)
+
+def test_password_hashing_runs_off_the_event_loop():
+    import asyncio
+    import threading
+    from src.auth.security import get_password_hash_async, verify_password_async, pwd_context
+
+    threads = []
+    original_hash = pwd_context.hash
+
+    def recording_hash(secret, **kwargs):
+        threads.append(threading.current_thread().name)
+        return original_hash(secret, **kwargs)
+
+    async def run():
+        pwd_context.hash = recording_hash
+        try:
+            hashed = await get_password_hash_async("secret")
+        finally:
+            pwd_context.hash = original_hash
+        return hashed, await verify_password_async("secret", hashed), await verify_password_async("wrong", hashed)
+
+    hashed, valid, invalid = asyncio.run(run())
+    assert threads and threads[0].startswith("password-hash")
+    assert valid == (True, None)
+    assert invalid == (False, None)
@@ -0,0 +1,89 @@
+import asyncio
+import time
+
+import pytest
+from fastapi import status
+from prometheus_client import REGISTRY
+
+from src.observability.blocking import LoopMonitor
+
+def get_auth_header(client, username="blocker"):
+    client.post(
+        "/users/register",
+        json={
+            "username": username,
+            "email": f"{username}@example.com",
+            "password": "testpassword123",
+            "is_developer": False
+        }
+    )
+    response = client.post(
+        "/token",
+        data={"username": username, "password": "testpassword123"}
+    )
+    return {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+def blocking_call(seconds):
+    time.sleep(seconds)
+
+@pytest.fixture
+def slow_purchased_agents(monkeypatch):
+    """Make GET /agents do 200 ms of sync work on the event loop."""
+    import src.main
+    purchased_agents = src.main.purchased_agents
+
+    def slow_purchased_agents(db, user_id):
+        blocking_call(0.2)
+        return purchased_agents(db, user_id)
+    monkeypatch.setattr(src.main, "purchased_agents", slow_purchased_agents)
+
+def test_monitor_captures_the_blocking_stack():
+    monitor = LoopMonitor(threshold=0.05, interval=0.01)
+
+    async def run():
+        task = asyncio.create_task(monitor.run())
+        await asyncio.sleep(0.05)
+        blocking_call(0.2)
+        await asyncio.sleep(0.05)
+        task.cancel()
+
+    asyncio.run(run())
+    [block] = monitor.blocks
+    assert 180 <= block.duration_ms < 400
+    assert block.route == "other"
+    assert "in blocking_call" in block.stack[-1]
+    assert any(line.endswith("in run") for line in block.stack)
+    assert not monitor.running
+
+def test_request_within_loop_budget(client, loop_budget):
+    headers = get_auth_header(client)
+    client.get("/agents", headers=headers)
+    with loop_budget(max_ms=100):
+        response = client.get("/agents", headers=headers)
+    assert response.status_code == status.HTTP_200_OK
+
+def test_blocking_request_fails_loop_budget(client, loop_budget, slow_purchased_agents):
+    headers = get_auth_header(client)
+    before = REGISTRY.get_sample_value("event_loop_blocked_seconds_count", {"route": "/agents"}) or 0
+    with pytest.raises(pytest.fail.Exception) as failure:
+        with loop_budget(max_ms=100):
+            client.get("/agents", headers=headers)
+    assert "ms in /agents" in str(failure.value)
+    assert "in blocking_call" in str(failure.value)
+    assert REGISTRY.get_sample_value("event_loop_blocked_seconds_count", {"route": "/agents"}) == before + 1
+
+def test_debug_endpoint(client, loop_budget, slow_purchased_agents, monkeypatch):
+    import src.main
+    headers = get_auth_header(client)
+    assert client.get("/debug/event-loop").status_code == status.HTTP_404_NOT_FOUND
+
+    with pytest.raises(pytest.fail.Exception):
+        with loop_budget(max_ms=100):
+            client.get("/agents", headers=headers)
+    monkeypatch.setattr(src.main.settings, "DEBUG", True)
+    response = client.get("/debug/event-loop")
+    assert response.status_code == status.HTTP_200_OK
+    block = response.json()["blocks"][0]
+    assert block["route"] == "/agents"
+    assert block["duration_ms"] >= 100
+    assert "in blocking_call" in block["stack"][-1]
@@ -0,0 +1,118 @@
+from fastapi import status
+from sqlalchemy import event
+
+def get_auth_header(client, username="catalog"):
+    client.post(
+        "/users/register",
+        json={
+            "username": username,
+            "email": f"{username}@example.com",
+            "password": "testpassword123",
+            "is_developer": True
+        }
+    )
+    response = client.post(
+        "/token",
+        data={"username": username, "password": "testpassword123"}
+    )
+    return {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+def create_agent(client, headers, name):
+    response = client.post(
+        "/agents/create",
+        headers=headers,
+        json={"name": name, "description": "Catalog test agent", "price": 5.0}
+    )
+    return response.json()["id"]
+
+def recorded_statements(test_db, request):
+    statements = []
+    def record(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+    event.listen(test_db.get_bind(), "before_cursor_execute", record)
+    try:
+        return request(), statements
+    finally:
+        event.remove(test_db.get_bind(), "before_cursor_execute", record)
+
+def test_catalog_served_from_memory(client, test_db):
+    headers = get_auth_header(client)
+    create_agent(client, headers, "First Agent")
+    client.get("/agents", headers=headers)
+
+    response, statements = recorded_statements(test_db, lambda: client.get("/agents", headers=headers))
+    assert response.status_code == status.HTTP_200_OK
+    assert [agent["name"] for agent in response.json()] == ["First Agent"]
+    assert statements == []
+
+def test_revalidation_returns_304(client, test_db):
+    headers = get_auth_header(client)
+    agent_id = create_agent(client, headers, "First Agent")
+
+    for path in ("/agents", f"/agents/{agent_id}"):
+        response = client.get(path, headers=headers)
+        etag = response.headers["ETag"]
+        assert response.headers["Last-Modified"]
+
+        revalidated = client.get(path, headers={**headers, "If-None-Match": etag})
+        assert revalidated.status_code == status.HTTP_304_NOT_MODIFIED
+        assert revalidated.content == b""
+        assert revalidated.headers["ETag"] == etag
+
+        since = client.get(path, headers={**headers, "If-Modified-Since": response.headers["Last-Modified"]})
+        assert since.status_code == status.HTTP_304_NOT_MODIFIED
+
+def test_agent_creation_and_purchase_change_etag(client, test_db):
+    headers = get_auth_header(client)
+    agent_id = create_agent(client, headers, "First Agent")
+    etag = client.get("/agents", headers=headers).headers["ETag"]
+
+    create_agent(client, headers, "Second Agent")
+    response = client.get("/agents", headers={**headers, "If-None-Match": etag})
+    assert response.status_code == status.HTTP_200_OK
+    assert len(response.json()) == 2
+    etag = response.headers["ETag"]
+
+    client.post("/tokens/purchase", headers=headers, json={"amount": 10})
+    client.post("/agents/purchase", headers=headers, json={"agent_id": agent_id, "purchase_price": 5.0})
+    response = client.get("/agents", headers={**headers, "If-None-Match": etag})
+    assert response.status_code == status.HTTP_200_OK
+    purchased = {agent["id"]: agent["is_purchased"] for agent in response.json()}
+    assert purchased[agent_id] is True
+    assert client.get(f"/agents/{agent_id}", headers=headers).json()["is_purchased"] is True
+
+def test_rolled_back_change_keeps_catalog(client, test_db):
+    from src.database.models import Agent
+    headers = get_auth_header(client)
+    agent_id = create_agent(client, headers, "First Agent")
+    etag = client.get("/agents", headers=headers).headers["ETag"]
+
+    test_db.get(Agent, agent_id).name = "Renamed"
+    test_db.flush()
+    test_db.rollback()
+    assert client.get("/agents", headers={**headers, "If-None-Match": etag}).status_code == status.HTTP_304_NOT_MODIFIED
+
+    test_db.get(Agent, agent_id).name = "Renamed"
+    test_db.commit()
+    response = client.get("/agents", headers={**headers, "If-None-Match": etag})
+    assert response.json()[0]["name"] == "Renamed"
+
+def test_agent_update_moves_last_modified(client, test_db):
+    from datetime import datetime, timedelta
+    from src.database.models import Agent
+    headers = get_auth_header(client)
+    agent_id = create_agent(client, headers, "First Agent")
+    # Last-Modified has one-second resolution; put the creation well behind
+    agent = test_db.get(Agent, agent_id)
+    agent.created_at = agent.updated_at = datetime.utcnow() - timedelta(hours=1)
+    test_db.commit()
+    last_modified = client.get("/agents", headers=headers).headers["Last-Modified"]
+    since = {**headers, "If-Modified-Since": last_modified}
+    assert client.get("/agents", headers=since).status_code == status.HTTP_304_NOT_MODIFIED
+
+    test_db.get(Agent, agent_id).price = 9.0
+    test_db.commit()
+    for path in ("/agents", f"/agents/{agent_id}"):
+        response = client.get(path, headers=since)
+        assert response.status_code == status.HTTP_200_OK
+        assert response.headers["Last-Modified"] != last_modified
@@ -0,0 +1,104 @@
+from fastapi import status
+
+from src.database.schemas import AgentResponse
+from src.search.catalog import CatalogSearchIndex
+
+def get_auth_header(client, username="shopper"):
+    client.post(
+        "/users/register",
+        json={
+            "username": username,
+            "email": f"{username}@example.com",
+            "password": "testpassword123",
+            "is_developer": True
+        }
+    )
+    response = client.post(
+        "/token",
+        data={"username": username, "password": "testpassword123"}
+    )
+    return {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+def make_agent(agent_id, name, description, price=5.0, developer_id=1, is_active=True):
+    return AgentResponse(
+        id=agent_id, name=name, description=description, price=price,
+        developer_id=developer_id, is_active=is_active
+    )
+
+def test_ranking_prefers_name_matches():
+    index = CatalogSearchIndex()
+    index.rebuild([
+        make_agent(1, "Writing Assistant", "Helps with code review comments"),
+        make_agent(2, "Code Reviewer", "Reviews pull requests"),
+        make_agent(3, "Interview Prep", "Practice questions"),
+    ])
+    result = index.search("code")
+    assert [agent.id for agent, _ in result.agents] == [2, 1]
+    assert result.total == 2
+    # All terms must match, the last one as a prefix
+    assert [agent.id for agent, _ in index.search("code rev").agents] == [2, 1]
+    assert [agent.id for agent, _ in index.search("interview pr").agents] == [3]
+    assert index.search("code nonexistent").total == 0
+
+def test_filters_and_pagination():
+    index = CatalogSearchIndex()
+    index.rebuild([
+        make_agent(i, f"Agent {i}", "Summarizes documents", price=float(i), developer_id=i % 2)
+        for i in range(1, 11)
+    ] + [make_agent(11, "Agent 11", "Summarizes documents", is_active=False)])
+
+    result = index.search("summarizes", min_price=3, max_price=8, developer_id=0)
+    assert sorted(agent.id for agent, _ in result.agents) == [4, 6, 8]
+
+    first = index.search(None, limit=4)
+    second = index.search(None, limit=4, offset=4)
+    assert first.total == 10
+    assert [agent.id for agent, _ in first.agents] == [10, 9, 8, 7]
+    assert [agent.id for agent, _ in second.agents] == [6, 5, 4, 3]
+
+def test_incremental_updates():
+    index = CatalogSearchIndex()
+    index.rebuild([make_agent(1, "Resume Reviewer", "Feedback on resumes")])
+    index.add(make_agent(2, "Cover Letter Writer", "Drafts cover letters"))
+    assert [agent.id for agent, _ in index.search("cover").agents] == [2]
+
+    index.add(make_agent(2, "Letter Writer", "Drafts letters"))
+    assert index.search("cover").total == 0
+    index.remove(1)
+    assert index.search("resume").total == 0
+    assert len(index) == 1
+
+def test_unknown_terms_do_not_grow_the_index():
+    index = CatalogSearchIndex()
+    index.rebuild([make_agent(1, "Resume Reviewer", "Feedback on resumes")])
+    vocabulary = list(index._vocabulary)
+    # Only the last term is expanded from the vocabulary; earlier ones hit the postings
+    for query in ("kubernetes", "kubernetes resume", "xyzzy plugh feedback"):
+        assert index.search(query).total == 0
+    assert index._vocabulary == vocabulary
+    assert "kubernetes" not in index._postings
+
+    # A term searched before any agent had it is still indexed later
+    index.add(make_agent(2, "Kubernetes Helper", "Debugs helm charts"))
+    assert [agent.id for agent, _ in index.search("kubernetes").agents] == [2]
+    assert [agent.id for agent, _ in index.search("kube").agents] == [2]
+    assert [agent.id for agent, _ in index.search("helm kubernetes").agents] == [2]
+
+def test_search_endpoint_sees_new_agents(client, test_db):
+    headers = get_auth_header(client)
+    response = client.get("/agents/search", params={"q": "kubernetes"}, headers=headers)
+    assert response.status_code == status.HTTP_200_OK
+    assert response.json()["total"] == 0
+
+    client.post(
+        "/agents/create",
+        headers=headers,
+        json={"name": "Kubernetes Helper", "description": "Debugs clusters", "price": 7.5}
+    )
+    response = client.get(
+        "/agents/search", params={"q": "kube", "max_price": 10}, headers=headers
+    )
+    body = response.json()
+    assert body["total"] == 1
+    assert body["results"][0]["name"] == "Kubernetes Helper"
+    assert body["results"][0]["is_purchased"] is False
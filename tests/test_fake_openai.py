@@ -0,0 +1,76 @@
+import asyncio
+import time
+
+import openai
+import pytest
+from openai import AsyncOpenAI
+
+from src.agents.writing_assistant import WritingAssistantAgent
+from src.config import get_settings
+
+MESSAGES = [{"role": "user", "content": "Review this short paragraph please"}]
+
+def _client(server, **kwargs):
+    return AsyncOpenAI(api_key="fake", base_url=server.base_url, max_retries=0, **kwargs)
+
+def test_completion_with_usage(fake_openai):
+    fake_openai.configure(completion_tokens=12, prompt_tokens=30)
+    response = asyncio.run(_client(fake_openai).chat.completions.create(model="gpt-4", messages=MESSAGES))
+    assert response.choices[0].finish_reason == "stop"
+    assert len(response.choices[0].message.content.split()) == 12
+    assert (response.usage.prompt_tokens, response.usage.total_tokens) == (30, 42)
+
+def test_streaming_rate(fake_openai):
+    fake_openai.configure(completion_tokens=20, tokens_per_second=100, latency="fixed:100")
+
+    async def stream():
+        started = time.perf_counter()
+        response = await _client(fake_openai).chat.completions.create(model="gpt-4", messages=MESSAGES, stream=True)
+        pieces, first_token = [], None
+        async for chunk in response:
+            if chunk.choices and chunk.choices[0].delta.content:
+                first_token = first_token or time.perf_counter() - started
+                pieces.append(chunk.choices[0].delta.content)
+        return "".join(pieces), first_token, time.perf_counter() - started
+
+    text, first_token, total = asyncio.run(stream())
+    assert len(text.split()) == 20
+    assert first_token >= 0.1
+    # 20 tokens at 100/s after the first-token latency
+    assert 0.28 <= total < 2
+    assert fake_openai.stats()["streamed"] == 1
+
+@pytest.mark.parametrize("fault, error", [
+    ("429", openai.RateLimitError),
+    ("503", openai.InternalServerError),
+])
+def test_forced_faults(fake_openai, fault, error):
+    client = _client(fake_openai, default_headers={"X-Fake-Fault": fault})
+    with pytest.raises(error):
+        asyncio.run(client.chat.completions.create(model="gpt-4", messages=MESSAGES))
+
+def test_fault_rates_and_stalls(fake_openai):
+    fake_openai.configure(rate_429=0.3, rate_5xx=0.2, seed=1)
+
+    async def burst():
+        client = _client(fake_openai)
+        return await asyncio.gather(*(
+            client.chat.completions.create(model="gpt-4", messages=MESSAGES) for _ in range(200)
+        ), return_exceptions=True)
+
+    results = asyncio.run(burst())
+    stats = fake_openai.stats()
+    assert stats["requests"] == 200
+    assert 40 <= stats["rate_limited"] <= 80 and 20 <= stats["server_errors"] <= 60
+    assert sum(isinstance(result, openai.RateLimitError) for result in results) == stats["rate_limited"]
+
+    fake_openai.configure(rate_429=0, rate_5xx=0, rate_stall=1, stall_seconds=5)
+    with pytest.raises(openai.APITimeoutError):
+        asyncio.run(_client(fake_openai, timeout=0.5).chat.completions.create(model="gpt-4", messages=MESSAGES))
+
+def test_agents_use_configured_base_url(fake_openai, monkeypatch):
+    monkeypatch.setattr(get_settings(), "OPENAI_BASE_URL", fake_openai.base_url)
+    fake_openai.configure(completion_tokens=8, prompt_tokens=40)
+    result = asyncio.run(WritingAssistantAgent().process_request("Some text to improve"))
+    assert result["tokens_used"] == 48
+    assert fake_openai.stats()["completed"] == 1
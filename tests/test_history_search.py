@@ -0,0 +1,110 @@
+import asyncio
+
+from fastapi import status
+from sqlalchemy import text
+from sqlalchemy.orm import sessionmaker
+
+from src.database.invocation_writer import InvocationWriter
+from src.database.models import AgentInvocation, User
+from src.search.history import SEARCH_TABLE, extract_text, history_index
+
+def get_auth_header(client, username="searcher"):
+    client.post(
+        "/users/register",
+        json={
+            "username": username,
+            "email": f"{username}@example.com",
+            "password": "testpassword123",
+            "is_developer": True
+        }
+    )
+    response = client.post(
+        "/token",
+        data={"username": username, "password": "testpassword123"}
+    )
+    return {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+def write_invocations(test_db, user_id, records):
+    engine = test_db.get_bind()
+    history_index.ensure_schema(test_db)
+    writer = InvocationWriter(
+        sessionmaker(bind=engine), mode="sync", on_insert=history_index.index
+    )
+    async def run():
+        for input_data, output_data in records:
+            await writer.submit(user_id, 1, input_data, output_data)
+    asyncio.run(run())
+
+def test_extract_text_flattens_payloads():
+    payload = '{"code_review": {"code": "async def main()", "language": "python"}, "cost": 1.0}'
+    assert extract_text(payload) == "async def main() python"
+    assert extract_text("not json") == "not json"
+
+def test_search_is_ranked_paginated_and_per_user(client, test_db):
+    headers = get_auth_header(client)
+    user = test_db.query(User).filter(User.username == "searcher").first()
+    write_invocations(test_db, user.id, [
+        ({"code_review": {"code": "asyncio.gather(asyncio.sleep(1))"}}, {"output_text": "Use asyncio.TaskGroup for asyncio code"}),
+        ({"input_text": "Review my resume"}, {"output_text": "Mention asyncio experience"}),
+        ({"input_text": "Interview prep for Python"}, {"output_text": "Practice data structures"}),
+    ])
+    write_invocations(test_db, user.id + 1000, [
+        ({"input_text": "asyncio question from someone else"}, {"output_text": "asyncio"}),
+    ])
+
+    response = client.get("/users/me/invocations/search", params={"q": "asyncio"}, headers=headers)
+    assert response.status_code == status.HTTP_200_OK
+    body = response.json()
+    assert body["total"] == 2
+    first, second = body["results"]
+    assert "asyncio" in first["snippet"]
+    assert first["rank"] >= second["rank"]
+    assert "gather" in first["snippet"] or "TaskGroup" in first["snippet"]
+
+    page = client.get(
+        "/users/me/invocations/search", params={"q": "asyncio", "page": 2, "page_size": 1}, headers=headers
+    ).json()
+    assert page["total"] == 2
+    assert [hit["id"] for hit in page["results"]] == [second["id"]]
+
+    # Stemmed and prefix matches
+    assert client.get("/users/me/invocations/search", params={"q": "reviewing"}, headers=headers).json()["total"] == 1
+    assert client.get("/users/me/invocations/search", params={"q": "interv"}, headers=headers).json()["total"] == 1
+
+def test_search_query_syntax_is_escaped(client, test_db):
+    headers = get_auth_header(client)
+    write_invocations(test_db, 1, [({"input_text": "hello"}, {"output_text": "world"})])
+    for query in ['"unbalanced', "NEAR(a b", "*", "a OR"]:
+        response = client.get("/users/me/invocations/search", params={"q": query}, headers=headers)
+        assert response.status_code == status.HTTP_200_OK
+
+def test_backfill_indexes_existing_rows(test_db):
+    test_db.add(AgentInvocation(user_id=7, agent_id=1, input_data='{"topic": "kubernetes"}', output_data='{}'))
+    test_db.commit()
+
+    history_index.ensure_schema(test_db)
+    assert history_index.needs_backfill(test_db)
+    assert history_index.backfill(test_db) == 1
+    hits, total = history_index.search(test_db, 7, "kubernetes")
+    assert total == 1
+    assert history_index.backfill(test_db) == 0
+
+def test_indexing_is_idempotent_and_old_tables_are_rebuilt(test_db):
+    test_db.execute(text(
+        f"CREATE VIRTUAL TABLE {SEARCH_TABLE} USING fts5(summary, input_text, output_text)"
+    ))
+    test_db.add(AgentInvocation(user_id=7, agent_id=1, input_data='{"topic": "kubernetes"}', output_data='{}'))
+    test_db.commit()
+
+    history_index.ensure_schema(test_db)
+    row = {"id": 1, "user_id": 7, "input_data": '{"topic": "kubernetes"}', "output_data": "{}"}
+    # Another worker (or a backfill) indexing the same row is a no-op
+    history_index.index(test_db, [row])
+    history_index.index(test_db, [row])
+    test_db.commit()
+    assert history_index.backfill(test_db) == 0
+    assert history_index.search(test_db, 7, "kubernetes")[1] == 1
+    assert history_index.search(test_db, 8, "kubernetes")[1] == 0
+
+def test_app_startup_creates_the_index(client, test_db):
+    assert test_db.execute(text(f"SELECT COUNT(*) FROM {SEARCH_TABLE}")).scalar() == 0
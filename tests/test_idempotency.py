@@ -0,0 +1,141 @@
+import asyncio
+from datetime import datetime, timedelta
+
+import pytest
+from fastapi import status
+
+from src.database.models import IdempotencyKey
+from src.marketplace.idempotency import IdempotencyStore, purge_expired
+
+class FakeAgent:
+    def __init__(self):
+        self.calls = 0
+
+    async def process_request(self, input_data):
+        self.calls += 1
+        return {"output_text": f"answer {self.calls}", "cost": 1.0}
+
+def get_auth_header(client, username="idemuser"):
+    client.post(
+        "/users/register",
+        json={
+            "username": username,
+            "email": f"{username}@example.com",
+            "password": "testpassword123",
+            "is_developer": True
+        }
+    )
+    response = client.post(
+        "/token",
+        data={"username": username, "password": "testpassword123"}
+    )
+    return {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+@pytest.fixture
+def fake_agent(monkeypatch):
+    import src.main as main
+    agent = FakeAgent()
+    monkeypatch.setitem(main.AVAILABLE_AGENTS, "fake", agent)
+    monkeypatch.setitem(main.AGENT_NAME_TO_KEY, "Fake Agent", "fake")
+    return agent
+
+def create_agent(client, headers):
+    response = client.post(
+        "/agents/create",
+        headers=headers,
+        json={"name": "Fake Agent", "description": "test", "price": 5.0}
+    )
+    return response.json()["id"]
+
+def test_invoke_retry_replays_stored_response(client, test_db, fake_agent):
+    headers = get_auth_header(client)
+    agent_id = create_agent(client, headers)
+    client.post("/tokens/purchase", headers=headers, json={"amount": 10})
+
+    retry_headers = {**headers, "Idempotency-Key": "invoke-1"}
+    first = client.post(f"/agents/invoke/{agent_id}", headers=retry_headers, json={"issue": "x"})
+    second = client.post(f"/agents/invoke/{agent_id}", headers=retry_headers, json={"issue": "x"})
+
+    assert first.status_code == status.HTTP_200_OK
+    assert second.status_code == status.HTTP_200_OK
+    assert second.json() == first.json()
+    assert second.headers["Idempotent-Replayed"] == "true"
+    assert fake_agent.calls == 1
+    # Billed once
+    assert client.get("/users/me", headers=headers).json()["token_balance"] == 9.0
+
+def test_purchase_retry_does_not_rebill(client, test_db):
+    headers = get_auth_header(client)
+    agent_id = create_agent(client, headers)
+    client.post("/tokens/purchase", headers=headers, json={"amount": 10})
+
+    retry_headers = {**headers, "Idempotency-Key": "purchase-1"}
+    body = {"agent_id": agent_id, "purchase_price": 5.0}
+    first = client.post("/agents/purchase", headers=retry_headers, json=body)
+    second = client.post("/agents/purchase", headers=retry_headers, json=body)
+
+    assert first.status_code == status.HTTP_200_OK
+    assert second.status_code == status.HTTP_200_OK
+    assert second.json() == first.json()
+    assert client.get("/users/me", headers=headers).json()["token_balance"] == 5.0
+
+def test_key_reused_with_different_body_is_rejected(client, test_db, fake_agent):
+    headers = get_auth_header(client)
+    agent_id = create_agent(client, headers)
+    client.post("/tokens/purchase", headers=headers, json={"amount": 10})
+
+    retry_headers = {**headers, "Idempotency-Key": "invoke-2"}
+    client.post(f"/agents/invoke/{agent_id}", headers=retry_headers, json={"issue": "x"})
+    response = client.post(f"/agents/invoke/{agent_id}", headers=retry_headers, json={"issue": "y"})
+
+    assert response.status_code == status.HTTP_422_UNPROCESSABLE_ENTITY
+    assert fake_agent.calls == 1
+
+def test_concurrent_retry_waits_for_original(test_db):
+    store = IdempotencyStore()
+    calls = []
+
+    async def handler():
+        calls.append(1)
+        await asyncio.sleep(0.05)
+        return {"result": "done"}
+
+    async def run():
+        return await asyncio.gather(
+            store.run(test_db, 1, "key", "POST /x", {"a": 1}, handler),
+            store.run(test_db, 1, "key", "POST /x", {"a": 1}, handler),
+        )
+
+    original, retry = asyncio.run(run())
+    assert original == {"result": "done"}
+    assert retry.status_code == 200
+    assert retry.body == b'{"result":"done"}'
+    assert len(calls) == 1
+
+def test_server_error_releases_key(test_db):
+    store = IdempotencyStore()
+
+    async def failing():
+        raise RuntimeError("upstream down")
+
+    async def succeeding():
+        return {"ok": True}
+
+    async def run():
+        with pytest.raises(RuntimeError):
+            await store.run(test_db, 1, "key", "POST /x", {}, failing)
+        return await store.run(test_db, 1, "key", "POST /x", {}, succeeding)
+
+    assert asyncio.run(run()) == {"ok": True}
+
+def test_purge_expired(test_db):
+    now = datetime.utcnow()
+    for i, expires_at in enumerate([now - timedelta(hours=1), now + timedelta(hours=1)]):
+        test_db.add(IdempotencyKey(
+            user_id=1, key=f"k{i}", endpoint="POST /x", request_hash="h",
+            status="completed", expires_at=expires_at
+        ))
+    test_db.commit()
+
+    assert purge_expired(test_db) == 1
+    assert [row.key for row in test_db.query(IdempotencyKey).all()] == ["k1"]
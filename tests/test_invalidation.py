@@ -0,0 +1,98 @@
+import json
+import os
+import threading
+import time
+
+import pytest
+
+from src.cache.invalidation import SocketBus, invalidation_bus, publish_after_commit
+from src.database.models import User
+
+def test_socket_bus_delivers_to_other_workers(tmp_path):
+    # Two buses on one directory stand in for two gunicorn workers
+    worker_a = SocketBus(str(tmp_path), poll_interval=0.05)
+    worker_b = SocketBus(str(tmp_path), poll_interval=0.05)
+    received = []
+    delivered = threading.Event()
+    def on_invalidate(key):
+        received.append((key, time.perf_counter()))
+        delivered.set()
+    worker_b.subscribe("principal", on_invalidate)
+    worker_a.start()
+    worker_b.start()
+    try:
+        sent = time.perf_counter()
+        worker_a.publish("principal", 42)
+        assert delivered.wait(timeout=2)
+    finally:
+        worker_a.stop()
+        worker_b.stop()
+
+    key, arrived = received[0]
+    assert key == 42
+    lag = arrived - sent
+    assert lag < 0.5
+    assert worker_b.last_delivery_lag is not None and worker_b.last_delivery_lag < 0.5
+
+def test_publisher_runs_local_callbacks_once(tmp_path):
+    bus = SocketBus(str(tmp_path), poll_interval=0.05)
+    received = []
+    bus.subscribe("catalog", received.append)
+    bus.start()
+    try:
+        bus.publish("catalog", "*")
+        time.sleep(0.2)
+    finally:
+        bus.stop()
+    assert received == ["*"]
+
+def test_dead_worker_sockets_are_removed(tmp_path):
+    worker_a = SocketBus(str(tmp_path))
+    dead = SocketBus(str(tmp_path))
+    dead.start()
+    dead._stopping.set()
+    dead._thread.join()
+    dead._receiver.close()  # process died without unlinking its socket
+
+    worker_a.publish("catalog")
+    assert not os.path.exists(dead.path)
+
+@pytest.fixture
+def bus_messages():
+    """Keys published on the app's bus under "test-commit" during the test."""
+    received = []
+    invalidation_bus.subscribe("test-commit", received.append)
+    yield received
+    invalidation_bus.unsubscribe("test-commit", received.append)
+
+def test_publish_waits_for_commit(test_db, bus_messages):
+    received = bus_messages
+    test_db.add(User(username="bus", email="bus@example.com", hashed_password="x"))
+
+    publish_after_commit(test_db, "test-commit", 1)
+    test_db.rollback()
+    assert received == []
+
+    publish_after_commit(test_db, "test-commit", 2)
+    assert received == []
+    test_db.commit()
+    assert received == [2]
+
+def test_unsubscribed_callbacks_stop_receiving(tmp_path):
+    bus = SocketBus(str(tmp_path))
+    received = []
+    bus.subscribe("catalog", received.append)
+    bus.publish("catalog", 1)
+    bus.unsubscribe("catalog", received.append)
+    bus.publish("catalog", 2)
+    assert received == [1]
+
+def test_remote_message_invalidates_catalog(client, test_db):
+    from src.marketplace.catalog import agent_catalog
+    agent_catalog.snapshot(test_db)
+    assert agent_catalog._snapshot is not None
+
+    invalidation_bus._receive(json.dumps({
+        "ns": "catalog", "key": None, "origin": "other-worker", "sent_at": time.time()
+    }))
+    assert agent_catalog._snapshot is None
@@ -0,0 +1,131 @@
+import asyncio
+import json
+
+import pytest
+from sqlalchemy import create_engine, event, text
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from src.database.models import Base, AgentInvocation
+from src.database.invocation_writer import InvocationWriter
+
+@pytest.fixture
+def session_factory():
+    engine = create_engine(
+        "sqlite:///:memory:",
+        connect_args={"check_same_thread": False},
+        poolclass=StaticPool,
+    )
+    Base.metadata.create_all(bind=engine)
+    factory = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    factory.inserts = []
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def count_inserts(conn, cursor, statement, parameters, context, executemany):
+        if statement.startswith("INSERT INTO agent_invocations"):
+            factory.inserts.append(len(parameters) if executemany else 1)
+
+    yield factory
+    Base.metadata.drop_all(bind=engine)
+
+def stored_rows(session_factory):
+    db = session_factory()
+    try:
+        return db.query(AgentInvocation).order_by(AgentInvocation.id).all()
+    finally:
+        db.close()
+
+def test_async_mode_flushes_in_batches(session_factory):
+    writer = InvocationWriter(session_factory, mode="async", batch_size=10, flush_interval=1.0)
+
+    async def run():
+        await writer.start()
+        for i in range(25):
+            await writer.submit(user_id=1, agent_id=2, input_data={"n": i}, output_data={"ok": True}, tokens_used=i)
+        await writer.stop()
+
+    asyncio.run(run())
+
+    rows = stored_rows(session_factory)
+    assert len(rows) == 25
+    assert json.loads(rows[3].input_data) == {"n": 3}
+    assert rows[3].tokens_used == 3
+    # 25 records with a batch size of 10 become three multi-row inserts
+    assert session_factory.inserts == [10, 10, 5]
+
+def test_time_trigger_flushes_partial_batch(session_factory):
+    writer = InvocationWriter(session_factory, mode="async", batch_size=100, flush_interval=0.01)
+
+    async def run():
+        await writer.start()
+        await writer.submit(user_id=1, agent_id=2, input_data={}, output_data={})
+        await asyncio.sleep(0.2)
+        flushed = len(stored_rows(session_factory))
+        await writer.stop()
+        return flushed
+
+    assert asyncio.run(run()) == 1
+
+def test_group_mode_waits_for_commit(session_factory):
+    writer = InvocationWriter(session_factory, mode="group", batch_size=100, flush_interval=0.05)
+
+    async def run():
+        await writer.start()
+        await asyncio.gather(*[
+            writer.submit(user_id=1, agent_id=2, input_data={"n": i}, output_data={})
+            for i in range(5)
+        ])
+        committed = len(stored_rows(session_factory))
+        await writer.stop()
+        return committed
+
+    assert asyncio.run(run()) == 5
+    assert session_factory.inserts == [5]
+
+def test_group_mode_fails_only_the_dropped_records(session_factory):
+    db = session_factory()
+    db.execute(text(
+        "CREATE TRIGGER no_negative_tokens BEFORE INSERT ON agent_invocations "
+        "WHEN NEW.tokens_used < 0 BEGIN SELECT RAISE(ABORT, 'negative tokens_used'); END"
+    ))
+    db.commit()
+    db.close()
+    writer = InvocationWriter(session_factory, mode="group", batch_size=100, flush_interval=0.05)
+
+    async def run():
+        await writer.start()
+        results = await asyncio.gather(*[
+            writer.submit(user_id=1, agent_id=2, input_data={"n": i}, output_data={}, tokens_used=-1 if i == 2 else i)
+            for i in range(4)
+        ], return_exceptions=True)
+        await writer.stop()
+        return results
+
+    results = asyncio.run(run())
+    assert [result is None for result in results] == [True, True, False, True]
+    assert "negative tokens_used" in str(results[2])
+    assert [json.loads(row.input_data)["n"] for row in stored_rows(session_factory)] == [0, 1, 3]
+
+def test_sync_mode_writes_inline(session_factory):
+    writer = InvocationWriter(session_factory, mode="sync")
+
+    async def run():
+        await writer.start()
+        await writer.submit(user_id=1, agent_id=2, input_data={"a": 1}, output_data={"b": 2})
+        assert not writer.running
+
+    asyncio.run(run())
+    assert len(stored_rows(session_factory)) == 1
+
+def test_unknown_mode_rejected(session_factory):
+    with pytest.raises(ValueError):
+        InvocationWriter(session_factory, mode="eventually")
+
+def test_client_background_sessions_use_the_test_database(client, test_db):
+    from src.main import app, invocation_writer
+    for factory in (app.state.session_factory, invocation_writer.session_factory):
+        db = factory()
+        try:
+            assert db.get_bind() is test_db.get_bind()
+        finally:
+            db.close()
@@ -0,0 +1,98 @@
+import io
+import json
+import logging
+
+import pytest
+
+from src.observability.logs import REQUEST_ID_HEADER, _request_id, configure_logging, payload_shape, redact, stop_logging
+from src.observability.tracing import tracer
+
+@pytest.fixture
+def log_lines(monkeypatch):
+    """Log JSON into a buffer; returns a function parsing the lines written so far."""
+    stream = io.StringIO()
+
+    def configure(**kwargs):
+        configure_logging(stream=stream, **kwargs)
+
+    def read():
+        stop_logging()
+        return [json.loads(line) for line in stream.getvalue().splitlines()]
+
+    yield configure, read
+    stop_logging()
+
+def test_redact_masks_secrets_and_truncates():
+    payload = {
+        "code": "x" * 1000,
+        "Password": "hunter2",
+        "nested": {"api_key": "sk-123", "items": list(range(30))},
+    }
+    redacted = redact(payload, max_length=10)
+    assert redacted["code"] == "xxxxxxxxxx... (1000 chars)"
+    assert redacted["Password"] == "[redacted]"
+    assert redacted["nested"]["api_key"] == "[redacted]"
+    assert redacted["nested"]["items"][-1] == "... 10 more"
+    # The caller's payload is left alone
+    assert payload["Password"] == "hunter2"
+
+def test_payload_shape_drops_content():
+    payload = {"resume_text": "Jane Doe, 10 years of Python" * 10, "options": {"tone": "formal", "sections": [1, 2]}, "n": 3}
+    assert payload_shape(payload) == {
+        "resume_text": "str[280]",
+        "options": {"tone": "str[6]", "sections": "list[2]"},
+        "n": "int",
+    }
+
+def test_json_lines_carry_request_and_trace_ids(log_lines, monkeypatch):
+    configure, read = log_lines
+    configure(max_field_length=8)
+    monkeypatch.setattr(tracer, "exporter", type("Discard", (), {"export": lambda self, span: None})())
+    monkeypatch.setattr(tracer, "enabled", True)
+
+    token = _request_id.set("req-1")
+    try:
+        with tracer.span("request") as span:
+            logging.getLogger("src.test").info(
+                "Invoked %s", "agent", extra={"event": "agent.invoked", "input": {"text": "a" * 100, "token": "t"}}
+            )
+    finally:
+        _request_id.reset(token)
+
+    [line] = [line for line in read() if line["logger"] == "src.test"]
+    assert line["message"] == "Invoked agent"
+    assert line["level"] == "INFO"
+    assert line["request_id"] == "req-1"
+    assert line["trace_id"] == span.context.trace_id
+    assert line["span_id"] == span.context.span_id
+    assert line["input"] == {"text": "aaaaaaaa... (100 chars)", "token": "[redacted]"}
+
+def test_exceptions_include_the_traceback(log_lines):
+    configure, read = log_lines
+    configure()
+    try:
+        raise ValueError("boom")
+    except ValueError:
+        logging.getLogger("src.test").exception("Agent failed")
+    [line] = [line for line in read() if line["logger"] == "src.test"]
+    assert "ValueError: boom" in line["exception"]
+
+def test_module_levels_and_sampling(log_lines):
+    configure, read = log_lines
+    configure(module_levels={"src.quiet": "WARNING"}, sample_rates={"noisy": 0.0, "kept": 1.0})
+    logging.getLogger("src.quiet").info("dropped by level")
+    logging.getLogger("src.quiet").warning("kept by level")
+    logger = logging.getLogger("src.test")
+    for _ in range(10):
+        logger.info("sampled out", extra={"event": "noisy"})
+    logger.info("sampled in", extra={"event": "kept"})
+    logger.warning("never sampled", extra={"event": "noisy"})
+
+    messages = [line["message"] for line in read() if line["logger"].startswith("src.")]
+    assert messages == ["kept by level", "sampled in", "never sampled"]
+
+def test_request_id_header(client):
+    response = client.get("/agents", headers={REQUEST_ID_HEADER: "abc-123"})
+    assert response.headers[REQUEST_ID_HEADER] == "abc-123"
+    generated = client.get("/agents", headers={REQUEST_ID_HEADER: "bad id\n"}).headers[REQUEST_ID_HEADER]
+    assert generated != "bad id\n" and len(generated) == 32
@@ -0,0 +1,100 @@
+import asyncio
+import os
+import subprocess
+import sys
+
+from fastapi import status
+from openai import AsyncOpenAI
+from prometheus_client import REGISTRY, CollectorRegistry
+from prometheus_client.multiprocess import MultiProcessCollector
+
+from src.observability.metrics import observe_completion
+
+MESSAGES = [{"role": "user", "content": "Check my resume"}]
+
+def sample(name, **labels):
+    return REGISTRY.get_sample_value(name, labels) or 0.0
+
+def test_request_latency_by_route_template(client):
+    labels = {"method": "GET", "route": "/agents/{agent_id}", "status": "401"}
+    before = sample("http_request_duration_seconds_count", **labels)
+    client.get("/agents/1")
+    client.get("/agents/2")
+    assert sample("http_request_duration_seconds_count", **labels) == before + 2
+
+    unmatched = {"method": "GET", "route": "unmatched", "status": "404"}
+    before = sample("http_request_duration_seconds_count", **unmatched)
+    client.get("/no/such/path")
+    assert sample("http_request_duration_seconds_count", **unmatched) == before + 1
+
+def test_metrics_endpoint_exposes_text_format(client):
+    response = client.get("/metrics")
+    assert response.status_code == status.HTTP_200_OK
+    assert response.headers["content-type"].startswith("text/plain")
+    assert "# TYPE http_request_duration_seconds histogram" in response.text
+    assert "db_statement_duration_seconds" in response.text
+
+def test_llm_tokens_and_cost_by_agent_and_model(fake_openai):
+    fake_openai.configure(completion_tokens=20, prompt_tokens=10)
+    client = AsyncOpenAI(api_key="fake", base_url=fake_openai.base_url, max_retries=0)
+    labels = {"agent": "Test Agent", "model": "gpt-4"}
+    before = (
+        sample("llm_tokens_total", direction="output", **labels),
+        sample("llm_cost_total", **labels),
+        sample("llm_request_duration_seconds_count", outcome="ok", **labels),
+    )
+
+    asyncio.run(observe_completion(
+        "Test Agent", client.chat.completions.create, lambda i, o: (i + o) * 0.5,
+        model="gpt-4", messages=MESSAGES,
+    ))
+
+    assert sample("llm_tokens_total", direction="output", **labels) == before[0] + 20
+    assert sample("llm_cost_total", **labels) == before[1] + 15
+    assert sample("llm_request_duration_seconds_count", outcome="ok", **labels) == before[2] + 1
+
+def test_streamed_completion_records_time_to_first_token(fake_openai):
+    client = AsyncOpenAI(api_key="fake", base_url=fake_openai.base_url, max_retries=0)
+    labels = {"agent": "Stream Agent", "model": "gpt-4"}
+    before = sample("llm_time_to_first_token_seconds_count", **labels)
+
+    async def run():
+        stream = await observe_completion(
+            "Stream Agent", client.chat.completions.create, model="gpt-4", messages=MESSAGES, stream=True
+        )
+        return [chunk async for chunk in stream]
+
+    assert asyncio.run(run())
+    assert sample("llm_time_to_first_token_seconds_count", **labels) == before + 1
+
+def test_failed_completion_is_labelled_with_status(fake_openai):
+    fake_openai.configure(rate_429=1.0)
+    client = AsyncOpenAI(api_key="fake", base_url=fake_openai.base_url, max_retries=0)
+    labels = {"agent": "Limited Agent", "model": "gpt-4", "outcome": "429"}
+    try:
+        asyncio.run(observe_completion("Limited Agent", client.chat.completions.create, model="gpt-4", messages=MESSAGES))
+    except Exception:
+        pass
+    assert sample("llm_request_duration_seconds_count", **labels) == 1
+
+def test_multiprocess_mode_aggregates_workers(tmp_path):
+    # Two "workers" record into the shared directory; the scrape sums them
+    script = (
+        "from src.observability.metrics import HTTP_REQUEST_DURATION\n"
+        "HTTP_REQUEST_DURATION.labels('GET', '/agents', '200').observe(0.1)\n"
+    )
+    env = {**os.environ, "PROMETHEUS_MULTIPROC_DIR": str(tmp_path)}
+    for _ in range(2):
+        subprocess.run([sys.executable, "-c", script], env=env, check=True)
+
+    registry = CollectorRegistry()
+    MultiProcessCollector(registry, path=str(tmp_path))
+    labels = {"method": "GET", "route": "/agents", "status": "200"}
+    assert registry.get_sample_value("http_request_duration_seconds_count", labels) == 2
+
+def test_multiprocess_dir_created_on_import(tmp_path):
+    # Scripts and alembic import the module without gunicorn creating the directory
+    directory = tmp_path / "missing"
+    env = {**os.environ, "PROMETHEUS_MULTIPROC_DIR": str(directory)}
+    subprocess.run([sys.executable, "-c", "import src.observability.metrics"], env=env, check=True)
+    assert directory.is_dir()
@@ -0,0 +1,88 @@
+from datetime import datetime
+
+import numpy as np
+from fastapi import status
+
+from src.database.models import Agent, AgentInvocation, AgentPurchase, DeveloperPayout, User
+from src.marketplace.payouts import PayoutEngine, period_days, period_start
+
+def _seed(db):
+    developers = [User(username=f"dev{i}", email=f"dev{i}@example.com", hashed_password="x", is_developer=True) for i in range(2)]
+    db.add_all(developers)
+    db.commit()
+    agents = [Agent(name=f"Agent {i}", description="d", developer_id=developers[i % 2].id, price=5.0) for i in range(3)]
+    db.add_all(agents)
+    db.commit()
+    return developers, agents
+
+def _purchase(db, agent, at, price):
+    db.add(AgentPurchase(user_id=agent.developer_id, agent_id=agent.id, purchase_price=price, purchase_date=at))
+
+def _invoke(db, agent, at, cost):
+    db.add(AgentInvocation(user_id=agent.developer_id, agent_id=agent.id, input_data="{}", output_data="{}", cost=cost, created_at=at))
+
+def test_period_starts():
+    days = np.array([(datetime(2026, 10, 19) - datetime(1970, 1, 1)).days], dtype=np.int64)
+    assert period_days(days, "day")[0] == days[0]
+    assert period_start(datetime(2026, 10, 19, 15), "week") == datetime(2026, 10, 19)
+    assert period_start(datetime(2026, 10, 25, 23), "week") == datetime(2026, 10, 19)
+    assert period_start(datetime(2026, 10, 19, 15), "month") == datetime(2026, 10, 1)
+
+def test_compute_groups_by_developer_and_period(test_db):
+    developers, agents = _seed(test_db)
+    _purchase(test_db, agents[0], datetime(2026, 8, 3), 5.0)
+    _purchase(test_db, agents[2], datetime(2026, 8, 30), 7.0)
+    _invoke(test_db, agents[0], datetime(2026, 8, 31, 23, 59), 0.5)
+    _invoke(test_db, agents[1], datetime(2026, 9, 1), 1.25)
+    _invoke(test_db, agents[2], datetime(2026, 9, 15), 0.25)
+    test_db.commit()
+
+    # A tiny chunk size exercises the cross-chunk merge
+    totals = PayoutEngine(period="month", chunk_size=1).compute(test_db, datetime(2026, 8, 1), datetime(2026, 10, 1))
+    by_key = {(total.developer_id, total.period_start): total for total in totals}
+    august = by_key[(developers[0].id, datetime(2026, 8, 1))]
+    assert (august.purchases, august.purchase_revenue, august.invocations, august.invocation_revenue) == (2, 12.0, 1, 0.5)
+    assert august.amount == 12.5
+    assert by_key[(developers[0].id, datetime(2026, 9, 1))].invocation_revenue == 0.25
+    assert by_key[(developers[1].id, datetime(2026, 9, 1))].invocations == 1
+    assert len(totals) == 3
+
+def test_run_is_idempotent_and_skips_open_periods(test_db):
+    developers, agents = _seed(test_db)
+    _purchase(test_db, agents[0], datetime(2026, 9, 10), 5.0)
+    _invoke(test_db, agents[0], datetime(2026, 10, 2), 3.0)
+    test_db.commit()
+    engine = PayoutEngine(period="month")
+
+    engine.run(test_db, until=datetime(2026, 10, 19))
+    engine.run(test_db, until=datetime(2026, 10, 19))
+    payouts = test_db.query(DeveloperPayout).all()
+    # October hasn't closed yet
+    assert [(payout.period_start, payout.amount) for payout in payouts] == [(datetime(2026, 9, 1), 5.0)]
+    assert payouts[0].period_end == datetime(2026, 10, 1)
+
+    # Late rows update pending payouts; paid ones stay as they were paid
+    _purchase(test_db, agents[0], datetime(2026, 9, 20), 2.0)
+    test_db.commit()
+    engine.run(test_db, until=datetime(2026, 10, 19))
+    assert test_db.query(DeveloperPayout).one().amount == 7.0
+    payouts[0].status = "paid"
+    _purchase(test_db, agents[0], datetime(2026, 9, 21), 2.0)
+    test_db.commit()
+    engine.run(test_db, until=datetime(2026, 10, 19))
+    assert test_db.query(DeveloperPayout).one().amount == 7.0
+
+def test_list_developer_payouts(client, test_db):
+    client.post("/users/register", json={"username": "paydev", "email": "paydev@example.com", "password": "testpassword123", "is_developer": True})
+    token = client.post("/token", data={"username": "paydev", "password": "testpassword123"}).json()["access_token"]
+    headers = {"Authorization": f"Bearer {token}"}
+    agent_id = client.post("/agents/create", headers=headers, json={"name": "Paid", "description": "d", "price": 4.0}).json()["id"]
+    _purchase(test_db, test_db.get(Agent, agent_id), datetime(2026, 9, 10), 4.0)
+    test_db.commit()
+    PayoutEngine().run(test_db, until=datetime(2026, 10, 19))
+
+    response = client.get("/developers/me/payouts", headers=headers)
+    assert response.status_code == status.HTTP_200_OK
+    assert [(payout["period_start"], payout["amount"], payout["status"]) for payout in response.json()] == [
+        ("2026-09-01T00:00:00", 4.0, "pending")
+    ]
@@ -0,0 +1,85 @@
+from fastapi import status
+from sqlalchemy import event
+
+from src.database.models import AgentPopularity
+from src.marketplace.popularity import PopularityTracker
+
+HOUR = 3600
+
+class Clock:
+    def __init__(self):
+        self.now = 1_800_000_000.0
+
+    def __call__(self):
+        return self.now
+
+def test_scores_decay_by_half_life(test_db):
+    clock = Clock()
+    tracker = PopularityTracker(popular_half_life=168 * HOUR, trending_half_life=24 * HOUR, clock=clock)
+    for _ in range(4):
+        tracker.record(1, "invoke")
+    tracker.record(2, "purchase")
+    tracker.checkpoint(test_db)
+    assert tracker.ranking("popular") == {1: 4.0, 2: 5.0}
+
+    clock.now += 24 * HOUR
+    tracker.record(1, "invoke")
+    tracker.checkpoint(test_db)
+    assert abs(tracker.ranking("trending")[1] - 3.0) < 1e-9
+    assert abs(tracker.ranking("trending")[2] - 2.5) < 1e-9
+    assert tracker.order([2, 1, 3], "trending") == [1, 2, 3]
+    assert abs(tracker.ranking("popular")[2] - 5 * 2 ** (-1 / 7)) < 1e-9
+
+    row = test_db.get(AgentPopularity, 1)
+    assert (row.invocations, row.purchases) == (5, 0)
+
+def test_checkpoints_merge_workers(test_db):
+    clock = Clock()
+    worker_a = PopularityTracker(168 * HOUR, 24 * HOUR, clock=clock)
+    worker_b = PopularityTracker(168 * HOUR, 24 * HOUR, clock=clock)
+    worker_a.record(1, "invoke")
+    worker_b.record(1, "invoke")
+    worker_b.record(2, "invoke")
+    worker_a.checkpoint(test_db)
+    worker_b.checkpoint(test_db)
+    worker_a.checkpoint(test_db)
+    assert worker_a.ranking("popular") == worker_b.ranking("popular") == {1: 2.0, 2: 1.0}
+
+def test_sorted_listing_never_reads_invocations(client, test_db):
+    from src.main import popularity
+    developer = {"username": "popdev", "email": "popdev@example.com", "password": "testpassword123", "is_developer": True}
+    client.post("/users/register", json=developer)
+    token = client.post("/token", data={"username": "popdev", "password": "testpassword123"}).json()["access_token"]
+    headers = {"Authorization": f"Bearer {token}"}
+    ids = [
+        client.post("/agents/create", headers=headers, json={"name": f"Agent {i}", "description": "d", "price": 1.0}).json()["id"]
+        for i in range(3)
+    ]
+    popularity.record(ids[2], "purchase")
+    popularity.record(ids[1], "invoke")
+    popularity.checkpoint(test_db)
+
+    statements = []
+    def record(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+    event.listen(test_db.get_bind(), "before_cursor_execute", record)
+    try:
+        response = client.get("/agents", params={"sort": "popular"}, headers=headers)
+    finally:
+        event.remove(test_db.get_bind(), "before_cursor_execute", record)
+
+    assert response.status_code == status.HTTP_200_OK
+    assert [agent["id"] for agent in response.json()] == [ids[2], ids[1], ids[0]]
+    assert not any("agent_invocations" in statement for statement in statements)
+
+    etag = response.headers["ETag"]
+    assert client.get("/agents", params={"sort": "popular"}, headers={**headers, "If-None-Match": etag}).status_code == status.HTTP_304_NOT_MODIFIED
+
+    # A reordering invalidates the tag, whichever worker served it
+    popularity.record(ids[0], "purchase")
+    popularity.record(ids[0], "purchase")
+    popularity.checkpoint(test_db)
+    response = client.get("/agents", params={"sort": "popular"}, headers={**headers, "If-None-Match": etag})
+    assert response.status_code == status.HTTP_200_OK
+    assert response.json()[0]["id"] == ids[0]
+    assert client.get("/agents", params={"sort": "bogus"}, headers=headers).status_code == status.HTTP_422_UNPROCESSABLE_ENTITY
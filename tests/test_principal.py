@@ -0,0 +1,74 @@
+from fastapi import status
+from jose import jwt
+from sqlalchemy import event
+
+from src.auth.principal import principal_cache
+from src.cache.ttl import TTLCache
+from src.config import get_settings
+from src.database.models import User
+
+def register_and_login(client, username="principal", is_developer=False):
+    client.post(
+        "/users/register",
+        json={
+            "username": username,
+            "email": f"{username}@example.com",
+            "password": "testpassword123",
+            "is_developer": is_developer
+        }
+    )
+    response = client.post(
+        "/token",
+        data={"username": username, "password": "testpassword123"}
+    )
+    return response.json()["access_token"]
+
+def test_token_carries_user_id_and_role(client, test_db):
+    token = register_and_login(client, is_developer=True)
+    settings = get_settings()
+    claims = jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
+    user = test_db.query(User).filter(User.username == "principal").first()
+    assert claims["sub"] == "principal"
+    assert claims["uid"] == user.id
+    assert claims["role"] == "developer"
+
+def test_cached_principal_skips_user_query(client, test_db):
+    headers = {"Authorization": f"Bearer {register_and_login(client)}"}
+    client.get("/agents", headers=headers)
+
+    statements = []
+    def record(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+    event.listen(test_db.get_bind(), "before_cursor_execute", record)
+    try:
+        response = client.get("/agents", headers=headers)
+    finally:
+        event.remove(test_db.get_bind(), "before_cursor_execute", record)
+
+    assert response.status_code == status.HTTP_200_OK
+    assert not any("FROM users" in statement for statement in statements)
+
+def test_deactivation_invalidates_cached_principal(client, test_db):
+    headers = {"Authorization": f"Bearer {register_and_login(client)}"}
+    assert client.get("/agents", headers=headers).status_code == status.HTTP_200_OK
+    user = test_db.query(User).filter(User.username == "principal").first()
+    assert user.id in principal_cache
+
+    user.is_active = False
+    test_db.commit()
+
+    assert user.id not in principal_cache
+    assert client.get("/agents", headers=headers).status_code == status.HTTP_400_BAD_REQUEST
+
+def test_ttl_cache_expires_and_evicts():
+    now = [0.0]
+    cache = TTLCache(maxsize=2, ttl=10, clock=lambda: now[0])
+    cache.set("a", 1)
+    cache.set("b", 2)
+    cache.get("a")
+    cache.set("c", 3)
+    # "b" was least recently used
+    assert cache.get("b") is None
+    assert cache.get("a") == 1
+    now[0] = 11
+    assert cache.get("a") is None
@@ -0,0 +1,75 @@
+import asyncio
+import threading
+import time
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from src.observability.logs import REQUEST_ID_HEADER, RequestContext
+from src.observability.profiling import PROFILE_HEADER, Profile, Profiler, Sampler
+
+def spin(seconds):
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        pass
+
+@pytest.fixture
+def profiled_app(tmp_path):
+    profiler = Profiler(str(tmp_path), token="s3cret", interval=0.001)
+    app = FastAPI()
+
+    @app.get("/busy")
+    async def busy():
+        spin(0.05)
+        return {"ok": True}
+
+    app.middleware("http")(profiler)
+    app.middleware("http")(RequestContext())
+    return TestClient(app), profiler
+
+def test_sampler_records_busy_coroutine_stacks():
+    sampler = Sampler(interval=0.001)
+
+    async def handler():
+        profile = Profile("req", threading.get_ident())
+        sampler.add(profile)
+        # Samples taken while the loop waits are not the request's
+        await asyncio.sleep(0.05)
+        idle = sum(profile.samples.values())
+        spin(0.05)
+        sampler.remove(profile)
+        return profile, idle
+
+    profile, idle = asyncio.run(handler())
+    assert idle == 0
+    assert profile.samples
+    stack, _ = profile.samples.most_common(1)[0]
+    frames = stack.split(";")
+    assert frames[-1].startswith("spin (")
+    assert any(frame.startswith("handler (") for frame in frames)
+    line = profile.folded().splitlines()[0]
+    assert line.rsplit(" ", 1)[1].isdigit()
+
+def test_token_holders_get_a_profile_named_after_the_request(profiled_app, tmp_path):
+    client, _ = profiled_app
+    response = client.get("/busy", headers={PROFILE_HEADER: "s3cret", REQUEST_ID_HEADER: "req-42"})
+    assert response.headers[PROFILE_HEADER] == "req-42.folded"
+    assert "spin (" in (tmp_path / "req-42.folded").read_text()
+
+def test_requests_without_the_token_are_not_profiled(profiled_app, tmp_path):
+    client, _ = profiled_app
+    response = client.get("/busy", headers={PROFILE_HEADER: "guess"})
+    assert PROFILE_HEADER not in response.headers
+    assert not list(tmp_path.iterdir())
+
+def test_sampled_requests_are_profiled_silently(profiled_app, tmp_path):
+    client, profiler = profiled_app
+    profiler.token, profiler.sample_rate = "", 1.0
+    response = client.get("/busy")
+    assert PROFILE_HEADER not in response.headers
+    assert (tmp_path / f"{response.headers[REQUEST_ID_HEADER]}.folded").exists()
+
+def test_disabled_without_token_or_rate():
+    assert not Profiler().enabled
+    assert Profiler(sample_rate=0.01).enabled
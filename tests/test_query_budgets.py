@@ -0,0 +1,76 @@
+import pytest
+from fastapi import status
+
+from src.database.models import AgentInvocation, AgentPurchase, User
+from src.search.history import history_index
+
+# Statements each hot route may run once caches are warm. Raise a budget
+# only with a reason; an N+1 shows up here as a count that grows with rows.
+BUDGETS = {
+    "/agents": 0,
+    "/agents/{agent_id}": 0,
+    "/agents/search?q=budget": 0,
+    "/users/me": 1,
+    "/users/me/invocations": 1,
+    "/users/me/invocations/search?q=budget": 2,
+}
+
+def get_auth_header(client, username="budget"):
+    client.post(
+        "/users/register",
+        json={
+            "username": username,
+            "email": f"{username}@example.com",
+            "password": "testpassword123",
+            "is_developer": True
+        }
+    )
+    response = client.post(
+        "/token",
+        data={"username": username, "password": "testpassword123"}
+    )
+    return {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+@pytest.fixture
+def seeded(client, test_db):
+    history_index.ensure_schema(test_db)
+    headers = get_auth_header(client)
+    user = test_db.query(User).filter(User.username == "budget").one()
+    agent_ids = []
+    for i in range(4):
+        response = client.post(
+            "/agents/create",
+            headers=headers,
+            json={"name": f"Budget Agent {i}", "description": "Query budget test agent", "price": 5.0}
+        )
+        agent_ids.append(response.json()["id"])
+    for agent_id in agent_ids:
+        purchase = AgentPurchase(user_id=user.id, agent_id=agent_id, purchase_price=5.0)
+        test_db.add(purchase)
+        test_db.flush()
+        for _ in range(3):
+            test_db.add(AgentInvocation(
+                user_id=user.id, agent_id=agent_id, purchase_id=purchase.id,
+                input_data='{"input_text": "budget"}', output_data='{"output_text": "ok"}'
+            ))
+    test_db.commit()
+    return headers, agent_ids
+
+@pytest.mark.parametrize("route", BUDGETS)
+def test_hot_route_query_budget(client, seeded, query_budget, route):
+    headers, agent_ids = seeded
+    path = route.format(agent_id=agent_ids[0])
+    # Warm the principal, catalog and purchased-set caches
+    assert client.get(path, headers=headers).status_code == status.HTTP_200_OK
+
+    with query_budget(max_queries=BUDGETS[route]):
+        response = client.get(path, headers=headers)
+    assert response.status_code == status.HTTP_200_OK
+
+def test_budget_failure_lists_statements(client, seeded, query_budget):
+    headers, _ = seeded
+    with pytest.raises(pytest.fail.Exception) as failure:
+        with query_budget(max_queries=0):
+            client.get("/users/me", headers=headers)
+    assert "1 queries, budget is 0" in str(failure.value)
+    assert "FROM users" in str(failure.value)
@@ -0,0 +1,95 @@
+import asyncio
+
+from fastapi import status
+
+from src.middleware.rate_limit import MemoryBucketStore, SQLiteBucketStore
+
+def take_many(store, key, count, capacity=3, rate=1.0):
+    async def run():
+        return [await store.take(key, capacity, rate) for _ in range(count)]
+    return asyncio.run(run())
+
+def test_memory_bucket_refills_over_time():
+    now = [0.0]
+    store = MemoryBucketStore(clock=lambda: now[0])
+    results = take_many(store, "k", 4)
+    assert [allowed for allowed, _, _ in results] == [True, True, True, False]
+    assert results[-1][2] == 1.0  # one token short at one token per second
+
+    now[0] = 1.0
+    assert take_many(store, "k", 1)[0][0] is True
+
+def test_sqlite_buckets_shared_between_workers(tmp_path):
+    path = str(tmp_path / "buckets.db")
+    now = [1000.0]
+    # Two stores on one file stand in for two gunicorn workers
+    worker_a = SQLiteBucketStore(path, clock=lambda: now[0])
+    worker_b = SQLiteBucketStore(path, clock=lambda: now[0])
+
+    assert all(allowed for allowed, _, _ in take_many(worker_a, "user:1", 2))
+    allowed, remaining, _ = take_many(worker_b, "user:1", 1)[0]
+    assert allowed and remaining == 0
+    allowed, _, retry_after = take_many(worker_a, "user:1", 1)[0]
+    assert not allowed and retry_after > 0
+
+def test_login_budget_returns_retry_after(client, test_db):
+    from src.main import rate_limiter
+    limit = rate_limiter.rule_for("/token").per_minute
+
+    responses = [
+        client.post("/token", data={"username": "nobody", "password": "wrong"})
+        for _ in range(limit + 1)
+    ]
+    assert all(r.status_code == status.HTTP_401_UNAUTHORIZED for r in responses[:limit])
+    rejected = responses[-1]
+    assert rejected.status_code == status.HTTP_429_TOO_MANY_REQUESTS
+    assert int(rejected.headers["Retry-After"]) >= 1
+
+    # Other routes draw from a separate budget
+    response = client.post("/users/register", json={
+        "username": "ratelimited",
+        "email": "ratelimited@example.com",
+        "password": "testpassword123"
+    })
+    assert response.status_code == status.HTTP_200_OK
+
+def test_made_up_api_keys_share_the_login_budget(client):
+    from src.main import rate_limiter
+    limit = rate_limiter.rule_for("/token").per_minute
+
+    responses = [
+        client.post(
+            "/token",
+            data={"username": "nobody", "password": "wrong"},
+            headers={"X-API-Key": f"aam_{i:012x}_x"},
+        )
+        for i in range(limit + 5)
+    ]
+    assert all(r.status_code == status.HTTP_401_UNAUTHORIZED for r in responses[:limit])
+    assert all(r.status_code == status.HTTP_429_TOO_MANY_REQUESTS for r in responses[limit:])
+
+def test_only_verified_api_keys_get_their_own_bucket(client, test_db):
+    from starlette.requests import Request
+    from src.auth.api_keys import authenticate_api_key, create_api_key
+    from src.database.models import User
+    from src.middleware.rate_limit import client_identity
+
+    def identity(api_key, by_ip=False):
+        return client_identity(Request({
+            "type": "http", "headers": [(b"x-api-key", api_key.encode())], "client": ("10.0.0.1", 1234),
+        }), by_ip)
+
+    client.post("/users/register", json={
+        "username": "keyed", "email": "keyed@example.com", "password": "testpassword123"
+    })
+    user = test_db.query(User).filter(User.username == "keyed").one()
+    raw_key, record = create_api_key(test_db, user.id, "ci")
+    prefix = raw_key.split("_")[1]
+
+    # Unknown until auth has checked it, then keyed by prefix
+    assert identity(raw_key) == "ip:10.0.0.1"
+    assert authenticate_api_key(test_db, raw_key) is not None
+    assert identity(raw_key) == f"key:{prefix}"
+    # A wrong secret for a real prefix doesn't borrow the key's bucket
+    assert identity(f"aam_{prefix}_wrong") == "ip:10.0.0.1"
+    assert identity(raw_key, by_ip=True) == "ip:10.0.0.1"
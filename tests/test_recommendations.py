@@ -0,0 +1,85 @@
+import random
+
+from fastapi import status
+
+from src.database.models import AgentPurchase
+from src.marketplace.recommendations import CoPurchaseIndex
+
+def add_purchases(test_db, purchases):
+    test_db.add_all([
+        AgentPurchase(user_id=user_id, agent_id=agent_id, purchase_price=1.0)
+        for user_id, agent_id in purchases
+    ])
+    test_db.commit()
+
+def test_rebuild_counts_co_purchases(test_db):
+    add_purchases(test_db, [(1, 10), (1, 20), (1, 30), (2, 10), (2, 20), (3, 10), (3, 40)])
+    index = CoPurchaseIndex(k=2)
+    index.rebuild(test_db)
+    assert index.neighbours(10) == [(20, 2), (30, 1)]
+    assert index.neighbours(40) == [(10, 1)]
+    assert index.neighbours(99) == []
+
+def test_incremental_updates_match_rebuild(test_db):
+    rng = random.Random(7)
+    owned = {}
+    purchases = []
+    incremental = CoPurchaseIndex(k=3)
+    for _ in range(300):
+        user_id, agent_id = rng.randint(1, 40), rng.randint(1, 25)
+        if agent_id in owned.setdefault(user_id, set()):
+            continue
+        incremental.add_purchase(agent_id, owned[user_id])
+        owned[user_id].add(agent_id)
+        purchases.append((user_id, agent_id))
+    add_purchases(test_db, purchases)
+
+    rebuilt = CoPurchaseIndex(k=3)
+    rebuilt.rebuild(test_db)
+    for agent_id in range(1, 26):
+        assert incremental.neighbours(agent_id) == rebuilt.neighbours(agent_id)
+
+def test_purchases_during_a_rebuild_are_not_lost(test_db, monkeypatch):
+    add_purchases(test_db, [(1, 10), (1, 20), (2, 10)])
+    index = CoPurchaseIndex(k=3)
+    index.rebuild(test_db)
+    add_purchases(test_db, [(2, 20)])
+    compute = index._compute
+
+    def racing_compute(pairs):
+        # (2, 20) committed before the rebuild read the table, (1, 30) after
+        index.record_purchase(2, 20, [10])
+        index.record_purchase(1, 30, [10, 20])
+        return compute(pairs)
+    monkeypatch.setattr(index, "_compute", racing_compute)
+    index.rebuild(test_db)
+
+    assert index.neighbours(10) == [(20, 2), (30, 1)]
+    assert index.neighbours(30) == [(10, 1), (20, 1)]
+
+def test_recommendations_endpoint(client, test_db):
+    from src.main import co_purchase_index
+    client.post("/users/register", json={
+        "username": "recdev", "email": "recdev@example.com",
+        "password": "testpassword123", "is_developer": True
+    })
+    token = client.post("/token", data={"username": "recdev", "password": "testpassword123"}).json()["access_token"]
+    headers = {"Authorization": f"Bearer {token}"}
+    ids = [
+        client.post("/agents/create", headers=headers, json={"name": f"Agent {i}", "description": "d", "price": 1.0}).json()["id"]
+        for i in range(3)
+    ]
+    add_purchases(test_db, [(1000, ids[0]), (1000, ids[2])])
+    co_purchase_index.rebuild(test_db)
+
+    # A purchase through the API updates the index in place
+    client.post("/tokens/purchase", headers=headers, json={"amount": 10})
+    client.post("/agents/purchase", headers=headers, json={"agent_id": ids[0], "purchase_price": 1.0})
+    client.post("/agents/purchase", headers=headers, json={"agent_id": ids[1], "purchase_price": 1.0})
+
+    response = client.get(f"/agents/{ids[0]}/recommendations", headers=headers)
+    assert response.status_code == status.HTTP_200_OK
+    body = response.json()
+    assert [agent["id"] for agent in body] == [ids[1], ids[2]]
+    assert body[0]["is_purchased"] is True
+    assert client.get("/agents/9999/recommendations", headers=headers).status_code == status.HTTP_404_NOT_FOUND
@@ -0,0 +1,41 @@
+import re
+from unittest.mock import AsyncMock
+
+import pytest
+
+from src.main import AVAILABLE_AGENTS
+from src.middleware.timing import ServerTiming
+
+@pytest.fixture
+def timed_client(middleware_client):
+    with middleware_client(ServerTiming()) as client:
+        yield client
+
+def _timings(response):
+    return {name: float(ms) for name, ms in re.findall(r"(\w+);dur=([\d.]+)", response.headers["server-timing"])}
+
+def _developer_headers(client):
+    client.post("/users/register", json={"username": "timer", "email": "timer@example.com", "password": "testpassword123", "is_developer": True})
+    token = client.post("/token", data={"username": "timer", "password": "testpassword123"}).json()["access_token"]
+    return {"Authorization": f"Bearer {token}"}
+
+def test_header_absent_by_default(client):
+    assert "server-timing" not in client.get("/agents").headers
+
+def test_db_and_total_time(timed_client):
+    headers = _developer_headers(timed_client)
+    timings = _timings(timed_client.get("/agents", headers=headers))
+    assert timings["total"] >= timings["db"] > 0
+
+def test_llm_time_on_invoke(timed_client, monkeypatch):
+    headers = _developer_headers(timed_client)
+    agent_id = timed_client.post("/agents/create", headers=headers, json={
+        "name": "Technical Troubleshooter", "description": "d", "price": 1.0
+    }).json()["id"]
+    monkeypatch.setattr(AVAILABLE_AGENTS["technical_troubleshooter"], "process_request", AsyncMock(return_value={"cost": 0}))
+
+    response = timed_client.post(f"/agents/invoke/{agent_id}", headers=headers, json={"issue": "x"})
+    assert response.status_code == 200
+    timings = _timings(response)
+    assert set(timings) == {"db", "llm", "total"}
+    assert timings["total"] >= timings["llm"]
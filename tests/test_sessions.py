@@ -0,0 +1,71 @@
+from unittest.mock import patch
+
+from fastapi import status
+
+from src.database.models import RefreshToken, User
+
+def login(client, username="sessionuser"):
+    client.post(
+        "/users/register",
+        json={
+            "username": username,
+            "email": f"{username}@example.com",
+            "password": "testpassword123",
+            "is_developer": False
+        }
+    )
+    response = client.post(
+        "/token",
+        data={"username": username, "password": "testpassword123"}
+    )
+    assert response.status_code == status.HTTP_200_OK
+    return response.json()
+
+def test_login_issues_refresh_token_stored_hashed(client, test_db):
+    tokens = login(client)
+    assert tokens["refresh_token"]
+    assert tokens["expires_in"] > 0
+
+    stored = test_db.query(RefreshToken).one()
+    assert stored.token_hash != tokens["refresh_token"]
+    assert tokens["refresh_token"] not in stored.token_hash
+
+def test_refresh_rotates_without_bcrypt(client, test_db):
+    tokens = login(client)
+
+    with patch("src.auth.security.pwd_context.verify") as verify:
+        response = client.post("/token/refresh", json={"refresh_token": tokens["refresh_token"]})
+        assert not verify.called
+
+    assert response.status_code == status.HTTP_200_OK
+    rotated = response.json()
+    assert rotated["refresh_token"] != tokens["refresh_token"]
+    headers = {"Authorization": f"Bearer {rotated['access_token']}"}
+    assert client.get("/users/me", headers=headers).json()["username"] == "sessionuser"
+
+def test_reused_refresh_token_revokes_family(client, test_db):
+    tokens = login(client)
+    rotated = client.post("/token/refresh", json={"refresh_token": tokens["refresh_token"]}).json()
+
+    # Replaying the old token is treated as theft
+    replay = client.post("/token/refresh", json={"refresh_token": tokens["refresh_token"]})
+    assert replay.status_code == status.HTTP_401_UNAUTHORIZED
+
+    # ...and the legitimate successor is revoked with it
+    response = client.post("/token/refresh", json={"refresh_token": rotated["refresh_token"]})
+    assert response.status_code == status.HTTP_401_UNAUTHORIZED
+
+def test_revoke_logs_out_session(client, test_db):
+    tokens = login(client)
+    assert client.post("/token/revoke", json={"refresh_token": tokens["refresh_token"]}).status_code == 200
+    response = client.post("/token/refresh", json={"refresh_token": tokens["refresh_token"]})
+    assert response.status_code == status.HTTP_401_UNAUTHORIZED
+
+def test_deactivation_revokes_refresh_tokens(client, test_db):
+    tokens = login(client)
+    user = test_db.query(User).filter(User.username == "sessionuser").first()
+    user.is_active = False
+    test_db.commit()
+
+    response = client.post("/token/refresh", json={"refresh_token": tokens["refresh_token"]})
+    assert response.status_code == status.HTTP_401_UNAUTHORIZED
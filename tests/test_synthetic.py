@@ -0,0 +1,68 @@
+import json
+from multiprocessing.pool import ThreadPool
+
+import pytest
+from sqlalchemy import create_engine, text
+
+from src.database.synthetic import SyntheticConfig, _ordered, generate, generate_rows
+
+def _config(**overrides):
+    return SyntheticConfig(**{"users": 300, "agents": 40, "purchases": 500, "invocations": 1200, "chunk_size": 250, **overrides})
+
+def test_rows_are_deterministic():
+    config = _config()
+    assert generate_rows(config, "agent_invocations", 250, 500) == generate_rows(config, "agent_invocations", 250, 500)
+    assert generate_rows(config, "agent_invocations", 0, 250) != generate_rows(_config(seed=7), "agent_invocations", 0, 250)
+
+def test_generate_loads_consistent_data(tmp_path):
+    config = _config()
+    url = f"sqlite:///{tmp_path / 'synthetic.db'}"
+    counts = generate(url, config, workers=2, create_schema=True)
+    assert counts == {"users": 300, "agents": 40, "agent_purchases": 500, "agent_invocations": 1200}
+
+    engine = create_engine(url)
+    with engine.connect() as conn:
+        assert conn.execute(text("SELECT COUNT(*) FROM users WHERE is_developer")).scalar() == config.developers
+        assert conn.execute(text("SELECT name FROM agents WHERE id = 4")).scalar() == "Technical Troubleshooter"
+        orphans = conn.execute(text(
+            "SELECT COUNT(*) FROM agent_invocations i LEFT JOIN agents a ON a.id = i.agent_id "
+            "LEFT JOIN users u ON u.id = i.user_id WHERE a.id IS NULL OR u.id IS NULL"
+        )).scalar()
+        assert orphans == 0
+        # Popular agents get far more than an even share of traffic
+        top = conn.execute(text("SELECT COUNT(*) FROM agent_invocations GROUP BY agent_id ORDER BY 1 DESC LIMIT 1")).scalar()
+        assert top > 3 * 1200 / 40
+        input_data, output_data = conn.execute(text("SELECT input_data, output_data FROM agent_invocations WHERE id = 1")).one()
+        assert "input_text" in json.loads(input_data)
+        assert "output_text" in json.loads(output_data)
+        rows = conn.execute(text("SELECT * FROM agent_invocations ORDER BY id")).all()
+    engine.dispose()
+
+    # Same rows whether generated in parallel or in-process
+    url = f"sqlite:///{tmp_path / 'serial.db'}"
+    generate(url, config, workers=1, create_schema=True)
+    engine = create_engine(url)
+    with engine.connect() as conn:
+        assert conn.execute(text("SELECT * FROM agent_invocations ORDER BY id")).all() == rows
+    engine.dispose()
+
+def test_generate_refuses_non_empty_tables(tmp_path):
+    url = f"sqlite:///{tmp_path / 'synthetic.db'}"
+    generate(url, _config(invocations=0), workers=1, create_schema=True)
+    with pytest.raises(ValueError):
+        generate(url, _config(), workers=1)
+
+def test_chunks_are_submitted_in_a_bounded_window():
+    submitted = []
+
+    def tasks():
+        for i in range(20):
+            submitted.append(i)
+            yield i
+
+    with ThreadPool(2) as pool:
+        results = _ordered(pool, lambda i: i * i, tasks(), window=3)
+        assert next(results) == 0
+        # Only a window's worth of chunks is in flight ahead of the writer
+        assert len(submitted) <= 4
+        assert list(results) == [i * i for i in range(1, 20)]
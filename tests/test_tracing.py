@@ -0,0 +1,106 @@
+import asyncio
+import json
+
+import pytest
+from fastapi import status
+from sqlalchemy.orm import sessionmaker
+
+from src.database.invocation_writer import InvocationWriter
+from src.observability.tracing import JsonlExporter, TraceMiddleware, parse_traceparent, trace_engine, tracer
+
+def get_auth_header(client, username="tracer"):
+    client.post(
+        "/users/register",
+        json={
+            "username": username,
+            "email": f"{username}@example.com",
+            "password": "testpassword123",
+            "is_developer": True
+        }
+    )
+    response = client.post(
+        "/token",
+        data={"username": username, "password": "testpassword123"}
+    )
+    return {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+@pytest.fixture
+def spans(tmp_path, test_db, monkeypatch):
+    """Trace into a temp file; returns a function reading the spans written so far."""
+    path = tmp_path / "traces.jsonl"
+    exporter = JsonlExporter(str(path))
+    monkeypatch.setattr(tracer, "exporter", exporter)
+    monkeypatch.setattr(tracer, "sample_rate", 1.0)
+    monkeypatch.setattr(tracer, "enabled", True)
+    trace_engine(test_db.get_bind())
+
+    def read():
+        exporter.shutdown()
+        if not path.exists():
+            return []
+        return [
+            span
+            for line in path.read_text().splitlines()
+            for resource in json.loads(line)["resourceSpans"]
+            for scope in resource["scopeSpans"]
+            for span in scope["spans"]
+        ]
+    return read
+
+@pytest.fixture
+def client(middleware_client, spans):
+    """The app with the trace middleware, which is only installed when tracing is on."""
+    with middleware_client(TraceMiddleware(tracer)) as client:
+        yield client
+
+def test_parse_traceparent():
+    context = parse_traceparent("00-4bf92f3577b34da6a3ce929d0e0e4736-00f067aa0ba902b7-01")
+    assert context.trace_id == "4bf92f3577b34da6a3ce929d0e0e4736"
+    assert context.span_id == "00f067aa0ba902b7"
+    assert context.sampled
+    assert parse_traceparent("00-4bf92f3577b34da6a3ce929d0e0e4736-00f067aa0ba902b7-00").sampled is False
+    assert parse_traceparent("garbage") is None
+    assert parse_traceparent("00-" + "0" * 32 + "-00f067aa0ba902b7-01") is None
+
+def test_request_spans_share_a_trace(client, spans):
+    headers = get_auth_header(client)
+    response = client.get("/users/me", headers=headers)
+    assert response.status_code == status.HTTP_200_OK
+    trace_id = response.headers["X-Trace-Id"]
+
+    trace = [span for span in spans() if span["traceId"] == trace_id]
+    by_name = {span["name"]: span for span in trace}
+    root = by_name["GET /users/me"]
+    assert "parentSpanId" not in root
+    assert by_name["auth.get_current_user"]["parentSpanId"] == root["spanId"]
+    # Dependencies are resolved before the dependant runs, so they are siblings
+    assert by_name["auth.get_current_principal"]["parentSpanId"] == root["spanId"]
+    assert any(span["name"] == "db SELECT" for span in trace)
+    attributes = {a["key"]: a["value"] for a in root["attributes"]}
+    assert attributes["http.route"] == {"stringValue": "/users/me"}
+    assert attributes["http.status_code"] == {"intValue": "200"}
+
+def test_incoming_traceparent_is_continued(client, spans):
+    traceparent = "00-4bf92f3577b34da6a3ce929d0e0e4736-00f067aa0ba902b7-01"
+    response = client.get("/agents", headers={"traceparent": traceparent})
+    assert response.headers["X-Trace-Id"] == "4bf92f3577b34da6a3ce929d0e0e4736"
+    root = next(span for span in spans() if span["name"] == "GET /agents")
+    assert root["parentSpanId"] == "00f067aa0ba902b7"
+
+def test_queued_invocations_link_to_request_trace(test_db, spans):
+    writer = InvocationWriter(sessionmaker(bind=test_db.get_bind()), mode="async", flush_interval=0.01)
+
+    async def run():
+        await writer.start()
+        with tracer.span("request") as span:
+            await writer.submit(1, 1, {"q": "x"}, {"a": "y"})
+        await writer.stop()
+        return span.context.trace_id
+
+    trace_id = asyncio.run(run())
+    flush = next(span for span in spans() if span["name"] == "invocation_writer.flush")
+    assert flush["traceId"] != trace_id
+    assert [link["traceId"] for link in flush["links"]] == [trace_id]
+    # The insert runs in a worker thread but still belongs to the flush span
+    insert = next(span for span in spans() if span["name"] == "db INSERT")
+    assert insert["parentSpanId"] == flush["spanId"]